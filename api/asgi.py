@@ -0,0 +1,262 @@
+"""
+Punto de entrada ASGI, equivalente al handler de `api/index.py` (mismos parámetros y respuestas).
+
+Los escaneos corren en hilos (el pipeline es síncrono) y las peticiones concurrentes para la
+misma marca normalizada comparten UN escaneo en vuelo: una sola cadena Gemini/CSE, una sola
+escritura en DB y el mismo resultado para todos. El streaming (SSE/NDJSON) y el batch no se
+coalescen: cada cliente recibe sus eventos en vivo.
+
+    python -m api.asgi --port 8000         # uvicorn si está instalado; si no, servidor stdlib
+    uvicorn api.asgi:app --port 8000
+"""
+import argparse
+import asyncio
+import contextvars
+import weakref
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+from urllib.parse import parse_qs
+
+from . import endpoint, telemetry
+from .deadline import deadline_scope
+from .domains import normalize_brand_key
+from .jsonstream import iter_json_chunks
+from .request_log import log_request, request_log_path
+from .singleflight import AsyncSingleFlight
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+    (b"access-control-allow-headers", b"X-Requested-With, Content-Type"),
+]
+
+# Escaneos en vuelo por marca normalizada (un AsyncSingleFlight por event loop). Referencia débil
+# al loop: uno cerrado (asyncio.run por test, servidor stdlib) no deja su instancia ni la hereda otro
+_scans: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncSingleFlight]" = weakref.WeakKeyDictionary()
+
+def _in_flight_scans() -> AsyncSingleFlight:
+    loop = asyncio.get_running_loop()
+    flight = _scans.get(loop)
+    if flight is None:
+        flight = _scans[loop] = AsyncSingleFlight()
+    return flight
+
+def _scan_and_persist(target_brand: str, refresh: bool) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    from .scan_cache import cached_compas_scan
+    scan_report, cache_info = cached_compas_scan(target_brand, refresh=refresh)
+    endpoint.persist_scan_report(target_brand, scan_report, cache_info)
+    return scan_report, cache_info
+
+async def coalesced_scan(target_brand: str, refresh: bool = False,
+                         budget: Optional[float] = None) -> Tuple[Dict[str, Any], Dict[str, Any], bool]:
+    """
+    Escaneo (con caché y persistencia) compartido entre peticiones concurrentes.
+    Devuelve (reporte, info_cache, compartido): compartido=True si se reutilizó un escaneo en vuelo.
+    Con `budget` (segundos, ver deadline.py) solo se comparte entre peticiones con el mismo presupuesto:
+    el deadline es el de la primera.
+    """
+    key = f"{'refresh' if refresh else 'scan'}:{normalize_brand_key(target_brand)}"
+    if budget is not None:
+        key += f":budget={budget}"
+    (scan_report, cache_info), shared = await _in_flight_scans().do(
+        key, lambda: asyncio.to_thread(_scan_and_persist, target_brand, refresh)
+    )
+    if shared:
+        print(f"🔗 Reutilizando escaneo en curso para: {target_brand}")
+    return scan_report, cache_info, shared
+
+async def iterate_in_thread(make_iterator: Callable[[], Iterator[Any]]) -> AsyncIterator[Any]:
+    """Consume un generador síncrono en un hilo y entrega sus elementos al event loop."""
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue[Tuple[str, Any]]" = asyncio.Queue()
+
+    def pump() -> None:
+        try:
+            for item in make_iterator():
+                loop.call_soon_threadsafe(queue.put_nowait, ("item", item))
+            loop.call_soon_threadsafe(queue.put_nowait, ("done", None))
+        except BaseException as e:
+            loop.call_soon_threadsafe(queue.put_nowait, ("error", e))
+
+    worker = loop.run_in_executor(None, contextvars.copy_context().run, pump)
+    while True:
+        kind, value = await queue.get()
+        if kind == "item":
+            yield value
+        elif kind == "error":
+            raise value
+        else:
+            break
+    await worker
+
+async def _send_json(send: Send, status: int, data: Dict[str, Any]) -> None:
+    """Respuesta JSON: en un solo mensaje con Content-Length si entra en un bloque; si no, por bloques."""
+    chunks = iter_json_chunks(data)
+    body = next(chunks)
+    following = next(chunks, None)
+    if following is None:
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())] + CORS_HEADERS})
+        await send({"type": "http.response.body", "body": body})
+        return
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json")] + CORS_HEADERS})
+    await send({"type": "http.response.body", "body": body, "more_body": True})
+    while following is not None:
+        body, following = following, next(chunks, None)
+        await send({"type": "http.response.body", "body": body, "more_body": following is not None})
+
+def _encode_event(mode: str, event: Dict[str, Any]) -> bytes:
+    """Evento del escaneo como SSE (`event:`/`data:`) o como línea NDJSON, con el mismo codificador que `index.py`."""
+    if mode == "sse":
+        return f"event: {event['event']}\ndata: ".encode("utf-8") + b"".join(iter_json_chunks(event["data"], end="\n\n"))
+    return b"".join(iter_json_chunks(event, end="\n"))
+
+async def _start_stream(send: Send, content_type: bytes) -> None:
+    await send({"type": "http.response.start", "status": 200, "headers": [
+        (b"content-type", content_type), (b"cache-control", b"no-cache"), (b"x-accel-buffering", b"no"),
+    ] + CORS_HEADERS})
+
+async def _send_scan_stream(send: Send, target_brand: str, refresh: bool, mode: str,
+                            trace: Optional[telemetry.Trace]) -> None:
+    from .scan_cache import iter_cached_compas_scan
+
+    await _start_stream(send, b"text/event-stream" if mode == "sse" else b"application/x-ndjson")
+    scan_report, cache_info = None, {}
+    try:
+        async for event in iterate_in_thread(lambda: iter_cached_compas_scan(target_brand, refresh=refresh)):
+            if event["event"] == "cache":
+                cache_info = event["data"]
+            elif event["event"] == "summary":
+                scan_report = event["data"]
+            await send({"type": "http.response.body", "body": _encode_event(mode, event), "more_body": True})
+    except Exception as e:
+        print(f"❌ Error Crítico en streaming: {e}")
+        error = {"event": "error", "data": endpoint.error_response(str(e))}
+        await send({"type": "http.response.body", "body": _encode_event(mode, error)})
+        return
+
+    if scan_report is not None:
+        await asyncio.to_thread(endpoint.log_and_persist, target_brand, scan_report, cache_info)
+    tail = _encode_event(mode, {"event": "timings", "data": trace.timings()}) if trace is not None else b""
+    await send({"type": "http.response.body", "body": tail})
+
+async def handle_get(scope: Scope, send: Send, headers: Dict[str, str]) -> None:
+    try:
+        # 1. Parsear y Validar Input
+        try:
+            request = endpoint.parse_scan_request(parse_qs(scope.get("query_string", b"").decode("latin-1")),
+                                                  headers.get("accept"))
+        except ValueError as e:
+            return await _send_json(send, 400, endpoint.error_response(str(e)))
+        target_brand, mode, budget = request["brand"], request["stream"], request["budget"]
+
+        # 2. Ejecutar Lógica de Negocio (con caché)
+        with telemetry.start_trace("GET /api", brand=target_brand, stream=mode or "none", server="asgi") as trace, \
+                deadline_scope(budget):
+            if mode:
+                return await _send_scan_stream(send, target_brand, request["refresh"], mode,
+                                               trace if request["debug_timings"] else None)
+            scan_report, cache_info, shared = await coalesced_scan(target_brand, refresh=request["refresh"], budget=budget)
+            trace.root.set(coalesced=shared)
+            # Cada petición cuenta para la popularidad, aunque haya compartido el escaneo
+            if request_log_path():
+                await asyncio.to_thread(log_request, target_brand, cache_info)
+
+        # 3. Respuesta Exitosa
+        timings = trace.timings() if request["debug_timings"] else None
+        return await _send_json(send, 200, endpoint.scan_response(target_brand, scan_report, cache_info,
+                                                                  coalesced=shared, timings=timings))
+
+    except Exception as e:
+        return await _send_json(send, 500, endpoint.server_error_response(e))
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+async def handle_post(send: Send, receive: Receive) -> None:
+    """Batch: NDJSON en streaming (una línea por marca) + línea final de resumen, como `index.py`."""
+    try:
+        brands, options = endpoint.parse_batch_request((await _read_body(receive)).decode("utf-8"))
+    except ValueError as e:
+        return await _send_json(send, 400, endpoint.error_response(str(e)))
+
+    from .batch import BatchTally, iter_batch_scan
+
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"application/x-ndjson")] + CORS_HEADERS})
+    line = lambda data: {"type": "http.response.body", "body": _encode_event("ndjson", data), "more_body": True}
+
+    tally = BatchTally()
+    try:
+        batch = lambda: iter_batch_scan(brands, **options)
+        async for result in iterate_in_thread(batch):
+            tally.add(result)
+            await send(line(result))
+    except Exception as e:
+        print(f"❌ Error Crítico en batch: {e}")
+        await send(line(endpoint.error_response(str(e))))
+
+    summary = await asyncio.to_thread(endpoint.finish_batch, len(brands), tally)
+    await send({"type": "http.response.body", "body": _encode_event("ndjson", summary)})
+
+async def app(scope: Scope, receive: Receive, send: Send) -> None:
+    """Aplicación ASGI 3.0."""
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                # Escrituras diferidas (COMPAS_DB_WRITE_BEHIND) pendientes antes de apagar
+                from .db import flush_pending_writes
+                await asyncio.to_thread(flush_pending_writes)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    method = scope["method"].upper()
+    headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+    if method == "OPTIONS":
+        await send({"type": "http.response.start", "status": 204, "headers": list(CORS_HEADERS)})
+        await send({"type": "http.response.body", "body": b""})
+    elif method == "GET":
+        await handle_get(scope, send, headers)
+    elif method == "POST":
+        await handle_post(send, receive)
+    else:
+        await _send_json(send, 405, endpoint.error_response(f"Método {method} no soportado."))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Servidor local de la API (ASGI).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--stdlib", action="store_true", help="Forzar el servidor stdlib aunque uvicorn esté instalado")
+    args = parser.parse_args()
+
+    if not args.stdlib:
+        try:
+            import uvicorn # type: ignore
+        except ImportError:
+            print("ℹ️ uvicorn no está instalado: usando el servidor stdlib.")
+        else:
+            uvicorn.run(app, host=args.host, port=args.port)
+            return
+
+    from .asgi_server import serve
+    asyncio.run(serve(app, args.host, args.port))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import asyncio
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+App = Callable[[Dict[str, Any], Callable[[], Awaitable[Dict[str, Any]]], Callable[[Dict[str, Any]], Awaitable[None]]], Awaitable[None]]
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+class _BadRequest(Exception):
+    pass
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, List[Tuple[bytes, bytes]], bytes]]:
+    """Lee una petición HTTP/1.1 (línea de petición, cabeceras y body por Content-Length)."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise _BadRequest("Cabeceras demasiado grandes")
+
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise _BadRequest("Línea de petición inválida")
+
+    headers: List[Tuple[bytes, bytes]] = []
+    length = 0
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, _, value = line.partition(":")
+        name, value = name.strip().lower(), value.strip()
+        headers.append((name.encode("latin-1"), value.encode("latin-1")))
+        if name == "content-length":
+            length = int(value or 0)
+    if length > MAX_BODY_BYTES:
+        raise _BadRequest("Body demasiado grande")
+    body = await reader.readexactly(length) if length else b""
+    return method, target, headers, body
+
+async def _handle_connection(app: App, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """
+    Una petición por conexión (Connection: close): sin Content-Length, el cuerpo
+    termina al cerrar el socket, lo que sirve también para respuestas en streaming.
+    """
+    try:
+        try:
+            request = await _read_request(reader)
+        except (_BadRequest, ValueError) as e:
+            writer.write(f"HTTP/1.1 400 Bad Request\r\nConnection: close\r\n\r\n{e}".encode("utf-8"))
+            return
+        if request is None:
+            return
+
+        method, target, headers, body = request
+        path, _, query = target.partition("?")
+        peer = writer.get_extra_info("peername") or ("", 0)
+        sock = writer.get_extra_info("sockname") or ("", 0)
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": method, "scheme": "http", "path": unquote(path), "raw_path": path.encode("latin-1"),
+            "query_string": query.encode("latin-1"), "root_path": "", "headers": headers,
+            "client": (peer[0], peer[1]), "server": (sock[0], sock[1]),
+        }
+
+        body_sent = False
+
+        async def receive() -> Dict[str, Any]:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await asyncio.Event().wait()  # no llegan más mensajes hasta que se cierre la conexión
+            return {"type": "http.disconnect"}
+
+        async def send(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+                lines += [f"{k.decode('latin-1')}: {v.decode('latin-1')}" for k, v in message.get("headers", [])]
+                lines.append("Connection: close")
+                writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+            elif message["type"] == "http.response.body":
+                writer.write(message.get("body", b""))
+                await writer.drain()
+
+        await app(scope, receive, send)
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass  # el cliente cortó la conexión
+    finally:
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+async def serve(app: App, host: str = "127.0.0.1", port: int = 8000) -> None:
+    """Servidor HTTP/1.1 mínimo (solo stdlib) para correr la app ASGI en local."""
+    server = await asyncio.start_server(lambda r, w: _handle_connection(app, r, w), host, port,
+                                        limit=MAX_HEADER_BYTES)
+    bound = server.sockets[0].getsockname()
+    print(f"🚀 CompasScan ASGI escuchando en http://{bound[0]}:{bound[1]}")
+    async with server:
+        await server.serve_forever()
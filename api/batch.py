@@ -0,0 +1,149 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from . import gemini_service, telemetry
+from .compas_core import brand_name_of
+from .constants import DEFAULT_BATCH_WORKERS
+from .domains import normalize_brand_key
+from .scan_cache import cached_compas_scan, get_scan_cache
+
+def parse_brand_list(values: Iterable[Any]) -> List[str]:
+    """
+    Normaliza la entrada de un batch: acepta strings o dicts con clave 'brand'
+    (formato de las líneas JSONL). Ignora vacíos y duplicados exactos, conservando el orden.
+    """
+    brands: List[str] = []
+    seen = set()
+    for value in values:
+        if isinstance(value, dict):
+            value = value.get("brand")
+        if not isinstance(value, str):
+            continue
+        brand = value.strip()
+        if brand and brand not in seen:
+            seen.add(brand)
+            brands.append(brand)
+    return brands
+
+def resolve_batch_workers(max_workers: Optional[int] = None) -> int:
+    """
+    Tamaño del pool de marcas: el argumento, acotado por COMPAS_BATCH_WORKERS (o el default), que
+    es a la vez el valor sin argumento. El tope vale para todos los callers: el `workers` de un POST
+    llega del cliente y cada worker es un hilo.
+    """
+    try:
+        limit = max(1, int(os.environ.get("COMPAS_BATCH_WORKERS", DEFAULT_BATCH_WORKERS)))
+    except ValueError:
+        limit = DEFAULT_BATCH_WORKERS
+    if max_workers is None:
+        return limit
+    return max(1, min(limit, max_workers))
+
+def _scan_one(index: int, brand: str, use_cache: bool, incremental: bool, persist: bool) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        with telemetry.start_trace("batch.scan", brand=brand):
+            if incremental:
+                # El escaneo incremental guarda su propio delta (ver rows_to_persist)
+                from .incremental import incremental_compas_scan
+                report, cache_info = incremental_compas_scan(brand, persist=persist)
+            else:
+                report, cache_info = cached_compas_scan(brand, refresh=not use_cache)
+        return {
+            "index": index,
+            "target": brand,
+            "status": "success",
+            "data": report,
+            "cache": cache_info,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000),
+        }
+    except Exception as e:
+        print(f"❌ Error escaneando '{brand}' en batch: {e}")
+        return {
+            "index": index,
+            "target": brand,
+            "status": "error",
+            "message": str(e),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000),
+        }
+
+def _prefetch_gemini(group: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+    """Respuestas de Gemini de un grupo de marcas en un solo prompt; devuelve el grupo para escanearlo."""
+    try:
+        with telemetry.start_trace("batch.gemini_prefetch", brands=len(group)):
+            gemini_service.prefetch_competitors([brand_name_of(brand) for _, brand in group])
+    except Exception as e:
+        print(f"⚠️ Prompt batch de Gemini falló ({e}): esas marcas consultan a Gemini una por una.")
+    return group
+
+def iter_batch_scan(brands: List[str], max_workers: Optional[int] = None, use_cache: bool = True,
+                    incremental: bool = False, persist: bool = True,
+                    gemini_batch: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Escanea muchas marcas en un pool acotado de hilos y entrega cada resultado
+    en cuanto termina (orden de finalización, con 'index' = posición de entrada).
+    Todas las marcas comparten la sesión HTTP, el modelo de Gemini y la caché del proceso.
+    Con `incremental` cada marca se re-escanea contra su estado anterior y guarda solo su delta
+    (`persist=False` lo desactiva); `use_cache` no aplica.
+    Con `gemini_batch` > 1 (default COMPAS_GEMINI_BATCH_SIZE) Gemini se consulta por grupos de
+    marcas en un solo prompt antes de escanearlas: cada grupo que responde libera sus escaneos,
+    que encuentran la respuesta en la caché. Las marcas con escaneo cacheado no entran al prompt.
+    """
+    workers = min(resolve_batch_workers(max_workers), max(1, len(brands)))
+    size = gemini_service.resolve_batch_size(gemini_batch)
+    indexed = list(enumerate(brands))
+    to_prefetch: List[Tuple[int, str]] = []
+    if size > 1:
+        cache = get_scan_cache() if use_cache and not incremental else None
+        to_prefetch = [(i, brand) for i, brand in indexed
+                       if cache is None or cache.get(normalize_brand_key(brand)) is None]
+    waiting = {i for i, _ in to_prefetch}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool, \
+            ThreadPoolExecutor(max_workers=gemini_service.resolve_batch_concurrency()) as prompts:
+        def scan(item: Tuple[int, str]) -> Future:
+            return pool.submit(_scan_one, item[0], item[1], use_cache, incremental, persist)
+
+        scans: Set[Future] = {scan(item) for item in indexed if item[0] not in waiting}
+        groups: Set[Future] = {prompts.submit(_prefetch_gemini, to_prefetch[i:i + size])
+                               for i in range(0, len(to_prefetch), size)}
+        while scans or groups:
+            done, _ = wait(scans | groups, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in groups:
+                    groups.discard(future)
+                    scans.update(scan(item) for item in future.result())
+                else:
+                    scans.discard(future)
+                    yield future.result()
+
+def rows_to_persist(results: Iterable[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Selecciona los (marca, reporte) a guardar: éxitos que no vinieron de la caché ni de un
+    escaneo incremental (ambos ya guardados). Del reporte queda solo lo que se persiste (HDA/LDA).
+    """
+    return [
+        (r["target"], {k: r["data"].get(k, []) for k in ("HDA_Competitors", "LDA_Competitors")}) for r in results
+        if r["status"] == "success" and r.get("cache", {}).get("status") not in ("hit", "incremental")
+    ]
+
+class BatchTally:
+    """
+    Totales de un batch y lo pendiente de guardar, a medida que llegan los resultados: cada
+    resultado completo se libera en cuanto se escribió (en un batch de miles de marcas, retenerlos
+    todos hasta el upsert final era la mayor parte de la memoria).
+    """
+    __slots__ = ("results", "errors", "to_save")
+
+    def __init__(self):
+        self.results = 0
+        self.errors = 0
+        self.to_save: List[Tuple[str, Dict[str, Any]]] = []
+
+    def add(self, result: Dict[str, Any]) -> None:
+        self.results += 1
+        if result["status"] != "success":
+            self.errors += 1
+        self.to_save.extend(rows_to_persist([result]))
@@ -0,0 +1,194 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Una entrada de caché es (valor, timestamp de guardado en epoch seconds)
+CacheEntry = Tuple[Any, float]
+
+class CacheBackend:
+    """
+    Interfaz mínima de almacenamiento clave -> (valor, stored_at).
+    Los backends solo gestionan capacidad (LRU); el TTL se aplica en `TTLCache`.
+    """
+    name = "base"
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+class MemoryCache(CacheBackend):
+    """Caché LRU en memoria del proceso (sobrevive entre invocaciones 'warm')."""
+    name = "memory"
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max(1, max_entries)
+        self._data: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (value, stored_at if stored_at is not None else time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+class SQLiteCache(CacheBackend):
+    """
+    Caché LRU persistente en un archivo SQLite local (en Vercel solo /tmp es escribible).
+    Los valores se guardan como JSON.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str, table: str = "cache", max_entries: int = 512):
+        self.path = path
+        self.table = table
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock, self._connect() as conn:
+            row = conn.execute(f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None) -> None:
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, payload, stored_at if stored_at is not None else now, now)
+            )
+            # Evicción LRU: conservar solo las `max_entries` más recientes
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+class TieredCache(CacheBackend):
+    """
+    Encadena varios backends (ej. memoria -> SQLite -> Supabase).
+    Un hit en un nivel inferior rellena los superiores conservando su `stored_at`.
+    """
+
+    def __init__(self, backends: List[CacheBackend]):
+        self.backends = backends
+        self.name = "+".join(b.name for b in backends)
+
+    def get_with_source(self, key: str, fresh_after: Optional[float] = None) -> Tuple[Optional[CacheEntry], Optional[str]]:
+        """
+        Primer nivel con la clave. Con `fresh_after` (epoch) se saltan las entradas guardadas antes:
+        otro proceso pudo refrescar un nivel compartido (SQLite, Supabase) mientras la copia en
+        memoria vencía. Si ningún nivel tiene una entrada fresca, devuelve la más reciente.
+        """
+        stale: Tuple[Optional[CacheEntry], Optional[str]] = (None, None)
+        for i, backend in enumerate(self.backends):
+            try:
+                entry = backend.get(key)
+            except Exception as e:
+                print(f"⚠️ Error leyendo caché '{backend.name}': {e}")
+                continue
+            if entry is None:
+                continue
+            if fresh_after is not None and entry[1] < fresh_after:
+                if stale[0] is None or entry[1] > stale[0][1]:
+                    stale = (entry, backend.name)
+                continue
+            for upper in self.backends[:i]:
+                upper.set(key, entry[0], stored_at=entry[1])
+            return entry, backend.name
+        return stale
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        return self.get_with_source(key)[0]
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None) -> None:
+        for backend in self.backends:
+            try:
+                backend.set(key, value, stored_at=stored_at)
+            except Exception as e:
+                print(f"⚠️ Error escribiendo caché '{backend.name}': {e}")
+
+    def delete(self, key: str) -> None:
+        for backend in self.backends:
+            try:
+                backend.delete(key)
+            except Exception as e:
+                print(f"⚠️ Error borrando caché '{backend.name}': {e}")
+
+class TTLCache:
+    """Aplica un TTL sobre cualquier backend y reporta hit/miss/stale con la edad de la entrada."""
+
+    def __init__(self, backend: CacheBackend, ttl_seconds: float):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+
+    def lookup(self, key: str, allow_stale: bool = False) -> Tuple[Optional[Any], Dict[str, Any]]:
+        """Devuelve (valor | None, info) donde info = {status, age_seconds, backend}."""
+        if isinstance(self.backend, TieredCache):
+            entry, source = self.backend.get_with_source(key, fresh_after=time.time() - self.ttl_seconds)
+        else:
+            try:
+                entry, source = self.backend.get(key), self.backend.name
+            except Exception as e:
+                print(f"⚠️ Error leyendo caché '{self.backend.name}': {e}")
+                entry, source = None, None
+
+        if entry is None:
+            return None, {"status": "miss", "age_seconds": None, "backend": self.backend.name}
+
+        value, stored_at = entry
+        age = max(0.0, time.time() - stored_at)
+        if age <= self.ttl_seconds:
+            return value, {"status": "hit", "age_seconds": round(age, 1), "backend": source}
+        if allow_stale:
+            return value, {"status": "stale", "age_seconds": round(age, 1), "backend": source}
+        return None, {"status": "miss", "age_seconds": round(age, 1), "backend": self.backend.name}
+
+    def get(self, key: str, allow_stale: bool = False) -> Optional[Any]:
+        return self.lookup(key, allow_stale=allow_stale)[0]
+
+    def set(self, key: str, value: Any) -> None:
+        self.backend.set(key, value)
+
+    def delete(self, key: str) -> None:
+        self.backend.delete(key)
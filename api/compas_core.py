@@ -1,41 +1,143 @@
 import os
-import requests
 import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
 from urllib.parse import urlparse
-from bs4 import BeautifulSoup
-from collections import Counter
-from typing import List, Dict, Any, Optional, Set
+from typing import List, Dict, Any, FrozenSet, Optional, Set, Tuple, Callable, Iterable, Iterator, TypeVar
 
-from .constants import HEADERS, STOP_WORDS, FAMOUS_DOMAINS, IGNORED_DOMAINS, IGNORED_SUBDOMAINS, IGNORED_TERMS, NEWS_TECH_DOMAINS
+from . import competitor_index, enrichment, http_client, quota, telemetry
+from .constants import HEADERS, FAMOUS_DOMAINS, IGNORED_DOMAINS, IGNORED_SUBDOMAINS, IGNORED_TERMS, NEWS_TECH_DOMAINS, DEFAULT_SCAN_CONCURRENCY, HTTP_CONNECT_TIMEOUT, MAX_REPORT_ITEMS, MAX_DIRECT_LOOKUPS, INDUSTRY_TERMS
+from .constants import CSE_DEFAULT_ENDPOINT, INDEX_MAX_SEEDS, SCAN_CONTEXT_BUDGET_FRACTION, SCAN_FINALIZE_RESERVE_SECONDS, SCAN_HEDGE_FRACTION, SPECULATIVE_MAX_WORKERS
+from .deadline import Deadline, current_deadline, deadline_scope
 from .gemini_service import get_competitors_from_gemini
-from .mocks import get_mock_candidates, clean_url
+from .html_head import head_text, parse_head
+from .keywords import get_keyword_engine, keyword_hits, load_numpy
+from .matcher import TermMatcher
+from .mocks import get_mock_candidates
+from .models import Candidate, CandidateLike, search_item
+from .domains import clean_url, get_root_domain, has_registrable_domain, host_of
 
-def get_root_domain(url: str) -> str:
-    """Extrae el dominio raíz (ej. us.puma.com -> puma.com)."""
+# Índice compilado una sola vez con todas las listas de señales de constants.py
+SIGNAL_MATCHER = TermMatcher({
+    "ignored_domains": IGNORED_DOMAINS,
+    "ignored_subdomains": IGNORED_SUBDOMAINS,
+    "ignored_terms": IGNORED_TERMS,
+    "famous": FAMOUS_DOMAINS,
+})
+
+# Patrones "X vs Y", "like Y", "similar to Y" precompilados
+COMPETITOR_NAME_PATTERNS = [re.compile(rf'{kw}\s+([A-Z][a-zA-Z]+)') for kw in ["vs", "like", "similar to"]]
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+def resolve_concurrency(max_concurrency: Optional[int] = None) -> int:
+    """Límite de peticiones simultáneas por escaneo (argumento > COMPAS_MAX_CONCURRENCY > default)."""
+    if max_concurrency is None:
+        try:
+            max_concurrency = int(os.environ.get("COMPAS_MAX_CONCURRENCY", DEFAULT_SCAN_CONCURRENCY))
+        except ValueError:
+            max_concurrency = DEFAULT_SCAN_CONCURRENCY
+    return max(1, max_concurrency)
+
+def map_concurrently(fn: Callable[[T], R], args: Iterable[T], max_workers: int) -> Iterator[R]:
+    """
+    Aplica `fn` a cada argumento con un pool acotado de hilos.
+    Los resultados se entregan en el MISMO orden de entrada, a medida que están listos.
+    """
+    args = list(args)
+    fn = telemetry.propagate(fn)
+    if max_workers <= 1 or len(args) <= 1:
+        for a in args:
+            yield fn(a)
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(args))) as pool:
+        yield from pool.map(fn, args)
+
+# Pool compartido para las etapas que corren en paralelo a otra (Gemini, fan-out con presupuesto):
+# sus tareas pueden seguir corriendo después de que el escaneo respondió
+_background: Optional[ThreadPoolExecutor] = None
+_background_lock = threading.Lock()
+
+def _background_pool() -> ThreadPoolExecutor:
+    global _background
+    if _background is None:
+        with _background_lock:
+            if _background is None:
+                _background = ThreadPoolExecutor(max_workers=SPECULATIVE_MAX_WORKERS, thread_name_prefix="compas-stage")
+    return _background
+
+def submit_concurrently(fn: Callable[[T], R], args: Iterable[T], max_workers: int) -> List["Future[R]"]:
+    """Como `map_concurrently` pero sin bloquear: un futuro por argumento, a lo sumo `max_workers` a la vez."""
+    gate = threading.BoundedSemaphore(max(1, max_workers))
+    fn = telemetry.propagate(fn)
+
+    def run(arg: T) -> R:
+        with gate:
+            return fn(arg)
+    return [_background_pool().submit(run, a) for a in args]
+
+def _soft_remaining(deadline: Deadline) -> float:
+    """Tiempo restante menos lo que se guarda para clasificar y responder (a lo sumo un 10% del presupuesto)."""
+    return max(0.0, deadline.remaining() - min(SCAN_FINALIZE_RESERVE_SECONDS, deadline.budget / 10))
+
+def _wait(future: "Future[R]", deadline: Optional[Deadline]) -> Tuple[bool, Optional[R]]:
+    """(terminó, resultado) esperando como mucho hasta el deadline (sin deadline, lo que haga falta)."""
     try:
-        parsed = urlparse(url if url.startswith('http') else f'https://{url}')
-        parts = parsed.netloc.split('.')
-        if len(parts) > 2:
-            return '.'.join(parts[-2:])
-        return parsed.netloc
-    except:
-        return url
-
-def extract_keywords_from_text(text: str, top_n: int = 5) -> List[str]:
-    if not text: return []
-    words = re.findall(r'\w+', text.lower())
-    meaningful = [w for w in words if w not in STOP_WORDS and len(w) > 2 and not w.isdigit()]
-    return [w for w, c in Counter(meaningful).most_common(top_n)]
-
-def get_brand_context(user_input: str) -> Dict[str, Any]:
-    """Obtiene contexto semántico del sitio de la marca."""
-    context = {"name": user_input, "url": "", "keywords": []}
+        return True, future.result(timeout=None if deadline is None else _soft_remaining(deadline))
+    except FutureTimeout:
+        if future.done():
+            raise
+        return False, None
+
+def iter_stage(fn: Callable[[T], R], args: Iterable[T], max_workers: int, deadline: Optional[Deadline],
+               futures: Optional[List["Future[R]"]] = None) -> Iterator[Tuple[bool, Optional[R]]]:
+    """
+    Resultados de una etapa en el orden de entrada, como (terminó, resultado). Sin deadline es
+    `map_concurrently`; con deadline lo que no terminó a tiempo se entrega como (False, None).
+    `futures` permite consumir una etapa ya lanzada (ej. el fan-out especulativo).
+    """
+    if deadline is None and futures is None:
+        for result in map_concurrently(fn, args, max_workers):
+            yield True, result
+        return
+    for future in futures if futures is not None else submit_concurrently(fn, args, max_workers):
+        yield _wait(future, deadline)
+
+def extract_keywords_from_text(text: str, top_n: int = 5, doc_key: Optional[str] = None) -> List[str]:
+    """Keywords de un texto por tf * idf del corpus de homepages (ver `api/keywords.py`); con `doc_key` el texto se suma al corpus."""
+    return get_keyword_engine().keywords(text, top_n, doc_key=doc_key)
+
+def extract_keywords_from_texts(texts: List[str], top_n: int = 5,
+                                doc_keys: Optional[List[str]] = None) -> List[List[str]]:
+    """`extract_keywords_from_text` para un lote, en una sola pasada del motor (`score_documents`)."""
+    return get_keyword_engine().score_documents(texts, top_n, doc_keys=doc_keys)
+
+def is_url_input(user_input: str) -> bool:
+    return "." in user_input and " " not in user_input
+
+def brand_name_of(user_input: str) -> str:
+    """Nombre de la marca sin I/O: el input tal cual, o el dominio capitalizado si es una URL ('hulu.com' -> 'Hulu')."""
+    if is_url_input(user_input):
+        return urlparse(clean_url(user_input)).netloc.replace("www.", "").split('.')[0].capitalize()
+    return user_input
+
+def get_brand_context(user_input: str, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Obtiene contexto semántico del sitio de la marca.
+    Con `state` (escaneo incremental, ver `iter_compas_scan`) se reutiliza la URL ya resuelta y la
+    homepage se pide con GET condicional (ETag / Last-Modified): un 304 devuelve el contexto anterior.
+    """
+    context = {"name": brand_name_of(user_input), "url": "", "keywords": []}
+    previous = (state or {}).get("context")
     print(f"🧠 Analizando contexto para: '{user_input}'...")
 
     # 1. Detectar URL o Nombre
-    if "." in user_input and " " not in user_input:
+    if is_url_input(user_input):
         context["url"] = clean_url(user_input)
-        context["name"] = urlparse(context["url"]).netloc.replace("www.", "").split('.')[0].capitalize()
+    elif previous and previous.get("url"):
+        # Ya resuelta en el escaneo anterior: sin consulta a Google CSE
+        context["url"] = previous["url"]
     else:
         # Búsqueda rápida del sitio oficial
         res = search_google_api(f"{user_input} official site", num=1)
@@ -47,12 +149,26 @@ def get_brand_context(user_input: str) -> Dict[str, Any]:
     # 2. Extraer Keywords
     try:
         if context["url"]:
-            resp = requests.get(context["url"], headers=HEADERS, timeout=4)
+            headers = HEADERS
+            validators = (state or {}).get("validators") or {}
+            if previous and validators.get("url") == context["url"]:
+                headers = dict(HEADERS)
+                if validators.get("etag"):
+                    headers["If-None-Match"] = validators["etag"]
+                if validators.get("last_modified"):
+                    headers["If-Modified-Since"] = validators["last_modified"]
+            # Solo se descarga hasta </head> (o el tope de bytes): título y metas viven ahí
+            resp = http_client.fetch_head(context["url"], headers=headers, timeout=(HTTP_CONNECT_TIMEOUT, 4), retries=1)
+            if resp.status_code == 304 and previous:
+                print("♻️ Homepage sin cambios (304): se reutiliza el contexto anterior.")
+                state["context_reused"] = True
+                return {**previous, "name": context["name"]}
             if resp.status_code == 200:
-                soup = BeautifulSoup(resp.text, 'html.parser')
-                text = f"{soup.title.string if soup.title else ''} {soup.find('meta', attrs={'name': 'description'}) or ''}"
-                
-                raw_kws = extract_keywords_from_text(text, top_n=10)
+                if state is not None:
+                    state["validators"] = {"url": context["url"], "etag": resp.headers.get("etag"),
+                                           "last_modified": resp.headers.get("last-modified")}
+                text = head_text(parse_head(resp.text))
+                raw_kws = extract_keywords_from_text(text, top_n=10, doc_key=host_of(resp.url or context["url"]))
                 brand_clean = context["name"].lower()
                 
                 # Filtrar la propia marca y dominios famosos (evitar que 'disney' sea keyword)
@@ -67,24 +183,35 @@ def get_brand_context(user_input: str) -> Dict[str, Any]:
     return context
 
 def search_google_api(query: str, num: int = 5) -> Optional[List[Dict[str, str]]]:
-    """Wrapper seguro para la API de Google."""
-    api_key = os.environ.get("GOOGLE_API_KEY")
-    cse_id = os.environ.get("GOOGLE_CSE_ID")
-    
-    if not api_key or not cse_id: return None
+    """
+    Wrapper seguro para la API de Google, detrás de la capa de cuota (caché por (query, num),
+    límite de tasa y presupuesto diario). Devuelve None si no hay credenciales, cuota o respuesta.
+    """
+    if not os.environ.get("GOOGLE_API_KEY") or not os.environ.get("GOOGLE_CSE_ID"): return None
+
+    try:
+        return quota.get_quota_manager().search(query, num, _fetch_google_api)
+    except quota.QuotaExhausted as e:
+        print(f"🛑 Cuota de Google CSE agotada ({e}): '{query}' sin resultados.")
+        return None
 
+def _fetch_google_api(query: str, num: int) -> Optional[List[Dict[str, str]]]:
+    """Llamada real a Custom Search (sin caché ni cuota). Los ítems llegan recortados a título, link y snippet."""
     try:
-        resp = requests.get(
-            "https://www.googleapis.com/customsearch/v1", 
-            params={'key': api_key, 'cx': cse_id, 'q': query, 'num': num}
+        resp = http_client.get(
+            os.environ.get("GOOGLE_CSE_ENDPOINT") or CSE_DEFAULT_ENDPOINT,
+            params={'key': os.environ.get("GOOGLE_API_KEY"), 'cx': os.environ.get("GOOGLE_CSE_ID"), 'q': query, 'num': num}
         )
+        # Cuota diaria agotada del lado de Google (no se reintentó): no seguir gastando intentos hoy
+        if http_client.daily_quota_exhausted(resp):
+            quota.get_quota_manager().budget.exhaust()
         data = resp.json()
         
         if "error" in data:
             print(f"⚠️ Google API Error: {data['error']['message']}")
             return None
             
-        return data.get("items", [])
+        return [search_item(item) for item in data.get("items", [])]
     except Exception:
         return None
 
@@ -93,19 +220,21 @@ def extract_competitor_names(text: str, brand_name: str) -> List[str]:
     found = set()
     text_lower = text.lower()
     
+    brand_lower = brand_name.lower()
+    
     # 1. Buscar dominios famosos conocidos
-    for domain in FAMOUS_DOMAINS:
-        if domain in text_lower and domain not in brand_name.lower():
+    for domain in SIGNAL_MATCHER.terms_in(text_lower, "famous"):
+        if domain not in brand_lower:
             found.add(domain)
             
     # 2. Patrones simples después de "vs" o "like"
-    for kw in ["vs", "like", "similar to"]:
-        matches = re.findall(rf'{kw}\s+([A-Z][a-zA-Z]+)', text)
+    for pattern in COMPETITOR_NAME_PATTERNS:
+        matches = pattern.findall(text)
         found.update([m.lower() for m in matches if len(m) > 3])
         
     return list(found)
 
-def search_direct_competitor(name: str) -> Optional[Dict[str, str]]:
+def search_direct_competitor(name: str) -> Optional[Candidate]:
     """Busca el sitio oficial de un competidor específico."""
     # Mapeo de dominios conocidos
     known = {
@@ -115,32 +244,63 @@ def search_direct_competitor(name: str) -> Optional[Dict[str, str]]:
     
     if name in known:
         url = f"https://www.{known[name]}"
-        return {"link": url, "clean_url": url, "source": "direct_search", "title": f"{name} Official"}
+        return Candidate(url, link=url, title=f"{name} Official", source="direct_search")
 
     # Búsqueda genérica
     res = search_google_api(f"{name} official site", num=1)
     if res:
         link = res[0].get('link')
-        return {"link": link, "clean_url": clean_url(link), "source": "direct_search", "title": res[0].get('title')}
+        return Candidate(clean_url(link), link=link, title=res[0].get('title'), source="direct_search")
     return None
 
-def classify_competitor(candidate: Dict[str, Any], brand_context: Dict[str, Any]) -> Dict[str, Any]:
+def index_candidates(user_input: str, context: Dict[str, Any], limit: int = INDEX_MAX_SEEDS) -> List[Candidate]:
     """
-    Clasifica un candidato en HDA, LDA o Ruido basándose en señales.
+    Candidatos sembrados desde el índice de competidores, sin costo de API: lo que listan las marcas
+    que ya tienen a esta entre sus competidores (y su propio escaneo anterior), con source "index".
     """
-    url = candidate['clean_url']
-    domain = urlparse(url).netloc.lower()
-    snippet = f"{candidate.get('title', '')} {candidate.get('snippet', '')}".lower()
-    
-    # --- FASE 1: DESCARTE RÁPIDO ---
-    if any(ig in domain for ig in IGNORED_DOMAINS): return {"valid": False, "reason": "Dominio ignorado"}
-    if any(s in url for s in IGNORED_SUBDOMAINS): return {"valid": False, "reason": "Subdominio app/store"}
-    if any(t in url for t in IGNORED_TERMS): return {"valid": False, "reason": "Sitio de soporte"}
-    
-    domain_base = domain.replace("www.", "").split('.')[0]
-    if domain_base in NEWS_TECH_DOMAINS: return {"valid": False, "reason": "Sitio de noticias"}
+    index = competitor_index.get_competitor_index()
+    if index is None:
+        return []
+    try:
+        # El sitio de la marca: su homepage y el dominio con que otras marcas la listan (la URL
+        # de la homepage puede ser una suposición, ej. peacock.com en vez de peacocktv.com)
+        own = {get_root_domain(context["url"])} if context["url"] else set()
+        found = index.find_by_name(context["name"])
+        if found:
+            own.add(found["domain"])
+        seeds = index.related(user_input, own, limit)
+    except Exception as e:
+        print(f"⚠️ Índice de competidores no disponible ({e}).")
+        return []
+    return [
+        Candidate(clean_url(seed["url"]), link=seed["url"], title=seed["name"], snippet=seed["justification"],
+                  source="index", index={k: seed[k] for k in ("brands", "hda", "lda")})
+        for seed in seeds
+    ]
 
-    # --- FASE 2: ANÁLISIS DE SEÑALES ---
+def indexed_direct_competitor(name: str) -> Optional[Candidate]:
+    """Búsqueda directa resuelta por el índice de competidores (sin consulta a CSE); None si el nombre no se conoce."""
+    index = competitor_index.get_competitor_index()
+    if index is None:
+        return None
+    try:
+        found = index.find_by_name(name)
+    except Exception as e:
+        print(f"⚠️ Índice de competidores no disponible ({e}).")
+        return None
+    if found is None:
+        return None
+    return Candidate(clean_url(found["url"]), link=found["url"], title=found["name"], source="direct_search")
+
+def known_competitor_signal(known: Dict[str, int]) -> str:
+    return f"Competidor conocido de {known['brands']} marca(s) relacionada(s)"
+
+def competitor_signals(candidate: CandidateLike, brand_context: Dict[str, Any], url: str, snippet: str,
+                       domain_hits: frozenset) -> Tuple[bool, List[str], List[str]]:
+    """
+    Señales de competencia de un candidato (`snippet` ya en minúsculas).
+    Devuelve (es_hda, señales, keywords de la marca presentes en el snippet).
+    """
     signals = []
     is_hda = False
     
@@ -149,24 +309,62 @@ def classify_competitor(candidate: Dict[str, Any], brand_context: Dict[str, Any]
         is_hda = True
         signals.append("Descubierto por búsqueda directa")
 
+    # Señal: Competidor de marcas relacionadas (índice de escaneos guardados); HDA si la mayoría lo clasificó así
+    known = candidate.get('index')
+    if known:
+        is_hda = is_hda or known["hda"] > known["lda"]
+        signals.append(known_competitor_signal(known))
+
     # Señal: Gigante Digital
-    if any(f in domain for f in FAMOUS_DOMAINS):
+    if "famous" in domain_hits:
         is_hda = True
         signals.append("Gigante Digital")
 
     # Señal: Términos de Industria + Dominio Limpio
-    industry_terms = ["streaming", "video", "subscription", "movies", "tv", "watch"]
-    has_industry = any(t in snippet for t in industry_terms)
-    is_clean_domain = len(get_root_domain(url).split('.')) == 2
+    has_industry = any(t in snippet for t in INDUSTRY_TERMS)
+    is_clean_domain = has_registrable_domain(url)
+    kws_match = keyword_hits(brand_context["keywords"], snippet)
     
     if is_clean_domain and has_industry:
         signals.append("Dominio oficial con términos de industria")
         # Si tiene muchas coincidencias de keywords, puede ser HDA
-        kws_match = [k for k in brand_context["keywords"] if k in snippet]
         if len(kws_match) >= 2:
             is_hda = True
             signals.append(f"Alta relevancia semántica ({len(kws_match)} kws)")
 
+    return is_hda, signals, kws_match
+
+def url_features(url: str) -> Tuple[Optional[str], FrozenSet[str]]:
+    """
+    Lo que la clasificación deriva solo de la URL: (motivo de descarte o None, listas de señales
+    presentes en el dominio). Una pasada del matcher compilado por string (dominio y URL).
+    """
+    domain = host_of(url)
+    domain_hits = SIGNAL_MATCHER.lists_in(domain)
+    url_hits = SIGNAL_MATCHER.lists_in(url)
+
+    if "ignored_domains" in domain_hits: return "Dominio ignorado", domain_hits
+    if "ignored_subdomains" in url_hits: return "Subdominio app/store", domain_hits
+    if "ignored_terms" in url_hits: return "Sitio de soporte", domain_hits
+
+    domain_base = domain.replace("www.", "").split('.')[0]
+    if domain_base in NEWS_TECH_DOMAINS: return "Sitio de noticias", domain_hits
+    return None, domain_hits
+
+def classify_competitor(candidate: CandidateLike, brand_context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Clasifica un candidato en HDA, LDA o Ruido basándose en señales.
+    """
+    url = candidate['clean_url']
+    snippet = f"{candidate.get('title', '')} {candidate.get('snippet', '')}".lower()
+    
+    # --- FASE 1: DESCARTE RÁPIDO ---
+    reason, domain_hits = url_features(url)
+    if reason: return {"valid": False, "reason": reason}
+
+    # --- FASE 2: ANÁLISIS DE SEÑALES ---
+    is_hda, signals, _ = competitor_signals(candidate, brand_context, url, snippet, domain_hits)
+
     # --- FASE 3: RESULTADO ---
     if is_hda:
         return {"valid": True, "type": "HDA", "justification": f"Competidor Directo. {', '.join(signals)}"}
@@ -175,39 +373,356 @@ def classify_competitor(candidate: Dict[str, Any], brand_context: Dict[str, Any]
         
     return {"valid": False, "reason": "Sin señales suficientes de competencia"}
 
-def run_compas_scan(user_input: str) -> Dict[str, Any]:
+def _decide(direct: List[bool], famous: List[bool], clean: List[bool], industry: List[bool],
+            kw_count: List[int], np: Any) -> Tuple[List[bool], List[bool], List[bool]]:
+    """
+    Reglas de `competitor_signals` sobre columnas de features: (es_hda, dominio_oficial, alta_relevancia).
+    Con numpy se evalúan como operaciones sobre arrays; sin numpy, fila a fila.
+    """
+    if np is not None:
+        official = np.array(clean, dtype=bool) & np.array(industry, dtype=bool)
+        relevant = official & (np.array(kw_count, dtype=np.int32) >= 2)
+        is_hda = np.array(direct, dtype=bool) | np.array(famous, dtype=bool) | relevant
+        return is_hda.tolist(), official.tolist(), relevant.tolist()
+    official = [c and i for c, i in zip(clean, industry)]
+    relevant = [o and k >= 2 for o, k in zip(official, kw_count)]
+    is_hda = [d or f or r for d, f, r in zip(direct, famous, relevant)]
+    return is_hda, official, relevant
+
+def classify_competitors(candidates: List[CandidateLike], brand_context: Dict[str, Any],
+                         vectorized: Optional[bool] = None) -> List[Dict[str, Any]]:
+    """
+    Versión batch de `classify_competitor` (mismo resultado, en el mismo orden), para
+    re-clasificar muchos candidatos de una vez (ej. filas históricas de 'competitor_scans').
+    Cada URL distinta se analiza una sola vez, del texto solo se extraen los conteos
+    de términos y las reglas se aplican sobre columnas de features. `vectorized`: None = numpy si está instalado, True = exigirlo,
+    False = Python puro.
+    """
+    np = load_numpy() if vectorized is not False else None
+    if vectorized and np is None:
+        raise ImportError("classify_competitors(vectorized=True) requiere numpy.")
+
+    keywords = brand_context["keywords"]
+    by_url: Dict[str, Tuple[Optional[str], bool, bool]] = {}
+
+    reasons: List[Optional[str]] = []
+    direct: List[bool] = []
+    known: List[Optional[Dict[str, int]]] = []
+    famous: List[bool] = []
+    clean: List[bool] = []
+    industry: List[bool] = []
+    kw_count: List[int] = []
+    for cand in candidates:
+        url = cand['clean_url']
+        features = by_url.get(url)
+        if features is None:
+            # Un análisis por URL distinta (el parseo de host y dominio registrable ya está memorizado)
+            reason, domain_hits = url_features(url)
+            features = by_url[url] = (reason, "famous" in domain_hits, has_registrable_domain(url))
+        reasons.append(features[0])
+        direct.append(cand.get('source') == 'direct_search')
+        known.append(cand.get('index') or None)
+        famous.append(features[1])
+        clean.append(features[2])
+        if features[0] is not None:
+            industry.append(False)
+            kw_count.append(0)
+            continue
+        # Pocos términos: `in` (búsqueda en C) le gana a una regex por texto
+        snippet = f"{cand.get('title', '')} {cand.get('snippet', '')}".lower()
+        industry.append(any(t in snippet for t in INDUSTRY_TERMS))
+        kw_count.append(len(keyword_hits(keywords, snippet)))
+
+    # Un competidor conocido que la mayoría de las marcas relacionadas clasificó HDA cuenta como origen directo
+    strong = [d or bool(k and k["hda"] > k["lda"]) for d, k in zip(direct, known)]
+    is_hda, official, relevant = _decide(strong, famous, clean, industry, kw_count, np)
+
+    # Las justificaciones se repiten mucho: una por combinación de señales
+    justifications: Dict[Tuple[Any, ...], str] = {}
+    results: List[Dict[str, Any]] = []
+    for i, reason in enumerate(reasons):
+        if reason is not None:
+            results.append({"valid": False, "reason": reason})
+            continue
+        if not (direct[i] or known[i] or famous[i] or official[i]):
+            results.append({"valid": False, "reason": "Sin señales suficientes de competencia"})
+            continue
+        known_key = (known[i]["brands"], strong[i]) if known[i] else None
+        key = (direct[i], known_key, famous[i], official[i], kw_count[i] if relevant[i] else 0)
+        text = justifications.get(key)
+        if text is None:
+            signals = []
+            if direct[i]: signals.append("Descubierto por búsqueda directa")
+            if known[i]: signals.append(known_competitor_signal(known[i]))
+            if famous[i]: signals.append("Gigante Digital")
+            if official[i]: signals.append("Dominio oficial con términos de industria")
+            if relevant[i]: signals.append(f"Alta relevancia semántica ({kw_count[i]} kws)")
+            prefix = "Competidor Directo" if is_hda[i] else "Competidor de Nicho"
+            text = justifications[key] = f"{prefix}. {', '.join(signals)}"
+        results.append({"valid": True, "type": "HDA" if is_hda[i] else "LDA", "justification": text})
+    return results
+
+def verify_candidate(candidate: CandidateLike) -> Dict[str, Any]:
+    """
+    Mitad de red de `enrich_candidate`: la sonda del sitio. Un candidato vivo vuelve con "head"
+    (pendiente de `score_verified`); el resto ya es el resultado final.
+    """
+    probe = enrichment.probe_domain(candidate["clean_url"])
+    if probe["status"] == "dead":
+        return {"valid": False, "reason": probe["reason"], "unreachable": probe.get("unreachable", False)}
+    if probe["status"] != "alive":
+        return {"valid": True, "verified": False, "url": candidate["clean_url"]}
+    # Redirecciones: el reporte usa la raíz canónica a la que terminó respondiendo el sitio
+    url = clean_url(probe["final_url"]) or candidate["clean_url"]
+    return {"valid": True, "verified": True, "url": url, "head": probe["head"]}
+
+def score_verified(candidates: List[CandidateLike], checks: List[Dict[str, Any]], brand_context: Dict[str, Any]) -> None:
+    """
+    Mitad de CPU: puntúa en el lugar los `checks` de `verify_candidate` que traen "head". Las keywords
+    de todos esos sitios salen de un solo `score_documents` (los heads se suman juntos al corpus).
+    """
+    pending = [(cand, check) for cand, check in zip(candidates, checks) if "head" in check]
+    if not pending:
+        return
+    texts = [head_text(check["head"]) for _, check in pending]
+    keyword_lists = extract_keywords_from_texts(texts, top_n=10, doc_keys=[host_of(check["url"]) for _, check in pending])
+    for (cand, check), text, keywords in zip(pending, texts, keyword_lists):
+        head, url = check.pop("head"), check["url"]
+        snippet = f"{head['title']} {text} {' '.join(keywords)} {cand.get('snippet') or ''}".lower()
+        _, signals, kws_match = competitor_signals(
+            cand, brand_context, url, snippet, SIGNAL_MATCHER.lists_in(urlparse(url).netloc.lower())
+        )
+        score = round(len(kws_match) / len(brand_context["keywords"]), 2) if brand_context["keywords"] else 0.0
+        check.update(signals=signals, score=score)
+
+def enrich_candidate(candidate: CandidateLike, brand_context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Verifica un candidato de Gemini contra su sitio real (lectura parcial del head, con caché por dominio)
+    y lo puntúa con las mismas señales que `classify_competitor`, usando el texto del head.
+    Devuelve {"valid": False, "reason"} si el dominio no existe (DNS/conexión, 404/410);
+    si la verificación no fue concluyente (timeout, 403...) el candidato se conserva como no verificado.
+    El escaneo usa las dos mitades por separado: sondas en paralelo y una sola puntuación en lote.
+    """
+    check = verify_candidate(candidate)
+    score_verified([candidate], [check], brand_context)
+    return check
+
+def build_fallback_queries(context: Dict[str, Any]) -> List[str]:
+    """Consultas de la estrategia web (fallback) para una marca."""
+    return [
+        f"related:{get_root_domain(context['url'])}",
+        f"similar brands to {context['name']}",
+        f"{context['name']} competitors",
+        f"streaming services like {context['name']}" # Query dinámica idealmente
+    ]
+
+def _empty_report() -> Dict[str, Any]:
+    return {"HDA_Competitors": [], "LDA_Competitors": [], "Discarded_Candidates": []}
+
+def report_to_events(report: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Reproduce un reporte ya calculado (ej. desde caché) como la secuencia de eventos del streaming."""
+    for c_type in ("HDA", "LDA"):
+        for entry in report.get(f"{c_type}_Competitors", []):
+            yield {"event": "competitor", "data": {"type": c_type, **entry}}
+    for entry in report.get("Discarded_Candidates", []):
+        yield {"event": "discarded", "data": entry}
+    yield {"event": "summary", "data": report}
+
+def _start_state(state: Optional[Dict[str, Any]], context: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Prepara `state` para un nuevo escaneo y devuelve lo reutilizable del anterior
+    (clasificaciones y verificaciones por URL): solo si la marca conserva URL y keywords,
+    que son las entradas de ambas etapas.
+    """
+    if state is None:
+        return {}, {}
+    previous = state.get("context") or {}
+    unchanged = previous.get("url") == context["url"] and previous.get("keywords") == context["keywords"]
+    reuse = (state.get("classifications") or {}, state.get("verifications") or {}) if unchanged else ({}, {})
+    state.update(context=context, classifications={}, verifications={}, reused=0)
+    return reuse
+
+def iter_compas_scan(user_input: str, max_concurrency: Optional[int] = None,
+                     state: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Versión generadora del escaneo. Emite eventos {"event", "data"} a medida que cada etapa avanza:
+    - "context": contexto de la marca (nombre, url, keywords)
+    - "competitor": competidor aceptado ({"type": "HDA"|"LDA", name, url, justification})
+    - "discarded": candidato descartado ({url, reason})
+    - "summary": reporte final (idéntico a `run_compas_scan`)
+    `max_concurrency` acota cuántas consultas a Google CSE se envían en paralelo por etapa.
+
+    `state` (modo incremental) es el estado JSON del escaneo anterior de la marca y se actualiza
+    en el lugar: "context" y "validators" de la homepage, "classifications" y "verifications" por
+    URL, y "reused" (cuántas se tomaron del escaneo anterior en vez de recalcularse).
+
+    Gemini solo necesita el nombre de la marca y corre en paralelo con la lectura de la homepage.
+    Con presupuesto de tiempo (`deadline.deadline_scope`, ?budget_ms=) cada etapa usa lo que queda:
+    si Gemini no respondió tras SCAN_HEDGE_FRACTION del presupuesto, el fan-out de CSE arranca en
+    paralelo y gana el primero que sirva. Lo que no termina a tiempo se omite (las verificaciones
+    pendientes quedan como no verificadas) y el reporte lleva "partial": True.
+    """
+    workers = resolve_concurrency(max_concurrency)
+    deadline = current_deadline()
+    partial = False
     print(f"🚀 Iniciando CompasScan 2.0 (AI-First) para: {user_input}...\n")
-    context = get_brand_context(user_input)
+
+    gemini_span = telemetry.start_span("stage.gemini")
+    gemini = _background_pool().submit(
+        telemetry.propagate(get_competitors_from_gemini, parent=gemini_span), brand_name_of(user_input)
+    )
+    context_budget = None if deadline is None else deadline.remaining() * SCAN_CONTEXT_BUDGET_FRACTION
+    with telemetry.span("stage.brand_context") as span, deadline_scope(context_budget):
+        context = get_brand_context(user_input, state)
+        span.set(reused=bool(state and state.get("context_reused")))
+    yield {"event": "context", "data": context}
+    reused_classes, reused_checks = _start_state(state, context)
     
-    report = {"HDA_Competitors": [], "LDA_Competitors": [], "Discarded_Candidates": []}
+    report = _empty_report()
+    queries = build_fallback_queries(context)
+    search_futures: Optional[List[Any]] = None
+    fanout_span = telemetry.NOOP_SPAN
 
-    # 1. ESTRATEGIA IA (Gemini)
-    ai_candidates = get_competitors_from_gemini(context["name"])
+    def start_fanout() -> List[Any]:
+        nonlocal fanout_span
+        fanout_span = telemetry.start_span("stage.search_fanout", queries=len(queries))
+        search = telemetry.propagate(lambda q: search_google_api(q, num=10), parent=fanout_span)
+        return submit_concurrently(search, queries, workers)
+
+    # 1. ESTRATEGIA IA (Gemini), en carrera con el fallback si hay presupuesto de tiempo
+    if deadline is None:
+        ai_candidates = gemini.result()
+    else:
+        hedge_after = max(0.0, deadline.budget * SCAN_HEDGE_FRACTION - deadline.elapsed())
+        done, ai_candidates = _wait(gemini, Deadline(hedge_after))
+        if not done:
+            print("⏱️ Gemini aún no responde: el fallback CSE arranca en paralelo.")
+            search_futures = start_fanout()
+            done, ai_candidates = _wait(gemini, deadline)
+        if not done:
+            print("⏱️ Gemini no respondió dentro del presupuesto.")
+            gemini_span.set(timeout=True)
+            partial, ai_candidates = True, []
+    gemini_span.set(candidates=len(ai_candidates))
+    gemini_span.end()
     if ai_candidates:
         print("✨ Usando resultados de Gemini.")
-        for cand in ai_candidates:
-            c_type = cand.get("gemini_type", "LDA")
-            entry = {"name": cand["title"], "url": cand["clean_url"], "justification": cand["snippet"]}
+        # Verificación en paralelo (una sonda por dominio): la etapa tarda lo que la sonda más lenta.
+        # Se espera a todas antes de emitir: el veredicto de "sin red" necesita el conjunto completo.
+        enrich_span = telemetry.NOOP_SPAN
+        if enrichment.enrichment_enabled():
+            enrich_span = telemetry.start_span("stage.enrichment", candidates=len(ai_candidates))
+            check = telemetry.propagate(
+                lambda c: reused_checks.get(c.clean_url) or verify_candidate(c), parent=enrich_span
+            )
+            unverified = lambda cand: {"valid": True, "verified": False, "url": cand.clean_url}
+            checks: List[Optional[Dict[str, Any]]] = []
+            for cand, (done, res) in zip(ai_candidates, iter_stage(
+                check, ai_candidates, enrichment.resolve_enrich_workers(), deadline
+            )):
+                # Sin tiempo para terminar la sonda: se conserva sin verificar
+                partial = partial or not done
+                checks.append(res if done else unverified(cand))
+            # Keywords y señales de todos los sitios que respondieron, en un solo lote
+            with telemetry.span("enrich.score", candidates=sum(1 for c in checks if "head" in c)):
+                score_verified(ai_candidates, checks, context)
+            if state is not None:
+                state["reused"] += sum(1 for c in ai_candidates if c.clean_url in reused_checks)
+                # Como la caché de sondas: lo no concluyente (timeout, sin red) se vuelve a verificar
+                state["verifications"] = {
+                    cand.clean_url: res for cand, res in zip(ai_candidates, checks)
+                    if res.get("verified") or (not res["valid"] and not res.get("unreachable"))
+                }
+                enrich_span.set(reused=state["reused"])
+            # Si NINGÚN sitio respondió, lo más probable es que falle nuestra red: no descartar a ciegas
+            if all(not c["valid"] and c.get("unreachable") for c in checks):
+                print("⚠️ Ningún candidato respondió (¿sin red?). Se conservan sin verificar.")
+                enrich_span.set(network_down=True)
+                checks = [unverified(cand) for cand in ai_candidates]
+            enrich_span.set(partial=partial)
+        else:
+            checks = [None] * len(ai_candidates)
+
+        brand_root = get_root_domain(context["url"]) if context["url"] else ""
+        seen_roots: Set[str] = set()
+        for cand, check_res in zip(ai_candidates, checks):
+            c_type = cand.gemini_type or "LDA"
+            entry = {"name": cand.title, "url": cand.clean_url, "justification": cand.snippet}
+            if check_res is not None:
+                root = get_root_domain(check_res.get("url", cand.clean_url))
+                if not check_res["valid"]:
+                    reason = check_res["reason"]
+                elif root == brand_root:
+                    reason = "Dominio de la propia marca"
+                elif root in seen_roots:
+                    reason = "Duplicado (mismo dominio que otro candidato)"
+                else:
+                    reason = None
+                if reason:
+                    discarded = {"url": cand.clean_url, "reason": reason}
+                    report["Discarded_Candidates"].append(discarded)
+                    yield {"event": "discarded", "data": discarded}
+                    continue
+                seen_roots.add(root)
+                entry["url"] = check_res["url"]
+                entry.update({k: check_res[k] for k in ("verified", "score", "signals") if k in check_res})
             report[f"{c_type}_Competitors"].append(entry)
-        return report
+            yield {"event": "competitor", "data": {"type": c_type, **entry}}
+        enrich_span.end()
+        yield {"event": "summary", "data": _finish_report(report, partial)}
+        return
 
     # 2. ESTRATEGIA WEB (Fallback)
     print("⚠️ Fallback a Búsqueda Web (Señales)...")
-    queries = [
-        f"related:{get_root_domain(context['url'])}",
-        f"similar brands to {context['name']}",
-        f"{context['name']} competitors",
-        f"streaming services like {context['name']}" # Query dinámica idealmente
-    ]
     
-    raw_candidates = []
     seen = set()
     discovered_names = set()
 
-    # A. Búsqueda Inicial
-    for q in queries:
-        items = search_google_api(q, num=10) or []
-        for item in items:
+    def classify(cand: Candidate) -> Iterator[Dict[str, Any]]:
+        # Clasificación inmediata; el reporte conserva solo los primeros MAX_REPORT_ITEMS de cada lista
+        res = reused_classes.get(cand.clean_url)
+        if res is not None and res.get("source") == cand.source:
+            state["reused"] += 1
+        else:
+            with telemetry.span("classify_competitor", url=cand.clean_url) as span:
+                res = {**classify_competitor(cand, context), "source": cand.source}
+                span.set(result=res.get("type") or "discarded")
+        if state is not None:
+            state["classifications"][cand.clean_url] = res
+        if res["valid"]:
+            bucket = report[f"{res['type']}_Competitors"]
+            if len(bucket) < MAX_REPORT_ITEMS:
+                entry = {
+                    "name": urlparse(cand.clean_url).netloc,
+                    "url": cand.clean_url,
+                    "justification": res.get("justification", "")
+                }
+                bucket.append(entry)
+                yield {"event": "competitor", "data": {"type": res["type"], **entry}}
+        elif len(report["Discarded_Candidates"]) < MAX_REPORT_ITEMS:
+            entry = {"url": cand.clean_url, "reason": res.get("reason")}
+            report["Discarded_Candidates"].append(entry)
+            yield {"event": "discarded", "data": entry}
+
+    # 0. Competidores ya conocidos por el índice (de marcas relacionadas): se clasifican primero
+    with telemetry.span("stage.competitor_index") as span:
+        seeds = index_candidates(user_input, context)
+        span.set(seeds=len(seeds))
+    for cand in seeds:
+        if cand.clean_url not in seen:
+            seen.add(cand.clean_url)
+            yield from classify(cand)
+
+    # A. Búsqueda Inicial (consultas en paralelo, resultados procesados en orden)
+    # Spans manuales: un `with` no puede abarcar los `yield` del generador
+    if deadline is not None and search_futures is None:
+        search_futures = start_fanout()
+    elif search_futures is None:
+        fanout_span = telemetry.start_span("stage.search_fanout", queries=len(queries))
+    search = telemetry.propagate(lambda q: search_google_api(q, num=10), parent=fanout_span)
+    for done, items in iter_stage(search, queries, workers, deadline, futures=search_futures):
+        partial = partial or not done
+        for item in items or []:
             # Extraer nombres de agregadores para búsqueda directa
             full_text = f"{item.get('title')} {item.get('snippet')}"
             extracted = extract_competitor_names(full_text, context["name"])
@@ -216,36 +731,62 @@ def run_compas_scan(user_input: str) -> Dict[str, Any]:
             link = clean_url(item.get('link'))
             if link not in seen:
                 seen.add(link)
-                item["clean_url"] = link
-                item["source"] = "search"
-                raw_candidates.append(item)
-
-    # B. Búsqueda Directa de Nombres Descubiertos
-    if discovered_names:
-        print(f"🔍 Investigando nombres descubiertos: {list(discovered_names)[:5]}...")
-        for name in list(discovered_names)[:5]: # Limitado para no quemar API
-            direct = search_direct_competitor(name)
-            if direct and direct["clean_url"] not in seen:
-                seen.add(direct["clean_url"])
-                raw_candidates.append(direct)
-
-    # C. Clasificación
-    for cand in raw_candidates:
-        res = classify_competitor(cand, context)
-        entry = {
-            "name": urlparse(cand['clean_url']).netloc,
-            "url": cand['clean_url'],
-            "justification": res.get("justification", "")
-        }
-        
-        if res["valid"]:
-            report[f"{res['type']}_Competitors"].append(entry)
-        else:
-            report["Discarded_Candidates"].append({"url": cand['clean_url'], "reason": res.get("reason")})
+                # Candidato nuevo: el ítem sigue intacto en la caché de CSE
+                yield from classify(Candidate.from_search_item(item, link))
+    fanout_span.set(partial=partial)
+    fanout_span.end()
 
-    # Limitar resultados
-    report["HDA_Competitors"] = report["HDA_Competitors"][:5]
-    report["LDA_Competitors"] = report["LDA_Competitors"][:5]
-    report["Discarded_Candidates"] = report["Discarded_Candidates"][:5]
+    # Sin cuota de Google y sin resultados cacheados: datos de demostración (Mock Mode)
+    if not seen and quota.get_quota_manager().exhausted():
+        for cand in get_mock_candidates(context["name"]):
+            if cand.clean_url not in seen and len(report["LDA_Competitors"]) < MAX_REPORT_ITEMS:
+                seen.add(cand.clean_url)
+                entry = {"name": cand.title, "url": cand.clean_url,
+                         "justification": "Dato de demostración (cuota de búsqueda agotada)."}
+                report["LDA_Competitors"].append(entry)
+                yield {"event": "competitor", "data": {"type": "LDA", **entry}}
 
+    # B. Búsqueda Directa de Nombres Descubiertos (los que el índice ya conoce no gastan consultas)
+    names_to_check = []
+    for name in discovered_names:
+        direct = indexed_direct_competitor(name)
+        if direct is None:
+            names_to_check.append(name)
+        elif direct.clean_url not in seen:
+            seen.add(direct.clean_url)
+            yield from classify(direct)
+    names_to_check = names_to_check[:MAX_DIRECT_LOOKUPS] # Limitado para no quemar API
+
+    if names_to_check and deadline is not None and _soft_remaining(deadline) <= 0:
+        print("⏱️ Sin tiempo para la búsqueda directa de nombres descubiertos.")
+        partial = True
+    elif names_to_check:
+        print(f"🔍 Investigando nombres descubiertos: {names_to_check}...")
+        direct_span = telemetry.start_span("stage.direct_search", names=len(names_to_check))
+        lookup = telemetry.propagate(search_direct_competitor, parent=direct_span)
+        for done, direct in iter_stage(lookup, names_to_check, workers, deadline):
+            partial = partial or not done
+            if direct and direct.clean_url not in seen:
+                seen.add(direct.clean_url)
+                yield from classify(direct)
+        direct_span.end()
+
+    yield {"event": "summary", "data": _finish_report(report, partial)}
+
+def _finish_report(report: Dict[str, Any], partial: bool) -> Dict[str, Any]:
+    """Marca el reporte como parcial si el presupuesto de tiempo cortó alguna etapa (no se cachea ni se persiste)."""
+    if partial:
+        print("⏱️ Presupuesto de tiempo agotado: se devuelve un reporte parcial.")
+        report["partial"] = True
+    return report
+
+def run_compas_scan(user_input: str, max_concurrency: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Orquesta el escaneo completo y devuelve el reporte final.
+    `max_concurrency` acota cuántas consultas a Google CSE se envían en paralelo por etapa (protege la cuota).
+    """
+    report = _empty_report()
+    for event in iter_compas_scan(user_input, max_concurrency=max_concurrency):
+        if event["event"] == "summary":
+            report = event["data"]
     return report
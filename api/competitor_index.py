@@ -0,0 +1,424 @@
+"""
+Índice local de competidores entre marcas, armado con lo guardado en 'competitor_scans':
+dominio competidor -> marcas que lo listan, marca -> competidores (HDA/LDA) y las señales de
+clasificación de cada dominio. Un escaneo nuevo lo consulta antes de gastar Google CSE: los
+competidores de las marcas relacionadas (las que ya listan a esta marca) siembran candidatos, y
+los nombres descubiertos cuyo dominio ya se conoce no se buscan (ver `compas_core`).
+
+Es un archivo SQLite (COMPAS_INDEX_PATH) que se lee con mmap. Cada escritura de db.py lo actualiza
+en el mismo proceso; lo que escriben otros procesos entra con `sync_competitor_index`, que lee solo
+las filas posteriores a la marca de agua (el último created_at indexado).
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import telemetry
+from .constants import INDEX_DEFAULT_PATH, INDEX_MAX_PEERS, INDEX_MMAP_BYTES, INDEX_SYNC_PAGE_ROWS
+from .domains import normalize_brand_key
+from .domains import host_of, registrable_domain
+
+_SCHEMA = (
+    # WITHOUT ROWID: la clave primaria es la tabla (más compacta, una búsqueda menos por fila)
+    "CREATE TABLE IF NOT EXISTS brand_competitors ("
+    " brand_key TEXT NOT NULL, brand TEXT NOT NULL, domain TEXT NOT NULL, url TEXT NOT NULL,"
+    " name TEXT NOT NULL, name_key TEXT, label TEXT NOT NULL, classification TEXT NOT NULL,"
+    " justification TEXT NOT NULL, signals TEXT, verified INTEGER, updated_at TEXT NOT NULL,"
+    " PRIMARY KEY (brand_key, domain)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS brand_competitors_domain ON brand_competitors (domain, updated_at)",
+    # Resumen por dominio: contadores que cada escritura ajusta (+1/-1 por fila)
+    "CREATE TABLE IF NOT EXISTS competitor_domains ("
+    " domain TEXT PRIMARY KEY, url TEXT NOT NULL, name TEXT NOT NULL, name_key TEXT, label TEXT NOT NULL,"
+    " listed INTEGER NOT NULL, hda INTEGER NOT NULL, verified INTEGER NOT NULL) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS competitor_domains_name ON competitor_domains (name_key)",
+    "CREATE INDEX IF NOT EXISTS competitor_domains_label ON competitor_domains (label)",
+    "CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+)
+
+# Columnas de brand_competitors que alimentan los contadores de competitor_domains
+_COUNTED = "domain, url, name, name_key, label, classification, verified"
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_TITLE_SEPARATOR = re.compile(r"\s+[-|–:]\s+")
+
+def name_key(name: str) -> str:
+    """
+    Nombre comparable: minúsculas sin espacios ni signos y sin el resto del título
+    ('Paramount+ - Official Site' -> 'paramount').
+    """
+    return _NON_ALNUM.sub("", _TITLE_SEPARATOR.split(name or "", 1)[0].lower())
+
+def _placeholders(values: Iterable[Any]) -> str:
+    return ", ".join("?" for _ in values)
+
+def _index_row(row: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    """Fila de 'competitor_scans' -> fila del índice (None si la URL no tiene dominio registrable)."""
+    domain = registrable_domain(host_of(row["competitor_url"]))
+    if domain is None:
+        return None
+    meta = row.get("metadata") or {}
+    if isinstance(meta, str):
+        meta = json.loads(meta)
+    # En el fallback el nombre es el host ('www.netflix.com'): ahí alcanza con la etiqueta del dominio
+    name = meta.get("name") or domain
+    return (
+        normalize_brand_key(row["input_brand"]), row["input_brand"], domain, row["competitor_url"],
+        name, None if "." in name else name_key(name) or None, domain.split(".")[0],
+        row["classification"], row.get("justification") or "",
+        json.dumps(meta["signals"], ensure_ascii=False) if meta.get("signals") else None,
+        int(bool(meta["verified"])) if "verified" in meta else None, row["created_at"],
+    )
+
+def _newest_by_key(rows: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Conjunto actual por clave de marca: si la marca se guardó con distintas mayúsculas ('Hulu',
+    'hulu') gana el input_brand escrito más recientemente, como en `db.load_previous_scan`.
+    """
+    by_brand: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        by_brand.setdefault(row["input_brand"], []).append(row)
+    newest: Dict[str, Tuple[str, List[Dict[str, Any]]]] = {}
+    for brand, brand_rows in by_brand.items():
+        written = max(row["created_at"] for row in brand_rows)
+        key = normalize_brand_key(brand)
+        if key not in newest or written > newest[key][0]:
+            newest[key] = (written, brand_rows)
+    return {key: brand_rows for key, (_, brand_rows) in newest.items()}
+
+class CompetitorIndex:
+    """
+    Archivo SQLite en modo WAL. Las lecturas usan una conexión por hilo con `mmap_size`: las páginas
+    del índice se leen del mapeo en memoria en vez de copiarse con read(). Las escrituras se serializan.
+    """
+
+    def __init__(self, path: str, mmap_bytes: int = INDEX_MMAP_BYTES):
+        self.path = path
+        self.mmap_bytes = max(0, mmap_bytes)
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)}")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # --- Escritura ---
+
+    def _apply(self, conn: sqlite3.Connection, removed: Iterable[Tuple[Any, ...]],
+               added: Iterable[Tuple[Any, ...]]) -> None:
+        """
+        Ajusta los contadores de competitor_domains con las filas quitadas y agregadas (tuplas con
+        las columnas de `_COUNTED`). Recontar un dominio muy listado costaría una pasada por todas sus filas.
+        """
+        deltas: Dict[str, List[Any]] = {}
+        for sign, rows in ((-1, removed), (1, added)):
+            for domain, url, name, key, label, c_type, verified in rows:
+                delta = deltas.get(domain)
+                if delta is None:
+                    delta = deltas[domain] = [url, name, key, label, 0, 0, 0]
+                delta[4] += sign
+                delta[5] += sign * (c_type == "HDA")
+                delta[6] += sign * bool(verified)
+        changed = [(domain, *delta) for domain, delta in deltas.items() if any(delta[4:])]
+        if not changed:
+            return
+        conn.executemany(
+            "INSERT INTO competitor_domains (domain, url, name, name_key, label, listed, hda, verified)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (domain) DO UPDATE SET"
+            " listed = listed + excluded.listed, hda = hda + excluded.hda, verified = verified + excluded.verified,"
+            " name_key = COALESCE(name_key, excluded.name_key)",
+            changed,
+        )
+        conn.executemany("DELETE FROM competitor_domains WHERE domain = ? AND listed <= 0", [(row[0],) for row in changed])
+
+    def _insert(self, conn: sqlite3.Connection, rows: Iterable[Dict[str, Any]], counted: bool = True) -> int:
+        """INSERT OR REPLACE de filas de 'competitor_scans'. Con `counted` ajusta también competitor_domains."""
+        entries: Dict[Tuple[str, str], Tuple[Any, ...]] = {}
+        for entry in map(_index_row, rows):
+            if entry is not None:
+                entries[(entry[0], entry[2])] = entry  # Dos URLs del mismo dominio: gana la última
+        if counted:
+            replaced = [row for pair in entries for row in conn.execute(
+                f"SELECT {_COUNTED} FROM brand_competitors WHERE brand_key = ? AND domain = ?", pair
+            )]
+        conn.executemany(
+            "INSERT OR REPLACE INTO brand_competitors (brand_key, brand, domain, url, name, name_key, label,"
+            " classification, justification, signals, verified, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            list(entries.values()),
+        )
+        if counted:
+            self._apply(conn, replaced, (entry[2:8] + entry[10:11] for entry in entries.values()))
+        return len(entries)
+
+    def replace_brands(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Reemplaza el conjunto de cada marca presente en `rows` (filas de 'competitor_scans') por esas filas."""
+        current = _newest_by_key(rows)
+        if not current:
+            return 0
+        with self._write_lock, self._connect() as conn:
+            keys = list(current)
+            where = f"brand_key IN ({_placeholders(keys)})"
+            removed = conn.execute(f"SELECT {_COUNTED} FROM brand_competitors WHERE {where}", keys).fetchall()
+            conn.execute(f"DELETE FROM brand_competitors WHERE {where}", keys)
+            self._apply(conn, removed, ())
+            return self._insert(conn, (row for brand_rows in current.values() for row in brand_rows))
+
+    def upsert(self, rows: Iterable[Dict[str, Any]], counted: bool = True) -> int:
+        """Agrega o actualiza filas. `counted=False` (carga masiva) deja el resumen para `recount_domains`."""
+        with self._write_lock, self._connect() as conn:
+            return self._insert(conn, rows, counted)
+
+    def recount_domains(self) -> None:
+        """Recalcula competitor_domains entero desde brand_competitors (tras una reconstrucción)."""
+        with self._write_lock, self._connect() as conn:
+            conn.execute("DELETE FROM competitor_domains")
+            conn.execute(
+                "INSERT INTO competitor_domains (domain, url, name, name_key, label, listed, hda, verified)"
+                " SELECT domain, MAX(url), MAX(name), MAX(name_key), MAX(label), COUNT(*),"
+                " SUM(classification = 'HDA'), COUNT(verified = 1 OR NULL) FROM brand_competitors GROUP BY domain"
+            )
+
+    def delete(self, brand: str, urls: Iterable[str]) -> None:
+        domains = sorted({registrable_domain(host_of(url)) for url in urls} - {None})
+        if domains:
+            where = f"brand_key = ? AND domain IN ({_placeholders(domains)})"
+            params = (normalize_brand_key(brand), *domains)
+            with self._write_lock, self._connect() as conn:
+                removed = conn.execute(f"SELECT {_COUNTED} FROM brand_competitors WHERE {where}", params).fetchall()
+                conn.execute(f"DELETE FROM brand_competitors WHERE {where}", params)
+                self._apply(conn, removed, ())
+
+    def record_rows(self, rows: List[Dict[str, Any]], replace: bool = True) -> None:
+        """
+        Lo que escribió `db._upsert_rows`. Con `replace` (escaneos completos, la tabla se podó) el
+        conjunto de cada marca pasa a ser el de su escaneo más reciente, igual que `db.current_sets`.
+        """
+        if not replace:
+            self.upsert(rows)
+            return
+        newest: Dict[str, str] = {}
+        for row in rows:
+            newest[row["input_brand"]] = max(newest.get(row["input_brand"], ""), row["created_at"])
+        self.replace_brands(row for row in rows if row["created_at"] == newest[row["input_brand"]])
+
+    def record_delta(self, brand: str, rows: List[Dict[str, Any]], removed_urls: List[str]) -> None:
+        """Lo que escribió `db.save_scan_delta`: filas nuevas o reclasificadas y URLs borradas."""
+        if rows:
+            self.upsert(rows)
+        if removed_urls:
+            self.delete(brand, removed_urls)
+
+    def clear(self) -> None:
+        with self._write_lock, self._connect() as conn:
+            conn.execute("DELETE FROM brand_competitors")
+            conn.execute("DELETE FROM competitor_domains")
+            conn.execute("DELETE FROM index_meta")
+
+    def watermark(self) -> Optional[str]:
+        row = self._reader().execute("SELECT value FROM index_meta WHERE key = 'watermark'").fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, value: str) -> None:
+        with self._write_lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO index_meta (key, value) VALUES ('watermark', ?)", (value,))
+
+    # --- Lectura ---
+
+    def competitors_of(self, brand: str) -> List[Dict[str, Any]]:
+        """Competidores indexados de una marca: [{"domain", "url", "name", "type", "justification"}]."""
+        cursor = self._reader().execute(
+            "SELECT domain, url, name, classification, justification FROM brand_competitors"
+            " WHERE brand_key = ? ORDER BY classification, domain", (normalize_brand_key(brand),)
+        )
+        return [{"domain": domain, "url": url, "name": name, "type": c_type, "justification": justification}
+                for domain, url, name, c_type, justification in cursor.fetchall()]
+
+    def brands_for(self, domain: str, limit: Optional[int] = None) -> List[str]:
+        """Marcas cuyo escaneo lista al dominio como competidor, de la escrita más recientemente a la más antigua."""
+        cursor = self._reader().execute(
+            "SELECT brand FROM brand_competitors WHERE domain = ? ORDER BY updated_at DESC LIMIT ?",
+            (domain, -1 if limit is None else limit),
+        )
+        return [brand for (brand,) in cursor.fetchall()]
+
+    def domain_signals(self, domain: str, sample: int = INDEX_MAX_PEERS) -> Optional[Dict[str, Any]]:
+        """
+        Señales acumuladas de un dominio en todas las marcas: {"domain", "brands", "hda", "lda",
+        "verified", "signals"} (None si no está indexado). Las señales de verificación salen de
+        las `sample` clasificaciones más recientes.
+        """
+        conn = self._reader()
+        row = conn.execute("SELECT listed, hda, verified FROM competitor_domains WHERE domain = ?", (domain,)).fetchone()
+        if row is None:
+            return None
+        listed, hda, verified = row
+        signals: Dict[str, None] = {}
+        for (stored,) in conn.execute(
+            "SELECT signals FROM brand_competitors WHERE domain = ? AND signals IS NOT NULL"
+            " ORDER BY updated_at DESC LIMIT ?", (domain, sample)
+        ):
+            signals.update(dict.fromkeys(json.loads(stored)))
+        return {"domain": domain, "brands": listed, "hda": hda, "lda": listed - hda,
+                "verified": bool(verified), "signals": list(signals)}
+
+    def find_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Dominio conocido para un nombre ('Netflix' -> netflix.com), por el nombre con que lo
+        guardó Gemini o por la etiqueta del dominio. Si hay varios, el que listan más marcas.
+        """
+        key = name_key(name)
+        if not key:
+            return None
+        row = self._reader().execute(
+            "SELECT domain, url, name, listed FROM competitor_domains WHERE name_key = ? OR label = ?"
+            " ORDER BY listed DESC, domain LIMIT 1", (key, key)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"domain": row[0], "url": row[1], "name": row[2], "brands": row[3]}
+
+    def related(self, brand: str, own_domains: Iterable[str], limit: int,
+                max_peers: int = INDEX_MAX_PEERS) -> List[Dict[str, Any]]:
+        """
+        Competidores probables de una marca según otras: los de las marcas que listan alguno de
+        `own_domains` (su sitio; las `max_peers` más recientes) más su propio escaneo anterior, y
+        el sitio de esas mismas marcas. [{"domain", "url", "name", "justification", "brands", "hda",
+        "lda"}], primero lo que listan más marcas.
+        """
+        conn = self._reader()
+        key = normalize_brand_key(brand)
+        own = sorted({domain for domain in own_domains if domain})
+        # Quién lista a esta marca, y cómo la clasificó: (tipo, justificación, fecha) por marca relacionada
+        listed_as: Dict[str, Tuple[str, str, str]] = {}
+        for domain in own:
+            for peer, c_type, justification, written in conn.execute(
+                "SELECT brand_key, classification, justification, updated_at FROM brand_competitors"
+                " WHERE domain = ? AND brand_key != ? ORDER BY updated_at DESC LIMIT ?", (domain, key, max_peers)
+            ):
+                listed_as.setdefault(peer, (c_type, justification, written))
+        peers = [key] + sorted(listed_as, key=lambda peer: listed_as[peer][2], reverse=True)[:max_peers]
+
+        seeds: Dict[str, Dict[str, Any]] = {}
+
+        def add(domain: str, url: str, name: str, justification: str, lister: str, c_type: str, written: str) -> None:
+            seed = seeds.get(domain)
+            if seed is None:
+                seed = seeds[domain] = {"domain": domain, "listed_by": set(), "hda": 0, "lda": 0, "written": ""}
+            if written >= seed["written"]:
+                seed.update(url=url, name=name, justification=justification, written=written)
+            if lister not in seed["listed_by"]:
+                seed["listed_by"].add(lister)
+                seed["hda" if c_type == "HDA" else "lda"] += 1
+
+        for peer, domain, url, name, c_type, justification, written in conn.execute(
+            "SELECT brand_key, domain, url, name, classification, justification, updated_at FROM brand_competitors"
+            f" WHERE brand_key IN ({_placeholders(peers)})", peers
+        ):
+            if domain not in own:
+                add(domain, url, name, justification, peer, c_type, written)
+
+        # Quien lista a esta marca como competidor también compite con ella: su sitio es candidato
+        for peer in peers[1:]:
+            site = registrable_domain(peer) if "." in peer else None
+            found = {"domain": site, "url": f"https://{site}", "name": site} if site else self.find_by_name(peer)
+            if found and found["domain"] not in own:
+                c_type, justification, written = listed_as[peer]
+                add(found["domain"], found["url"], found["name"], justification, peer, c_type, written)
+
+        ranked = sorted(seeds.values(), key=lambda s: (-len(s["listed_by"]), -s["hda"], s["domain"]))[:max(0, limit)]
+        return [{"domain": s["domain"], "url": s["url"], "name": s["name"], "justification": s["justification"],
+                 "brands": len(s["listed_by"]), "hda": s["hda"], "lda": s["lda"]} for s in ranked]
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._reader()
+        rows, brands = conn.execute("SELECT COUNT(*), COUNT(DISTINCT brand_key) FROM brand_competitors").fetchone()
+        (domains,) = conn.execute("SELECT COUNT(*) FROM competitor_domains").fetchone()
+        return {"rows": rows, "brands": brands, "domains": domains, "watermark": self.watermark(),
+                "bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0}
+
+_index: Optional[CompetitorIndex] = None
+_index_disabled = False
+_index_lock = threading.Lock()
+
+def get_competitor_index() -> Optional[CompetitorIndex]:
+    """Índice en COMPAS_INDEX_PATH ('' = desactivado). None si está desactivado o no se pudo abrir."""
+    global _index, _index_disabled
+    if _index is None and not _index_disabled:
+        with _index_lock:
+            if _index is None and not _index_disabled:
+                path = os.environ.get("COMPAS_INDEX_PATH", INDEX_DEFAULT_PATH)
+                if not path:
+                    _index_disabled = True
+                    return None
+                try:
+                    mmap_bytes = int(os.environ.get("COMPAS_INDEX_MMAP_BYTES", INDEX_MMAP_BYTES))
+                except ValueError:
+                    mmap_bytes = INDEX_MMAP_BYTES
+                try:
+                    _index = CompetitorIndex(path, mmap_bytes)
+                except (OSError, sqlite3.Error) as e:
+                    print(f"⚠️ Índice de competidores no disponible ({e}).")
+                    _index_disabled = True
+    return _index
+
+def sync_competitor_index(full: bool = False, page_rows: int = INDEX_SYNC_PAGE_ROWS) -> Dict[str, Any]:
+    """
+    Trae al índice lo escrito en 'competitor_scans' desde la marca de agua. Por cada página de
+    filas nuevas se releen los conjuntos completos de esas marcas (así se reflejan también los
+    competidores podados); nunca se relee la tabla entera, salvo con `full` (reconstrucción).
+    """
+    from . import db
+
+    index = get_competitor_index()
+    if index is None:
+        return {"status": "disabled"}
+    if not db.persistence_configured():
+        return {"status": "no_db"}
+
+    with telemetry.span("index.sync", full=full) as span:
+        if full:
+            index.clear()
+        after = index.watermark()
+        rows_read = brands = 0
+        while True:
+            rows = db.rows_since(after, page_rows)
+            if not rows:
+                break
+            rows_read += len(rows)
+            if full:
+                # La tabla guarda el conjunto actual de cada marca: alcanza con copiar las filas
+                index.upsert(rows, counted=False)
+                brands += len({row["input_brand"] for row in rows})
+            else:
+                changed = sorted({row["input_brand"] for row in rows})
+                index.replace_brands(db.brand_rows(changed))
+                brands += len(changed)
+            last = rows[-1]["created_at"]
+            if len(rows) < page_rows:
+                after = last
+                index.set_watermark(after)
+                break
+            # Página llena: el último created_at (un escaneo) puede seguir en la página siguiente
+            earlier = [row["created_at"] for row in rows if row["created_at"] < last]
+            after = earlier[-1] if earlier else last
+            index.set_watermark(after)
+        if full:
+            index.recount_domains()
+        span.set(rows=rows_read, brands=brands)
+    return {"status": "ok", "rows_read": rows_read, "brands_updated": brands, **index.stats()}
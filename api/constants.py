@@ -68,3 +68,129 @@ NEWS_TECH_DOMAINS = {
     "forbes", "bloomberg", "reuters", "cnn", "bbc", "nytimes", "wsj",
     "theguardian", "usatoday", "time", "newsweek", "substack"
 }
+
+# Máximo de consultas simultáneas a Google CSE por etapa de un escaneo (override: COMPAS_MAX_CONCURRENCY)
+DEFAULT_SCAN_CONCURRENCY = 4
+
+# Presupuesto de tiempo por escaneo (?budget_ms=; override del default: COMPAS_SCAN_BUDGET_MS, vacío = sin límite)
+SCAN_BUDGET_MIN_MS = 100
+SCAN_BUDGET_MAX_MS = 60 * 1000
+SCAN_CONTEXT_BUDGET_FRACTION = 0.5  # Tope para leer la homepage de la marca (las keywords no justifican todo el presupuesto)
+SCAN_HEDGE_FRACTION = 0.25  # Si Gemini no respondió tras esta fracción del presupuesto, el fallback CSE arranca en paralelo
+SCAN_FINALIZE_RESERVE_SECONDS = 0.15  # Tiempo que se guarda para clasificar lo obtenido y responder
+SPECULATIVE_MAX_WORKERS = 32  # Hilos compartidos para las etapas que corren en paralelo (Gemini, fan-out)
+
+# Caché de escaneos (overrides: COMPAS_CACHE_BACKEND, COMPAS_CACHE_TTL, COMPAS_CACHE_MAX_ENTRIES, COMPAS_CACHE_PATH)
+DEFAULT_CACHE_BACKENDS = "memory"  # Lista separada por comas: memory, sqlite, supabase
+DEFAULT_CACHE_TTL_SECONDS = 6 * 60 * 60
+DEFAULT_CACHE_MAX_ENTRIES = 512
+DEFAULT_CACHE_PATH = "/tmp/compas_cache.sqlite"
+
+# Estado de los escaneos incrementales: contexto, validadores HTTP y clasificaciones por marca
+# (override: COMPAS_STATE_PATH, '' = solo memoria)
+SCAN_STATE_DEFAULT_PATH = "/tmp/compas_scan_state.sqlite"
+SCAN_STATE_MAX_ENTRIES = 4096
+
+# Modo batch (override: COMPAS_BATCH_WORKERS)
+DEFAULT_BATCH_WORKERS = 8
+MAX_BATCH_BRANDS = 1000  # Por POST; la CLI batch_scan.py no tiene tope
+
+# Cliente HTTP compartido (overrides: COMPAS_HTTP2, COMPAS_HTTP_MAX_PER_HOST)
+HTTP_CONNECT_TIMEOUT = 3.05
+HTTP_READ_TIMEOUT = 10.0
+HTTP_MAX_RETRIES = 2
+HTTP_BACKOFF_SECONDS = 0.5
+HTTP_RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Un 429 cuyo cuerpo dice que se agotó la cuota del día no es un límite de tasa: reintentarlo solo
+# gasta el presupuesto del escaneo (la cuota la maneja quota.py). Se buscan en minúsculas.
+HTTP_DAILY_QUOTA_MARKERS = (b"dailylimitexceeded", b"per day")
+HTTP_MAX_CONNECTIONS_PER_HOST = 8
+
+# Lectura parcial de homepages: se corta en </head> o al llegar al tope (override: COMPAS_HEAD_MAX_BYTES)
+HTTP_HEAD_MAX_BYTES = 256 * 1024
+HTTP_HEAD_CHUNK_BYTES = 16 * 1024
+
+# Caché de respuestas de Gemini (overrides: GEMINI_CACHE_TTL, GEMINI_CACHE_PATH).
+# GEMINI_API_ENDPOINT apunta el SDK a otro host (proxy, stand-in local) usando el transporte REST.
+# Subir GEMINI_PROMPT_VERSION al cambiar el prompt invalida las respuestas cacheadas.
+GEMINI_PROMPT_VERSION = "v1"
+GEMINI_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+GEMINI_CACHE_MAX_ENTRIES = 2048
+GEMINI_DEFAULT_CACHE_PATH = "/tmp/compas_gemini_cache.sqlite"
+
+# Modo batch de Gemini para trabajos masivos: N marcas por prompt, respuesta JSON por esquema
+# (overrides: COMPAS_GEMINI_BATCH_SIZE, 1 = un prompt por marca; COMPAS_GEMINI_BATCH_CONCURRENCY)
+GEMINI_BATCH_SIZE = 10
+GEMINI_BATCH_MAX_SIZE = 25  # Más marcas por prompt alargan la respuesta y el riesgo de que se corte
+GEMINI_BATCH_CONCURRENCY = 2  # Prompts batch en vuelo a la vez (el límite de RPM de Gemini es bajo)
+
+# Verificación de candidatos de Gemini (overrides: COMPAS_ENRICH, COMPAS_ENRICH_WORKERS, COMPAS_ENRICH_TTL)
+DEFAULT_ENRICH_WORKERS = 16
+ENRICH_CONNECT_TIMEOUT = 2.0
+ENRICH_READ_TIMEOUT = 3.0
+ENRICH_DEAD_STATUSES = {404, 410}
+ENRICH_CACHE_TTL_SECONDS = 24 * 60 * 60
+ENRICH_CACHE_MAX_ENTRIES = 4096
+
+# Cuota de Google CSE (overrides: COMPAS_CSE_DAILY_BUDGET, COMPAS_CSE_RATE, COMPAS_CSE_BURST,
+# COMPAS_CSE_CACHE_TTL, COMPAS_CSE_CACHE_PATH, COMPAS_CSE_BUDGET_PATH). El plan gratuito da 100 consultas/día.
+# El endpoint se puede apuntar a un proxy o a un stand-in local con GOOGLE_CSE_ENDPOINT.
+CSE_DEFAULT_ENDPOINT = "https://www.googleapis.com/customsearch/v1"
+CSE_DAILY_BUDGET = 100
+CSE_RATE_PER_SECOND = 2.0
+CSE_RATE_BURST = 8
+CSE_MAX_WAIT_SECONDS = 2.0
+CSE_CACHE_TTL_SECONDS = 24 * 60 * 60
+CSE_CACHE_MAX_ENTRIES = 4096
+CSE_DEFAULT_CACHE_PATH = "/tmp/compas_cse_cache.sqlite"
+CSE_DEFAULT_BUDGET_PATH = "/tmp/compas_cse_budget.json"
+
+# Nombres descubiertos en snippets que se buscan directamente (cada uno cuesta una consulta CSE)
+MAX_DIRECT_LOOKUPS = 5
+
+# Máximo de entradas por lista (HDA/LDA/Descartados) en el reporte de la búsqueda web
+MAX_REPORT_ITEMS = 5
+
+# Términos de industria que, junto a un dominio limpio, señalan un competidor
+INDUSTRY_TERMS = ("streaming", "video", "subscription", "movies", "tv", "watch")
+
+# Persistencia de 'competitor_scans' (overrides: COMPAS_DB_BACKEND=supabase|sqlite, COMPAS_DB_PATH,
+# COMPAS_DB_WRITE_BEHIND). El upsert necesita un índice único sobre estas columnas.
+DB_CONFLICT_COLUMNS = "input_brand,competitor_url"
+DB_DEFAULT_SQLITE_PATH = "/tmp/compas_scans.sqlite"
+DB_UPSERT_CHUNK_ROWS = 500
+DB_WRITE_BEHIND_INTERVAL_SECONDS = 0.5
+DB_WRITE_BEHIND_FLUSH_TIMEOUT_SECONDS = 10.0
+
+# Dominios: Public Suffix List empaquetada en api/data (override: COMPAS_PSL_PATH con la lista completa)
+# y tamaño de las cachés LRU de host -> dominio registrable y de URLs normalizadas
+DOMAIN_CACHE_MAX_ENTRIES = 65536
+
+# Pre-calentamiento de marcas populares (overrides: COMPAS_REQUEST_LOG, COMPAS_PREWARM_TOP, COMPAS_PREWARM_LEAD,
+# COMPAS_PREWARM_INTERVAL, COMPAS_PREWARM_WORKERS, COMPAS_PREWARM_MAX_SCANS, COMPAS_PREWARM_CSE_RESERVE)
+PREWARM_TOP_BRANDS = 200
+PREWARM_LEAD_SECONDS = 30 * 60  # Se re-escanea lo que vence dentro de este margen
+PREWARM_INTERVAL_SECONDS = 10 * 60
+PREWARM_LOG_WINDOW_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_PREWARM_WORKERS = 2
+PREWARM_MAX_SCANS = 100  # Por ciclo
+PREWARM_CSE_RESERVE = 30  # Consultas CSE del día que el pre-calentamiento deja para los usuarios
+
+# Índice de competidores entre marcas, armado con los escaneos guardados (overrides: COMPAS_INDEX_PATH,
+# '' = desactivado; COMPAS_INDEX_MMAP_BYTES)
+INDEX_DEFAULT_PATH = "/tmp/compas_competitor_index.sqlite"
+INDEX_MMAP_BYTES = 64 * 1024 * 1024
+INDEX_MAX_SEEDS = 10  # Candidatos sembrados por escaneo (los competidores de las marcas relacionadas)
+INDEX_MAX_PEERS = 50  # Marcas relacionadas consultadas (las más recientes): un dominio muy listado no recorre todo el índice
+INDEX_SYNC_PAGE_ROWS = 1000
+
+# Motor de keywords: IDF del corpus de homepages leídas (override: COMPAS_IDF_PATH, '' = solo memoria)
+KEYWORDS_IDF_DEFAULT_PATH = "/tmp/compas_keyword_idf.bin"
+KEYWORDS_MIN_DOCS = 20  # Con menos homepages el IDF no es confiable: se puntúa por frecuencia simple
+KEYWORDS_MAX_VOCAB = 200000
+KEYWORDS_SAVE_EVERY_DOCS = 25  # Homepages nuevas entre escrituras del archivo
+KEYWORDS_VECTORIZE_MIN_DOCS = 256  # Lotes más chicos se puntúan en Python puro aunque numpy esté instalado
+
+# Serialización JSON incremental (jsonstream.py): bloques escritos al destino y listas que se codifican de una vez
+JSON_STREAM_BUFFER_BYTES = 64 * 1024
+JSON_STREAM_INLINE_ITEMS = 256  # Listas más largas se codifican de a tramos de este tamaño
@@ -1,67 +1,559 @@
+import atexit
+import json
 import os
-from supabase import create_client, Client
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
 
-# Inicialización del Cliente (Singleton pattern simple)
-url: str = os.environ.get("SUPABASE_URL")
-key: str = os.environ.get("SUPABASE_KEY")
+from . import telemetry
+from .constants import (
+    DB_CONFLICT_COLUMNS, DB_DEFAULT_SQLITE_PATH, DB_UPSERT_CHUNK_ROWS,
+    DB_WRITE_BEHIND_FLUSH_TIMEOUT_SECONDS, DB_WRITE_BEHIND_INTERVAL_SECONDS, MAX_REPORT_ITEMS
+)
+from .domains import normalize_brand_key
+from .jsonstream import json_size
 
-# Validación de seguridad para el desarrollador
-if not url or not key:
-    raise ValueError("❌ Error de Configuración: Faltan SUPABASE_URL o SUPABASE_KEY en las variables de entorno.")
+if TYPE_CHECKING:
+    from supabase import Client
 
-supabase: Client = create_client(url, key)
+# Cliente de Supabase (Singleton): el SDK se importa y el cliente se crea en el primer uso,
+# así los cold starts que no tocan la DB (preflight, errores de validación) no lo pagan.
+_client: Optional["Client"] = None
+_client_lock = threading.Lock()
 
-def get_supabase_client() -> Client:
-    """Inicializa y devuelve el cliente de Supabase."""
-    url: str = os.environ.get("SUPABASE_URL")
-    key: str = os.environ.get("SUPABASE_KEY")
+def get_supabase_client() -> "Client":
+    """Devuelve el cliente de Supabase, creándolo una sola vez por proceso."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                url: str = os.environ.get("SUPABASE_URL")
+                key: str = os.environ.get("SUPABASE_KEY")
 
-    if not url or not key:
-        raise ValueError("❌ Error de Configuración: Faltan SUPABASE_URL o SUPABASE_KEY en las variables de entorno.")
+                # Validación de seguridad para el desarrollador
+                if not url or not key:
+                    raise ValueError("❌ Error de Configuración: Faltan SUPABASE_URL o SUPABASE_KEY en las variables de entorno.")
 
-    return create_client(url, key)
+                from supabase import create_client
+                _client = create_client(url, key)
+    return _client
+
+# --- Backends de 'competitor_scans' ---
+
+class SupabaseStore:
+    """Tabla 'competitor_scans' en Supabase. El upsert requiere el índice único (input_brand, competitor_url)."""
+    name = "supabase"
+
+    def upsert(self, rows: List[Dict[str, Any]]) -> None:
+        get_supabase_client().table('competitor_scans').upsert(rows, on_conflict=DB_CONFLICT_COLUMNS).execute()
+
+    def delete(self, brand_input: str, urls: List[str]) -> None:
+        (get_supabase_client().table('competitor_scans').delete()
+         .eq('input_brand', brand_input).in_('competitor_url', urls).execute())
+
+    def prune(self, brand_input: str, keep_urls: List[str]) -> None:
+        (get_supabase_client().table('competitor_scans').delete()
+         .eq('input_brand', brand_input).not_.in_('competitor_url', keep_urls).execute())
+
+    def latest_rows(self, pattern: str, limit: int) -> List[Dict[str, Any]]:
+        response = (
+            get_supabase_client().table('competitor_scans')
+            .select('input_brand, competitor_url, classification, justification, metadata, created_at')
+            .ilike('input_brand', pattern)
+            .order('created_at', desc=True)
+            .limit(limit)
+            .execute()
+        )
+        return response.data or []
+
+    def key_rows(self, brand_key: str, limit: int) -> List[Dict[str, Any]]:
+        response = (
+            get_supabase_client().table('competitor_scans')
+            .select('input_brand, competitor_url, classification, justification, metadata, created_at')
+            .eq('brand_key', brand_key)
+            .order('created_at', desc=True)
+            .limit(limit)
+            .execute()
+        )
+        return response.data or []
+
+    def rows_since(self, after: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        query = (get_supabase_client().table('competitor_scans')
+                 .select('input_brand, competitor_url, classification, justification, metadata, created_at'))
+        if after:
+            query = query.gt('created_at', after)
+        return query.order('created_at').limit(limit).execute().data or []
+
+    def brand_rows(self, brands: List[str]) -> List[Dict[str, Any]]:
+        response = (
+            get_supabase_client().table('competitor_scans')
+            .select('input_brand, competitor_url, classification, justification, metadata, created_at')
+            .in_('input_brand', brands)
+            .execute()
+        )
+        return response.data or []
+
+    def recent_brands(self, limit: int) -> List[Tuple[str, str]]:
+        # PostgREST no agrupa: se leen las filas más recientes (hasta 2 * MAX_REPORT_ITEMS por marca)
+        response = (
+            get_supabase_client().table('competitor_scans')
+            .select('input_brand, created_at')
+            .order('created_at', desc=True)
+            .limit(limit * 2 * MAX_REPORT_ITEMS)
+            .execute()
+        )
+        newest: Dict[str, str] = {}
+        for row in response.data or []:
+            newest.setdefault(row['input_brand'], row['created_at'])
+        return list(newest.items())[:limit]
+
+class SQLiteStore:
+    """
+    La misma tabla en un archivo SQLite local, para desarrollo y pruebas sin red.
+    `metadata` se guarda como texto JSON; el ILIKE de Postgres se traduce a LIKE (ya insensible a mayúsculas).
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS competitor_scans ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " input_brand TEXT NOT NULL, competitor_url TEXT NOT NULL,"
+                " classification TEXT, justification TEXT, metadata TEXT, created_at TEXT NOT NULL,"
+                " brand_key TEXT, UNIQUE (input_brand, competitor_url))"
+            )
+            self._migrate_brand_key(conn)
+            conn.execute("CREATE INDEX IF NOT EXISTS competitor_scans_created_at ON competitor_scans (created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS competitor_scans_brand_key ON competitor_scans (brand_key, created_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    @staticmethod
+    def _migrate_brand_key(conn: sqlite3.Connection) -> None:
+        """Tablas creadas antes de la columna `brand_key`: se agrega y se completa desde input_brand."""
+        if any(column[1] == "brand_key" for column in conn.execute("PRAGMA table_info(competitor_scans)")):
+            return
+        conn.execute("ALTER TABLE competitor_scans ADD COLUMN brand_key TEXT")
+        brands = [brand for (brand,) in conn.execute("SELECT DISTINCT input_brand FROM competitor_scans")]
+        conn.executemany("UPDATE competitor_scans SET brand_key = ? WHERE input_brand = ?",
+                         [(normalize_brand_key(brand), brand) for brand in brands])
+
+    def upsert(self, rows: List[Dict[str, Any]]) -> None:
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO competitor_scans"
+                " (input_brand, competitor_url, classification, justification, metadata, created_at, brand_key)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (input_brand, competitor_url) DO UPDATE SET"
+                " classification = excluded.classification, justification = excluded.justification,"
+                " metadata = excluded.metadata, created_at = excluded.created_at, brand_key = excluded.brand_key",
+                [(r["input_brand"], r["competitor_url"], r["classification"], r["justification"],
+                  json.dumps(r.get("metadata"), ensure_ascii=False), r["created_at"],
+                  r.get("brand_key") or normalize_brand_key(r["input_brand"])) for r in rows],
+            )
+
+    def delete(self, brand_input: str, urls: List[str]) -> None:
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM competitor_scans WHERE input_brand = ? AND competitor_url = ?",
+                             [(brand_input, url) for url in urls])
+
+    def prune(self, brand_input: str, keep_urls: List[str]) -> None:
+        placeholders = ", ".join("?" for _ in keep_urls)
+        with self._connect() as conn:
+            conn.execute(f"DELETE FROM competitor_scans WHERE input_brand = ? AND competitor_url NOT IN ({placeholders})",
+                         (brand_input, *keep_urls))
+
+    _COLUMNS = "input_brand, competitor_url, classification, justification, metadata, created_at"
+
+    @staticmethod
+    def _rows(cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+        return [
+            {"input_brand": brand, "competitor_url": url, "classification": classification,
+             "justification": justification, "metadata": json.loads(metadata) if metadata else None,
+             "created_at": created_at}
+            for brand, url, classification, justification, metadata, created_at in cursor.fetchall()
+        ]
+
+    def latest_rows(self, pattern: str, limit: int) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            return self._rows(conn.execute(
+                f"SELECT {self._COLUMNS}"
+                " FROM competitor_scans WHERE input_brand LIKE ? ESCAPE '\\' ORDER BY created_at DESC, id LIMIT ?",
+                (pattern, limit),
+            ))
+
+    def key_rows(self, brand_key: str, limit: int) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            return self._rows(conn.execute(
+                f"SELECT {self._COLUMNS}"
+                " FROM competitor_scans WHERE brand_key = ? ORDER BY created_at DESC, id LIMIT ?",
+                (brand_key, limit),
+            ))
+
+    def rows_since(self, after: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            return self._rows(conn.execute(
+                f"SELECT {self._COLUMNS} FROM competitor_scans WHERE created_at > ? ORDER BY created_at, id LIMIT ?",
+                (after or "", limit),
+            ))
+
+    def brand_rows(self, brands: List[str]) -> List[Dict[str, Any]]:
+        placeholders = ", ".join("?" for _ in brands)
+        with self._connect() as conn:
+            return self._rows(conn.execute(
+                f"SELECT {self._COLUMNS} FROM competitor_scans WHERE input_brand IN ({placeholders})", brands
+            ))
+
+    def recent_brands(self, limit: int) -> List[Tuple[str, str]]:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "SELECT input_brand, MAX(created_at) AS last_write FROM competitor_scans"
+                " GROUP BY input_brand ORDER BY last_write DESC LIMIT ?",
+                (limit,),
+            )
+            return [(brand, created_at) for brand, created_at in cursor.fetchall()]
+
+_store: Any = None
+_store_lock = threading.Lock()
+
+def _backend_name() -> str:
+    return os.environ.get("COMPAS_DB_BACKEND", "supabase").lower()
+
+def get_store() -> Any:
+    """Backend según COMPAS_DB_BACKEND: 'supabase' (default) o 'sqlite' (archivo en COMPAS_DB_PATH)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if _backend_name() == "sqlite":
+                    _store = SQLiteStore(os.environ.get("COMPAS_DB_PATH", DB_DEFAULT_SQLITE_PATH))
+                else:
+                    _store = SupabaseStore()
+    return _store
+
+def persistence_configured() -> bool:
+    """True si hay dónde guardar: backend SQLite local o credenciales de Supabase."""
+    return _backend_name() == "sqlite" or bool(os.environ.get("SUPABASE_URL"))
+
+# --- Escritura ---
+
+def build_scan_rows(brand_input: str, scan_report: Dict[str, Any], created_at: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Convierte el reporte JSON jerárquico (HDA/LDA) en filas individuales
+    para la tabla 'competitor_scans'. Todas las filas de un escaneo llevan el mismo `created_at`:
+    con upsert la fila existente no vuelve a recibir el default de la columna.
+    """
+    created_at = created_at or datetime.now(timezone.utc).isoformat(timespec="microseconds")
+    brand_key = normalize_brand_key(brand_input)
+    rows: List[Dict[str, Any]] = []
+    for classification in ("HDA", "LDA"):
+        for item in scan_report.get(f"{classification}_Competitors", []):
+            rows.append({
+                "input_brand": brand_input,
+                "competitor_url": item["url"],
+                "classification": classification,
+                "justification": item["justification"],
+                # 'metadata' es útil para guardar el objeto completo si queremos analizarlo luego
+                "metadata": item,
+                "created_at": created_at,
+                # Clave de la caché de escaneos (scan_cache.normalize_brand_key): 'https://www.hulu.com' -> 'hulu.com'
+                "brand_key": brand_key
+            })
+    return rows
+
+def dedupe_rows(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Una fila por (input_brand, competitor_url), gana la última: Postgres rechaza un upsert que toca dos veces la misma fila."""
+    latest: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for row in rows:
+        key = (row["input_brand"], row["competitor_url"])
+        latest.pop(key, None)
+        latest[key] = row
+    return list(latest.values())
+
+def current_sets(rows: Iterable[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """URLs del escaneo más reciente de cada marca (las filas de un escaneo comparten created_at)."""
+    newest: Dict[str, str] = {}
+    urls: Dict[str, List[str]] = {}
+    for row in rows:
+        brand, created_at = row["input_brand"], row["created_at"]
+        if brand not in newest or created_at > newest[brand]:
+            newest[brand], urls[brand] = created_at, []
+        if created_at == newest[brand]:
+            urls[brand].append(row["competitor_url"])
+    return urls
+
+def _update_competitor_index(apply: Callable[[Any], None]) -> None:
+    """Refleja lo recién escrito en el índice de competidores (competitor_index.py). Un fallo no afecta al guardado."""
+    from .competitor_index import get_competitor_index
+    try:
+        index = get_competitor_index()
+        if index is not None:
+            apply(index)
+    except Exception as e:
+        print(f"⚠️ No se pudo actualizar el índice de competidores ({e}).")
+
+def _upsert_rows(rows_to_write: List[Dict[str, Any]], prune: bool = True) -> bool:
+    """
+    Upsert en Batch (en bloques de DB_UPSERT_CHUNK_ROWS filas) sobre (input_brand, competitor_url).
+    Con `prune` las filas son escaneos completos: se borran los competidores de cada marca que
+    ya no aparecen, así la tabla guarda exactamente el conjunto actual de cada marca (sin historial:
+    `_latest_report` y los deltas de incremental.py dependen de eso).
+    """
+    if not rows_to_write:
+        print("⚠️ Advertencia: El reporte estaba vacío, no se guardó nada.")
+        return False
+
+    rows = dedupe_rows(rows_to_write)
+    try:
+        store = get_store()
+        with telemetry.span("db.upsert", table="competitor_scans", backend=store.name, rows=len(rows)) as span:
+            if span is not telemetry.NOOP_SPAN:
+                # Tamaño sin armar el JSON completo (en un batch son decenas de miles de filas)
+                span.set(bytes=json_size(rows))
+            for start in range(0, len(rows), DB_UPSERT_CHUNK_ROWS):
+                store.upsert(rows[start:start + DB_UPSERT_CHUNK_ROWS])
+            if prune:
+                for brand_input, keep_urls in current_sets(rows).items():
+                    store.prune(brand_input, keep_urls)
+        print(f"✅ Éxito: Se guardaron {len(rows)} competidores en la base de datos.")
+        _update_competitor_index(lambda index: index.record_rows(rows, replace=prune))
+        return True
+    except Exception as e:
+        print(f"❌ Error guardando en la base de datos: {e}")
+        return False
 
 def save_scan_results(brand_input, scan_report):
     """
-    Toma el reporte JSON jerárquico (HDA/LDA) y lo inserta 
+    Toma el reporte JSON jerárquico (HDA/LDA) y lo guarda (upsert)
     como filas individuales en la tabla 'competitor_scans'.
     """
+    return _upsert_rows(build_scan_rows(brand_input, scan_report))
 
-    # 1. Obtener el cliente de Supabase CADA VEZ que guardamos
-    supabase = get_supabase_client()
-
-    rows_to_insert = []
-
-    # 2. Procesar Competidores HDA (Alta Disponibilidad)
-    for item in scan_report.get("HDA_Competitors", []):
-        rows_to_insert.append({
-            "input_brand": brand_input,
-            "competitor_url": item["url"],
-            "classification": "HDA",
-            "justification": item["justification"],
-            # 'metadata' es útil para guardar el objeto completo si queremos analizarlo luego
-            "metadata": item 
-        })
-
-    # 3. Procesar Competidores LDA (Baja Disponibilidad)
-    for item in scan_report.get("LDA_Competitors", []):
-        rows_to_insert.append({
-            "input_brand": brand_input,
-            "competitor_url": item["url"],
-            "classification": "LDA",
-            "justification": item["justification"],
-            "metadata": item
-        })
-
-    # 4. Inserción en Batch a Supabase
-    if rows_to_insert:
-        try:
-            data, count = supabase.table('competitor_scans').insert(rows_to_insert).execute()
-            print(f"✅ Éxito: Se guardaron {len(rows_to_insert)} competidores en la base de datos.")
-            return True
-        except Exception as e:
-            print(f"❌ Error guardando en Supabase: {e}")
-            return False
-    else:
-        print("⚠️ Advertencia: El reporte estaba vacío, no se guardó nada.")
-        return False
\ No newline at end of file
+def save_batch_results(results: Iterable[Tuple[str, Dict[str, Any]]]) -> bool:
+    """
+    Guarda los reportes de muchas marcas con UN solo upsert (partido en bloques si es muy grande).
+    `results` es una secuencia de (brand_input, scan_report).
+    """
+    rows: List[Dict[str, Any]] = []
+    for brand_input, scan_report in results:
+        rows.extend(build_scan_rows(brand_input, scan_report))
+    return _upsert_rows(rows)
+
+def save_scan_delta(brand_input: str, scan_report: Dict[str, Any], delta: Dict[str, Any]) -> bool:
+    """
+    Escritura incremental: upsert solo de los competidores nuevos o reclasificados y borrado
+    de los que desaparecieron. Las filas sin cambios no se tocan (conservan su created_at).
+    `delta` es el resultado de `incremental.diff_reports`.
+    """
+    touched = {entry["url"] for entry in delta["added"]} | {entry["url"] for entry in delta["changed"]}
+    rows = [row for row in build_scan_rows(brand_input, scan_report) if row["competitor_url"] in touched]
+    removed = [entry["url"] for entry in delta["removed"]]
+    if not rows and not removed:
+        print(f"✅ Sin cambios para '{brand_input}': nada que escribir.")
+        return True
+
+    try:
+        store = get_store()
+        with telemetry.span("db.delta", table="competitor_scans", backend=store.name,
+                            upserted=len(rows), deleted=len(removed)):
+            if rows:
+                store.upsert(rows)
+            if removed:
+                store.delete(brand_input, removed)
+        print(f"✅ Delta guardado para '{brand_input}': {len(rows)} filas escritas, {len(removed)} borradas.")
+        _update_competitor_index(lambda index: index.record_delta(brand_input, rows, removed))
+        return True
+    except Exception as e:
+        print(f"❌ Error guardando el delta en la base de datos: {e}")
+        return False
+
+class WriteBehindQueue:
+    """
+    Escritura diferida: `submit` vuelve de inmediato y un hilo de fondo junta las filas de
+    los escaneos que lleguen durante `interval` segundos en un solo upsert.
+    `flush` espera a que todo lo encolado esté escrito.
+    """
+
+    def __init__(self, interval: float = DB_WRITE_BEHIND_INTERVAL_SECONDS):
+        self.interval = interval
+        self._pending: List[Dict[str, Any]] = []
+        self._writing = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, rows: List[Dict[str, Any]]) -> None:
+        with self._cond:
+            self._pending.extend(rows)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="compas-write-behind", daemon=True)
+                self._thread.start()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # Dar tiempo a que lleguen más escaneos (un flush lo despierta antes)
+                self._cond.wait(timeout=self.interval)
+                batch, self._pending = self._pending, []
+                self._writing = True
+            try:
+                _upsert_rows(batch)
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+
+    def flush(self, timeout: float = DB_WRITE_BEHIND_FLUSH_TIMEOUT_SECONDS) -> bool:
+        """Fuerza la escritura de lo pendiente y espera. False si no terminó dentro de `timeout`."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._writing:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.notify_all()
+                self._cond.wait(timeout=min(remaining, 0.05))
+        return True
+
+_write_behind: Optional[WriteBehindQueue] = None
+_write_behind_lock = threading.Lock()
+
+def write_behind_enabled() -> bool:
+    """
+    COMPAS_DB_WRITE_BEHIND=1: la respuesta no espera a la DB. Solo para procesos de larga vida
+    (ASGI, batch): en Vercel el proceso se congela al responder y la cola quedaría sin escribir.
+    """
+    return os.environ.get("COMPAS_DB_WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+
+def get_write_behind() -> WriteBehindQueue:
+    global _write_behind
+    if _write_behind is None:
+        with _write_behind_lock:
+            if _write_behind is None:
+                _write_behind = WriteBehindQueue()
+                atexit.register(flush_pending_writes)
+    return _write_behind
+
+def flush_pending_writes(timeout: float = DB_WRITE_BEHIND_FLUSH_TIMEOUT_SECONDS) -> bool:
+    """Escribe lo que quede en la cola diferida (al apagar el servidor o al terminar un job)."""
+    if _write_behind is None:
+        return True
+    done = _write_behind.flush(timeout)
+    if not done:
+        print(f"⚠️ Quedaron {_write_behind.pending()} filas sin escribir en la base de datos.")
+    return done
+
+def persist_scan(brand_input: str, scan_report: Dict[str, Any]) -> bool:
+    """Guarda un escaneo: a la cola diferida si COMPAS_DB_WRITE_BEHIND=1, si no en el momento."""
+    if not write_behind_enabled():
+        return save_scan_results(brand_input, scan_report)
+    rows = build_scan_rows(brand_input, scan_report)
+    if rows:
+        get_write_behind().submit(rows)
+    return bool(rows)
+
+# --- Lectura ---
+
+def _parse_timestamp(value: str) -> float:
+    """Convierte un timestamp ISO de Postgres ('2025-01-01T10:00:00.123+00:00' o '...Z') a epoch."""
+    value = value.replace("Z", "+00:00")
+    # Python 3.9 solo acepta 3 o 6 dígitos de fracción: normalizar a 6
+    if "." in value:
+        head, rest = value.split(".", 1)
+        digits = "".join(ch for ch in rest if ch.isdigit())
+        value = f"{head}.{digits[:6].ljust(6, '0')}{rest[len(digits):]}"
+    return datetime.fromisoformat(value).timestamp()
+
+def load_previous_scan(brand_input: str) -> Optional[Dict[str, Any]]:
+    """
+    Último reporte guardado para una marca: {"brand", "report", "stored_at"}, o None si no hay filas.
+    `brand` es el input_brand tal como está guardado (la búsqueda no distingue mayúsculas).
+    Solo se recuperan HDA/LDA: los candidatos descartados no se persisten.
+    """
+    store = get_store()
+    pattern = brand_input.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    with telemetry.span("db.select", table="competitor_scans", backend=store.name) as span:
+        rows = store.latest_rows(pattern, limit=50)
+        span.set(rows=len(rows))
+    return _latest_report(rows, brand_input)
+
+def _latest_report(rows: List[Dict[str, Any]], brand_input: str) -> Optional[Dict[str, Any]]:
+    """Filas de una marca (de la más nueva a la más vieja) -> {"brand", "report", "stored_at"}."""
+    if not rows:
+        return None
+
+    # La tabla guarda el conjunto actual de cada input_brand; si la marca se guardó de distintas
+    # formas ('Hulu', 'hulu', o 'hulu.com' y 'https://www.hulu.com' por brand_key) gana la más reciente
+    brand = rows[0].get('input_brand', brand_input)
+    report: Dict[str, Any] = {"HDA_Competitors": [], "LDA_Competitors": [], "Discarded_Candidates": []}
+    for row in rows:
+        if row.get('input_brand', brand) != brand:
+            continue
+        entry = row.get('metadata') or {
+            "name": row['competitor_url'], "url": row['competitor_url'], "justification": row['justification']
+        }
+        report[f"{row['classification']}_Competitors"].append(entry)
+
+    return {"brand": brand, "report": report, "stored_at": _parse_timestamp(rows[0]['created_at'])}
+
+def recent_brands(limit: int) -> List[Tuple[str, float]]:
+    """Marcas guardadas en 'competitor_scans' con su última escritura (epoch), de la más reciente a la más antigua."""
+    store = get_store()
+    with telemetry.span("db.select", table="competitor_scans", backend=store.name, query="recent_brands") as span:
+        brands = store.recent_brands(limit)
+        span.set(rows=len(brands))
+    return [(brand, _parse_timestamp(created_at)) for brand, created_at in brands]
+
+def rows_since(after: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    """Filas escritas después de `after` (created_at; None = desde el principio), de la más antigua a la más nueva."""
+    store = get_store()
+    with telemetry.span("db.select", table="competitor_scans", backend=store.name, query="rows_since") as span:
+        rows = store.rows_since(after, limit)
+        span.set(rows=len(rows))
+    return rows
+
+def brand_rows(brands: List[str]) -> List[Dict[str, Any]]:
+    """Conjunto actual de cada input_brand de `brands` (nombres exactos, en bloques de DB_UPSERT_CHUNK_ROWS marcas)."""
+    store = get_store()
+    rows: List[Dict[str, Any]] = []
+    with telemetry.span("db.select", table="competitor_scans", backend=store.name, query="brand_rows") as span:
+        for start in range(0, len(brands), DB_UPSERT_CHUNK_ROWS):
+            rows.extend(store.brand_rows(brands[start:start + DB_UPSERT_CHUNK_ROWS]))
+        span.set(brands=len(brands), rows=len(rows))
+    return rows
+
+def load_scan_results_by_key(brand_key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+    """
+    Como `load_scan_results`, pero por la clave normalizada de la caché de escaneos (columna
+    `brand_key`): 'https://www.hulu.com', 'hulu.com' y 'Hulu.com' comparten clave y filas. Las filas
+    escritas antes de la columna no la tienen: para ellas se busca la clave como input_brand.
+    """
+    store = get_store()
+    with telemetry.span("db.select", table="competitor_scans", backend=store.name, query="brand_key") as span:
+        rows = store.key_rows(brand_key, limit=50)
+        span.set(rows=len(rows))
+    previous = _latest_report(rows, brand_key) or load_previous_scan(brand_key)
+    if previous is None:
+        return None
+    return previous["report"], previous["stored_at"]
+
+def load_scan_results(brand_input: str) -> Optional[Tuple[Dict[str, Any], float]]:
+    """
+    Reconstruye el último reporte guardado para una marca desde 'competitor_scans'.
+    Devuelve (reporte, timestamp_epoch) o None si no hay filas. El timestamp es el de la
+    última escritura de la marca (con escrituras incrementales, el último cambio).
+    """
+    previous = load_previous_scan(brand_input)
+    if previous is None:
+        return None
+    return previous["report"], previous["stored_at"]
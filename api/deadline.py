@@ -0,0 +1,87 @@
+"""
+Presupuesto de tiempo de un escaneo (?budget_ms=3000). El deadline vive en un contextvar: cada
+etapa consulta el tiempo restante y acota con él sus timeouts (HTTP, Gemini, espera de cuota).
+Los hilos del pipeline lo heredan a través de `telemetry.propagate`.
+"""
+import contextlib
+import contextvars
+import os
+import time
+from typing import Iterator, Optional, Tuple
+
+from .constants import SCAN_BUDGET_MAX_MS, SCAN_BUDGET_MIN_MS
+
+class DeadlineExceeded(TimeoutError):
+    """Se agotó el presupuesto de tiempo del escaneo antes de empezar una operación."""
+
+class Deadline:
+    """Instante límite en reloj monotónico."""
+
+    def __init__(self, budget_seconds: float):
+        self.budget = budget_seconds
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + budget_seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self, what: str = "la operación") -> float:
+        """Tiempo restante; `DeadlineExceeded` si ya no queda."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"Sin tiempo para {what}")
+        return remaining
+
+_current: "contextvars.ContextVar[Optional[Deadline]]" = contextvars.ContextVar("compas_deadline", default=None)
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+def remaining(default: Optional[float] = None) -> Optional[float]:
+    """Segundos restantes del deadline actual (`default` si no hay deadline)."""
+    deadline = _current.get()
+    return default if deadline is None else deadline.remaining()
+
+def clamp_timeout(timeout: Tuple[float, float]) -> Tuple[float, float]:
+    """Acota (connect, read) al tiempo restante; `DeadlineExceeded` si ya no queda."""
+    deadline = _current.get()
+    if deadline is None:
+        return timeout
+    left = deadline.check("una petición HTTP")
+    return (min(timeout[0], left), min(timeout[1], left))
+
+def parse_budget_ms(value: Optional[str]) -> Optional[float]:
+    """
+    Presupuesto en segundos a partir de ?budget_ms= (o de COMPAS_SCAN_BUDGET_MS si no viene).
+    None = sin límite. Se acota a [SCAN_BUDGET_MIN_MS, SCAN_BUDGET_MAX_MS]; `ValueError` si no es un número.
+    """
+    if value is None or value == "":
+        value = os.environ.get("COMPAS_SCAN_BUDGET_MS", "")
+        if not value:
+            return None
+    budget_ms = float(value)
+    if budget_ms != budget_ms or budget_ms <= 0:
+        raise ValueError("budget_ms debe ser un número positivo")
+    return min(max(budget_ms, SCAN_BUDGET_MIN_MS), SCAN_BUDGET_MAX_MS) / 1000
+
+@contextlib.contextmanager
+def deadline_scope(budget_seconds: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """Fija el deadline del bloque (None = sin límite; un deadline exterior más cercano se respeta)."""
+    if budget_seconds is None:
+        yield _current.get()
+        return
+    deadline = Deadline(budget_seconds)
+    outer = _current.get()
+    if outer is not None and outer.expires_at < deadline.expires_at:
+        deadline = outer
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
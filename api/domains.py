@@ -0,0 +1,145 @@
+"""
+Normalización de dominios con la Public Suffix List.
+
+`get_root_domain` devuelve el dominio registrable (bbc.co.uk, amazon.com.br, x.github.io),
+no las dos últimas etiquetas. La lista se carga una sola vez en un trie por etiquetas
+(de derecha a izquierda) y las búsquedas se memorizan en cachés LRU.
+"""
+import ipaddress
+import os
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Optional, Union
+from urllib.parse import urlsplit
+
+from .constants import DOMAIN_CACHE_MAX_ENTRIES
+
+DEFAULT_PSL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "public_suffix_list.dat")
+
+_RULE = ""  # marca de fin de regla en un nodo del trie
+_EXCEPTION = "!"  # marca de regla de excepción ('!www.ck')
+
+_trie: Optional[Dict[str, Any]] = None
+_trie_lock = threading.Lock()
+
+def load_suffix_trie(path: str) -> Dict[str, Any]:
+    """Construye el trie {etiqueta: subtrie} a partir de un archivo en formato PSL."""
+    trie: Dict[str, Any] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            rule = line.split()[0] if line.strip() else ""
+            if not rule or rule.startswith("//"):
+                continue
+            exception = rule.startswith("!")
+            node = trie
+            for label in reversed(rule.lstrip("!").lower().split(".")):
+                node = node.setdefault(label, {})
+            node[_EXCEPTION if exception else _RULE] = True
+    return trie
+
+def _get_trie() -> Dict[str, Any]:
+    global _trie
+    if _trie is None:
+        with _trie_lock:
+            if _trie is None:
+                path = os.environ.get("COMPAS_PSL_PATH") or DEFAULT_PSL_PATH
+                try:
+                    _trie = load_suffix_trie(path)
+                except OSError as e:
+                    # Sin lista se aplica solo la regla implícita '*' (el TLD es el sufijo)
+                    print(f"⚠️ Public Suffix List no disponible ({e}).")
+                    _trie = {}
+    return _trie
+
+def _suffix_labels(labels: list) -> int:
+    """Cantidad de etiquetas del sufijo público según las reglas PSL (la regla más larga gana; las excepciones, siempre)."""
+    suffix = 1  # regla implícita '*'
+    node = _get_trie()
+    for depth, label in enumerate(reversed(labels), 1):
+        child = node.get(label)
+        if child is not None and child.get(_EXCEPTION):
+            return depth - 1
+        wildcard = node.get("*")
+        if wildcard is not None and wildcard.get(_RULE):
+            suffix = depth
+        if child is None:
+            if wildcard is None:
+                break
+            child = wildcard
+        elif child.get(_RULE):
+            suffix = depth
+        node = child
+    return suffix
+
+def _is_ip(host: str) -> bool:
+    # Solo se intenta el parseo (costoso si falla) cuando el host puede ser una IP
+    if not (host.startswith("[") or ":" in host or host.rpartition(".")[2].isdigit()):
+        return False
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+        return True
+    except ValueError:
+        return False
+
+@lru_cache(maxsize=DOMAIN_CACHE_MAX_ENTRIES)
+def registrable_domain(host: str) -> Optional[str]:
+    """
+    Dominio registrable de un host ('www.bbc.co.uk' -> 'bbc.co.uk'). None si el host es una IP,
+    una sola etiqueta o un sufijo público en sí mismo ('co.uk').
+    """
+    host = host.strip().rstrip(".").lower()
+    if not host or "." not in host or _is_ip(host):
+        return None
+    labels = host.split(".")
+    if any(not label for label in labels):
+        return None
+    suffix = _suffix_labels(labels)
+    if len(labels) <= suffix:
+        return None
+    return ".".join(labels[-(suffix + 1):])
+
+@lru_cache(maxsize=DOMAIN_CACHE_MAX_ENTRIES)
+def host_of(url: str) -> str:
+    """Host en minúsculas, sin usuario ni puerto ('https://WWW.Hulu.com:443/x' -> 'www.hulu.com')."""
+    # Equivale a urlsplit(url).hostname, sin el costo de urlsplit (es el camino caliente del clasificador)
+    netloc = url.split("://", 1)[1] if "://" in url else url
+    for sep in "/?#":
+        netloc = netloc.split(sep, 1)[0]
+    host = netloc.rpartition("@")[2]
+    if host.startswith("["):
+        return host.split("]")[0] + "]"
+    return host.split(":")[0].lower()
+
+def get_root_domain(url: str) -> str:
+    """Extrae el dominio raíz registrable (ej. us.puma.com -> puma.com, www.bbc.co.uk -> bbc.co.uk)."""
+    host = host_of(url)
+    return registrable_domain(host) or host
+
+def has_registrable_domain(url: str) -> bool:
+    """True si la URL pertenece a un dominio registrable (no una IP, un host local o un sufijo público)."""
+    return registrable_domain(host_of(url)) is not None
+
+@lru_cache(maxsize=DOMAIN_CACHE_MAX_ENTRIES)
+def _clean_url(url: str) -> str:
+    try:
+        if not url.startswith('http'):
+            url = 'https://' + url
+        parsed = urlsplit(url)
+        return f"{parsed.scheme}://{parsed.netloc.lower()}"
+    except ValueError:
+        return url
+
+def clean_url(url: Union[str, None]) -> str:
+    """Normaliza una URL a 'esquema://host' (sin ruta), en minúsculas: la clave de dedup de candidatos."""
+    if not url: return ""
+    return _clean_url(url)
+
+def normalize_brand_key(brand: str) -> str:
+    """
+    Clave canónica de una marca: dominio raíz para URLs ('https://www.Hulu.com/x' -> 'hulu.com')
+    y nombre en minúsculas con espacios colapsados para marcas ('  Hulu  Live' -> 'hulu live').
+    """
+    raw = brand.strip().lower()
+    if "." in raw and " " not in raw:
+        return get_root_domain(clean_url(raw))
+    return " ".join(raw.split())
@@ -0,0 +1,168 @@
+"""
+Lógica de las peticiones compartida por los dos puntos de entrada HTTP: el handler de Vercel
+(`index.py`) y la app ASGI (`asgi.py`). Cada uno solo adapta su transporte (wfile / mensajes ASGI);
+los parámetros del GET y su respuesta, el body del batch, el modo de streaming, la persistencia
+y el resumen del batch se deciden acá.
+
+Como en `index.py`, el pipeline (db, batch, request_log) se importa dentro de cada función:
+un preflight o un error de validación no lo carga.
+"""
+import json
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from .deadline import parse_budget_ms
+
+if TYPE_CHECKING:
+    from .batch import BatchTally
+
+BRAND_REQUIRED = "Parámetro 'brand' es requerido (ej. ?brand=Hulu)"
+BUDGET_INVALID = "Parámetro 'budget_ms' inválido (ej. ?budget_ms=3000)"
+BATCH_BRANDS_REQUIRED = "Se requiere una lista 'brands' (ej. {\"brands\": [\"Hulu\", \"Nike\"]})"
+
+def parse_batch_payload(raw: str) -> Dict[str, Any]:
+    """Body del POST: JSON {"brands": [...]} o NDJSON (una marca por línea)."""
+    try:
+        payload = json.loads(raw) if raw else {}
+        if isinstance(payload, list):
+            payload = {"brands": payload}
+    except json.JSONDecodeError:
+        payload = {"brands": [json.loads(line) for line in raw.splitlines() if line.strip()]}
+    if not isinstance(payload, dict):
+        raise ValueError("El body debe ser un objeto JSON o NDJSON.")
+    return payload
+
+def _positive_int(payload: Dict[str, Any], name: str) -> Optional[int]:
+    """Entero >= 1 opcional del body (acepta 8 o "8"); ValueError si no lo es."""
+    value = payload.get(name)
+    if value is None:
+        return None
+    try:
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"'{name}' debe ser un entero (recibido: {value!r}).") from None
+    if number < 1:
+        raise ValueError(f"'{name}' debe ser mayor o igual a 1.")
+    return number
+
+def parse_batch_request(raw: str) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Valida el body de un batch y devuelve (marcas, argumentos de `iter_batch_scan`).
+    ValueError con el mensaje para el 400: todo lo que el cliente mande mal se rechaza antes de
+    responder 200 (después, un error solo puede viajar como una línea más del NDJSON).
+    """
+    from .batch import parse_brand_list
+    from .constants import MAX_BATCH_BRANDS
+
+    try:
+        payload = parse_batch_payload(raw)
+        values = payload.get("brands") or []
+        if not isinstance(values, list):
+            raise ValueError("'brands' debe ser una lista.")
+        brands = parse_brand_list(values)
+        workers = _positive_int(payload, "workers")
+        gemini_batch = _positive_int(payload, "gemini_batch")
+    except ValueError as e:
+        raise ValueError(f"Body inválido: {e}") from e
+    if not brands:
+        raise ValueError(BATCH_BRANDS_REQUIRED)
+    # El tope protege a la API HTTP; batch_scan.py (jobs nocturnos) no lo tiene
+    if len(brands) > MAX_BATCH_BRANDS:
+        raise ValueError(f"El batch supera el máximo de {MAX_BATCH_BRANDS} marcas.")
+    options = {
+        "max_workers": workers,
+        "use_cache": not payload.get("refresh", False),
+        "incremental": bool(payload.get("incremental")),
+        "gemini_batch": gemini_batch,
+    }
+    return brands, options
+
+def parse_scan_request(params: Dict[str, List[str]], accept: Optional[str]) -> Dict[str, Any]:
+    """
+    Parámetros del GET (ya pasados por `parse_qs`): {"brand", "budget", "refresh", "debug_timings", "stream"}.
+    ?refresh=1 fuerza un escaneo nuevo; ?budget_ms= acota el tiempo total y devuelve lo clasificado
+    hasta entonces. ValueError con el mensaje para el 400.
+    """
+    target_brand = params.get("brand", [None])[0]
+    if not target_brand:
+        raise ValueError(BRAND_REQUIRED)
+    try:
+        budget = parse_budget_ms(params.get("budget_ms", [None])[0])
+    except ValueError:
+        raise ValueError(BUDGET_INVALID) from None
+    return {
+        "brand": target_brand,
+        "budget": budget,
+        "refresh": params.get("refresh", ["0"])[0].lower() in ("1", "true", "yes"),
+        "debug_timings": "timings" in params.get("debug", [""])[0].split(","),
+        "stream": stream_mode(params, accept),
+    }
+
+def scan_response(target_brand: str, scan_report: Dict[str, Any], cache_info: Dict[str, Any],
+                  coalesced: Optional[bool] = None, timings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Respuesta exitosa del GET. `coalesced` solo lo informa el servidor ASGI (escaneo compartido)."""
+    response = {
+        "status": "success",
+        "target": target_brand,
+        "data": scan_report,
+        "cache": cache_info,
+        "partial": bool(scan_report.get("partial")),
+    }
+    if coalesced is not None:
+        response["coalesced"] = coalesced
+    response["message"] = "Escaneo completado exitosamente."
+    if timings is not None:
+        response["timings"] = timings
+    return response
+
+def error_response(message: str) -> Dict[str, Any]:
+    """Body de un error (400, 405 y las líneas de error del streaming y del batch)."""
+    return {"status": "error", "message": message}
+
+def server_error_response(error: Exception) -> Dict[str, Any]:
+    """Body del 500 (con `debug` para desarrollo; quitar en prod real si es sensible)."""
+    print(f"❌ Error Crítico en Handler: {error}")
+    return {
+        "status": "error",
+        "message": "Error interno del servidor procesando la solicitud.",
+        "debug": str(error)
+    }
+
+def stream_mode(params: Dict[str, List[str]], accept: Optional[str]) -> str:
+    """'sse' | 'ndjson' | '' según ?stream= o la cabecera Accept."""
+    mode = params.get("stream", [""])[0].lower()
+    if mode in ("sse", "ndjson"):
+        return mode
+    if "text/event-stream" in (accept or ""):
+        return "sse"
+    return ""
+
+def persist_scan_report(target_brand: str, scan_report: Dict[str, Any], cache_info: Dict[str, Any]) -> None:
+    """Persistencia (Opcional pero recomendada). Un hit de caché ya está guardado."""
+    # Un reporte parcial (cortado por ?budget_ms) pisaría el conjunto completo guardado
+    if scan_report.get("partial") or cache_info.get("status") == "hit":
+        return
+    from .db import persist_scan, persistence_configured
+    if persistence_configured():
+        try:
+            persist_scan(target_brand, scan_report)
+        except Exception as db_error:
+            print(f"⚠️ Error guardando en DB (No crítico): {db_error}")
+
+def log_and_persist(target_brand: str, scan_report: Dict[str, Any], cache_info: Dict[str, Any]) -> None:
+    """Registro de peticiones para el pre-calentamiento (solo con COMPAS_REQUEST_LOG) y persistencia."""
+    from .request_log import log_request
+    log_request(target_brand, cache_info)
+    persist_scan_report(target_brand, scan_report, cache_info)
+
+def finish_batch(total: int, tally: "BatchTally") -> Dict[str, Any]:
+    """Guarda lo pendiente de un batch (`BatchTally`) en un solo upsert y arma la línea final de resumen."""
+    saved = False
+    from .db import persistence_configured, save_batch_results
+    if tally.to_save and persistence_configured():
+        try:
+            saved = save_batch_results(tally.to_save)
+        except Exception as db_error:
+            print(f"⚠️ Error guardando batch en DB (No crítico): {db_error}")
+    return {"status": "done", "total": total, "errors": tally.errors, "saved": saved}
@@ -0,0 +1,87 @@
+import os
+from typing import Any, Dict, Optional
+
+from . import http_client, telemetry
+from .cache import MemoryCache, TTLCache
+from .constants import (
+    DEFAULT_ENRICH_WORKERS, ENRICH_CACHE_MAX_ENTRIES, ENRICH_CACHE_TTL_SECONDS,
+    ENRICH_CONNECT_TIMEOUT, ENRICH_DEAD_STATUSES, ENRICH_READ_TIMEOUT, HEADERS
+)
+from .domains import host_of
+from .html_head import parse_head
+from .singleflight import SingleFlight
+
+# Verificaciones por dominio: compartidas entre marcas (los mismos competidores se repiten)
+_probe_cache: Optional[TTLCache] = None
+_in_flight = SingleFlight()
+
+def enrichment_enabled() -> bool:
+    """COMPAS_ENRICH=0 desactiva la verificación de candidatos de Gemini."""
+    return os.environ.get("COMPAS_ENRICH", "1").lower() not in ("0", "false", "no")
+
+def resolve_enrich_workers(max_workers: Optional[int] = None) -> int:
+    """Sondas simultáneas (argumento > COMPAS_ENRICH_WORKERS > default). Cada una va a un host distinto."""
+    if max_workers is None:
+        try:
+            max_workers = int(os.environ.get("COMPAS_ENRICH_WORKERS", DEFAULT_ENRICH_WORKERS))
+        except ValueError:
+            max_workers = DEFAULT_ENRICH_WORKERS
+    return max(1, max_workers)
+
+def _get_probe_cache() -> TTLCache:
+    global _probe_cache
+    if _probe_cache is None:
+        try:
+            ttl = int(os.environ.get("COMPAS_ENRICH_TTL", ENRICH_CACHE_TTL_SECONDS))
+        except ValueError:
+            ttl = ENRICH_CACHE_TTL_SECONDS
+        _probe_cache = TTLCache(MemoryCache(max_entries=ENRICH_CACHE_MAX_ENTRIES), ttl_seconds=ttl)
+    return _probe_cache
+
+def probe_key(url: str) -> str:
+    """Clave de caché: host sin 'www.' (www.netflix.com y netflix.com comparten verificación)."""
+    host = host_of(url)
+    return host[4:] if host.startswith("www.") else host
+
+def _probe(url: str) -> Dict[str, Any]:
+    """
+    Lectura parcial de la homepage (hasta </head>), siguiendo redirecciones.
+    status: "alive" (respondió), "dead" (DNS/conexión o 404/410) o "unverified" (timeout u otro error HTTP).
+    """
+    try:
+        resp = http_client.fetch_head(url, headers=HEADERS, timeout=(ENRICH_CONNECT_TIMEOUT, ENRICH_READ_TIMEOUT), retries=0)
+    except Exception as e:
+        if http_client.is_timeout(e):
+            return {"status": "unverified", "reason": "Timeout verificando el sitio"}
+        return {"status": "dead", "reason": f"Dominio inaccesible ({type(e).__name__})", "unreachable": True}
+
+    if resp.status_code in ENRICH_DEAD_STATUSES:
+        return {"status": "dead", "reason": f"El sitio respondió HTTP {resp.status_code}", "http_status": resp.status_code}
+    if resp.status_code >= 400:
+        # 403/429/5xx: suele ser protección anti-bots o una caída puntual, no un dominio inexistente
+        return {"status": "unverified", "reason": f"HTTP {resp.status_code}", "http_status": resp.status_code}
+    return {"status": "alive", "http_status": resp.status_code, "final_url": resp.url, "head": parse_head(resp.text)}
+
+def probe_domain(url: str) -> Dict[str, Any]:
+    """
+    Verifica un candidato con caché por dominio. Las sondas concurrentes al mismo dominio
+    comparten una sola petición. Timeouts y errores de conexión no se cachean: pueden ser
+    problemas de nuestra red y se reintentan en el próximo escaneo.
+    """
+    key = probe_key(url)
+    cache = _get_probe_cache()
+    with telemetry.span("enrich.probe", domain=key) as span:
+        cached = cache.get(key)
+        if cached is not None:
+            span.set(cache="hit", status=cached["status"])
+            return cached
+
+        def probe_and_store() -> Dict[str, Any]:
+            result = _probe(url)
+            if result["status"] != "unverified" and not result.get("unreachable"):
+                cache.set(key, result)
+            return result
+
+        result, _ = _in_flight.do(key, probe_and_store)
+        span.set(cache="miss", status=result["status"])
+        return result
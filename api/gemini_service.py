@@ -1,26 +1,105 @@
 import os
 import json
-import google.generativeai as genai # type: ignore
-from urllib.parse import urlparse
-from typing import List, Dict, Any
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from . import telemetry
+from .cache import MemoryCache, SQLiteCache, TieredCache, TTLCache
+from .constants import GEMINI_BATCH_CONCURRENCY, GEMINI_BATCH_MAX_SIZE, GEMINI_BATCH_SIZE
+from .constants import GEMINI_CACHE_MAX_ENTRIES, GEMINI_CACHE_TTL_SECONDS, GEMINI_DEFAULT_CACHE_PATH, GEMINI_PROMPT_VERSION
+from .deadline import current_deadline
+from .models import Candidate, candidates_from_dicts
+from .singleflight import SingleFlight
 
-# Configurar la API key al importar el módulo
 api_key = os.environ.get("GEMINI_API_KEY")
-if api_key:
-    genai.configure(api_key=api_key)
 
-def get_competitors_from_gemini(brand_name: str) -> List[Dict[str, Any]]:
+# El modelo se crea una sola vez y se reutiliza entre llamadas (y entre marcas de un batch).
+# El SDK (grpc + protobuf) se importa aquí y no al cargar el módulo: pesa en cada cold start.
+_model = None
+_model_lock = threading.Lock()
+
+def _get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import google.generativeai as genai # type: ignore
+                endpoint = os.environ.get("GEMINI_API_ENDPOINT")
+                if endpoint:
+                    # Proxy o stand-in local (load test): el endpoint alternativo solo lo respeta el transporte REST
+                    genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": endpoint})
+                else:
+                    genai.configure(api_key=api_key)
+                _model = genai.GenerativeModel('gemini-2.0-flash')
+    return _model
+
+# Caché de respuestas (memoria + disco) y coalescencia de llamadas idénticas en vuelo
+_answer_cache: Optional[TTLCache] = None
+_in_flight = SingleFlight()
+
+def _get_answer_cache() -> TTLCache:
+    """Caché de respuestas de Gemini. GEMINI_CACHE_PATH='' desactiva la persistencia en disco."""
+    global _answer_cache
+    if _answer_cache is None:
+        try:
+            ttl = int(os.environ.get("GEMINI_CACHE_TTL", GEMINI_CACHE_TTL_SECONDS))
+        except ValueError:
+            ttl = GEMINI_CACHE_TTL_SECONDS
+        backend = MemoryCache(max_entries=GEMINI_CACHE_MAX_ENTRIES)
+        path = os.environ.get("GEMINI_CACHE_PATH", GEMINI_DEFAULT_CACHE_PATH)
+        if path:
+            try:
+                disk = SQLiteCache(path, table="gemini_cache", max_entries=GEMINI_CACHE_MAX_ENTRIES)
+                backend = TieredCache([backend, disk])
+            except Exception as e:
+                print(f"⚠️ Caché de Gemini en disco no disponible ({e}). Solo memoria.")
+        _answer_cache = TTLCache(backend, ttl_seconds=ttl)
+    return _answer_cache
+
+def gemini_cache_key(brand_name: str) -> str:
+    """Clave de caché: versión del prompt + nombre normalizado (minúsculas, espacios colapsados)."""
+    return f"{GEMINI_PROMPT_VERSION}:{' '.join(brand_name.strip().lower().split())}"
+
+def get_competitors_from_gemini(brand_name: str) -> List[Candidate]:
     """
     Consulta a Gemini para obtener una lista de competidores HDA y LDA.
-    Retorna una lista de candidatos estructurados.
+    Retorna una lista de candidatos estructurados (la caché guarda su forma JSON).
+    Las respuestas se cachean por marca y versión de prompt, y las consultas
+    concurrentes para la misma marca comparten una sola llamada al LLM.
     """
     if not api_key:
         print("⚠️ GEMINI_API_KEY no encontrada. Saltando consulta a IA.")
         return []
 
+    key = gemini_cache_key(brand_name)
+    cache = _get_answer_cache()
+    with telemetry.span("cache.gemini_lookup") as span:
+        cached = cache.get(key)
+        span.set(cache="hit" if cached is not None else "miss")
+    if cached is not None:
+        print(f"⚡ Gemini cache hit para: {brand_name}")
+        return candidates_from_dicts(cached)
+
+    def ask_and_store() -> List[Dict[str, Any]]:
+        # Re-chequear: otro líder pudo haber guardado la respuesta mientras esperábamos
+        fresh = cache.get(key)
+        if fresh is not None:
+            return fresh
+        candidates = _ask_gemini(brand_name)
+        if candidates:
+            cache.set(key, candidates)
+        return candidates
+
+    candidates, shared = _in_flight.do(key, ask_and_store)
+    if shared:
+        print(f"🔗 Reutilizando consulta a Gemini en curso para: {brand_name}")
+    return candidates_from_dicts(candidates)
+
+def _ask_gemini(brand_name: str) -> List[Dict[str, Any]]:
+    """Llamada real al LLM + parseo. Devuelve [] ante cualquier error."""
     print(f"🤖 Consultando a Gemini sobre competidores de: {brand_name}...")
 
-    model = genai.GenerativeModel('gemini-2.0-flash')
+    model = _get_model()
 
     prompt = f"""
     Actúa como un experto en Inteligencia de Mercado y Competencia Digital.
@@ -28,11 +107,7 @@ def get_competitors_from_gemini(brand_name: str) -> List[Dict[str, Any]]:
     
     Tu tarea es identificar sus competidores directos e indirectos y devolver una respuesta ESTRICTAMENTE en formato JSON.
     
-    Reglas de Negocio:
-    1. HDA (High Domain Authority): Competidores masivos, líderes de industria o marcas muy reconocidas.
-    2. LDA (Low Domain Authority): Competidores de nicho, startups emergentes o alternativas específicas.
-    3. EXCLUYE: Agregadores (Capterra, G2), sitios de noticias (CNET, Forbes), foros (Reddit) y subdominios de la propia marca.
-    4. VALIDACIÓN: Solo incluye competidores reales con sitio web activo.
+{_BUSINESS_RULES}
     
     Formato de Salida JSON (Array de objetos):
     [
@@ -50,32 +125,248 @@ def get_competitors_from_gemini(brand_name: str) -> List[Dict[str, Any]]:
     """
 
     try:
-        response = model.generate_content(prompt)
-        text_response = response.text.strip()
-        
-        # Limpieza básica por si devuelve bloques de código markdown
-        if text_response.startswith("```json"):
-            text_response = text_response.replace("```json", "").replace("```", "")
-        elif text_response.startswith("```"):
-            text_response = text_response.replace("```", "")
-            
-        candidates = json.loads(text_response)
-        
-        # Normalizar datos para el pipeline
-        formatted_candidates: List[Dict[str, Any]] = []
-        for cand in candidates:
-            formatted_candidates.append({
-                "clean_url": cand.get("url"), # Asumimos que Gemini da la URL limpia
-                "link": cand.get("url"),
-                "title": f"{cand.get('name')} - Official Site",
-                "snippet": cand.get("description"),
-                "source": "gemini_knowledge", # Marca de origen
-                "gemini_type": cand.get("type") # HDA/LDA sugerido por Gemini
-            })
-            
+        with telemetry.span("gemini.generate_content", model="gemini-2.0-flash") as span:
+            # Con presupuesto de tiempo (?budget_ms=) la llamada no puede durar más de lo que queda
+            deadline = current_deadline()
+            if deadline is None:
+                response = model.generate_content(prompt, generation_config=_json_output(_COMPETITORS_SCHEMA))
+            else:
+                timeout = deadline.check("consultar a Gemini")
+                span.set(timeout_s=round(timeout, 3))
+                response = model.generate_content(prompt, generation_config=_json_output(_COMPETITORS_SCHEMA),
+                                                  request_options={"timeout": timeout})
+            text_response = response.text.strip()
+            span.set(bytes=len(text_response.encode("utf-8")))
+
+        formatted_candidates = _format_candidates(parse_competitors(text_response))
+        if not formatted_candidates:
+            raise ValueError("la respuesta no trae competidores en JSON")
+
         print(f"   ✅ Gemini encontró {len(formatted_candidates)} candidatos.")
         return formatted_candidates
 
     except Exception as e:
         print(f"❌ Error consultando a Gemini: {e}")
         return []
+
+def _format_candidates(raw: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Normaliza los competidores que devuelve Gemini al formato de candidato del pipeline."""
+    formatted_candidates: List[Dict[str, Any]] = []
+    for cand in raw:
+        formatted_candidates.append({
+            "clean_url": cand.get("url"), # Asumimos que Gemini da la URL limpia
+            "link": cand.get("url"),
+            "title": f"{cand.get('name')} - Official Site",
+            "snippet": cand.get("description"),
+            "source": "gemini_knowledge", # Marca de origen
+            "gemini_type": cand.get("type") # HDA/LDA sugerido por Gemini
+        })
+    return formatted_candidates
+
+# --- Salida estructurada y parseo tolerante ---
+
+_BUSINESS_RULES = """    Reglas de Negocio:
+    1. HDA (High Domain Authority): Competidores masivos, líderes de industria o marcas muy reconocidas.
+    2. LDA (Low Domain Authority): Competidores de nicho, startups emergentes o alternativas específicas.
+    3. EXCLUYE: Agregadores (Capterra, G2), sitios de noticias (CNET, Forbes), foros (Reddit) y subdominios de la propia marca.
+    4. VALIDACIÓN: Solo incluye competidores reales con sitio web activo."""
+
+# Esquemas para `response_schema`: el modelo queda obligado a devolver JSON con esta forma
+_COMPETITOR_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "url": {"type": "string"},
+        "type": {"type": "string", "format": "enum", "enum": ["HDA", "LDA"]},
+        "description": {"type": "string"},
+    },
+    "required": ["name", "url", "type", "description"],
+}
+_COMPETITORS_SCHEMA = {"type": "array", "items": _COMPETITOR_SCHEMA}
+_BATCH_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "id": {"type": "integer"},
+            "brand": {"type": "string"},
+            "competitors": {"type": "array", "items": _COMPETITOR_SCHEMA},
+        },
+        "required": ["id", "brand", "competitors"],
+    },
+}
+
+def _json_output(schema: Dict[str, Any]) -> Dict[str, Any]:
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+_decoder = json.JSONDecoder()
+
+class JSONObjectStream:
+    """
+    Parser JSON tolerante e incremental: extrae, de un texto que llega por partes (el stream del
+    modelo), los objetos que cumplen `accept`, aunque vengan rodeados de prosa o fences de markdown.
+    Un objeto todavía incompleto espera más texto; al cerrar, uno que no parsea se salta y se sigue
+    con el siguiente, así una entrada rota no arrastra al resto de la respuesta.
+    """
+
+    def __init__(self, accept: Callable[[Dict[str, Any]], bool]):
+        self._accept = accept
+        self._text = ""
+        self._pos = 0
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self._text += chunk
+        return self._drain(final=False)
+
+    def close(self) -> List[Dict[str, Any]]:
+        return self._drain(final=True)
+
+    def _drain(self, final: bool) -> List[Dict[str, Any]]:
+        found: List[Dict[str, Any]] = []
+        while True:
+            start = self._text.find("{", self._pos)
+            if start < 0:
+                self._pos = len(self._text)
+                return found
+            try:
+                value, end = _decoder.raw_decode(self._text, start)
+            except json.JSONDecodeError as e:
+                if not final and self._truncated(e):
+                    self._pos = start  # A medio llegar: se reintenta con el próximo chunk
+                    return found
+                self._pos = start + 1  # Roto: se busca el próximo objeto (incluso dentro de este)
+                continue
+            if isinstance(value, dict) and self._accept(value):
+                found.append(value)
+                self._pos = end
+            else:
+                self._pos = start + 1  # Un envoltorio u objeto de otro nivel: se mira su contenido
+
+    def _truncated(self, error: json.JSONDecodeError) -> bool:
+        """El error es por falta de texto (string abierto o literal cortado al final), no por JSON roto."""
+        return error.msg.startswith("Unterminated string") or len(self._text) - error.pos <= _TRUNCATED_TAIL_CHARS
+
+# Un literal o número cortado al final del buffer ('tru', '-1.') falla a menos de estos caracteres del final
+_TRUNCATED_TAIL_CHARS = 5
+
+def _is_competitor(value: Dict[str, Any]) -> bool:
+    return isinstance(value.get("url"), str) and "name" in value
+
+def _is_batch_entry(value: Dict[str, Any]) -> bool:
+    return "brand" in value and isinstance(value.get("competitors"), list)
+
+def parse_competitors(text: str) -> List[Dict[str, Any]]:
+    """Competidores de una respuesta de Gemini: cada objeto que parsea, aunque otro del mismo array esté roto."""
+    stream = JSONObjectStream(_is_competitor)
+    return stream.feed(text) + stream.close()
+
+def _chunk_text(chunk: Any) -> str:
+    """Texto de un chunk del stream (los chunks sin partes, como el de cierre, no traen texto)."""
+    try:
+        return chunk.text
+    except (AttributeError, ValueError):
+        return ""
+
+# --- Modo batch: varias marcas por prompt ---
+
+def resolve_batch_size(size: Optional[int] = None) -> int:
+    """Marcas por prompt (argumento > COMPAS_GEMINI_BATCH_SIZE > default), entre 1 y GEMINI_BATCH_MAX_SIZE."""
+    if size is None:
+        try:
+            size = int(os.environ.get("COMPAS_GEMINI_BATCH_SIZE", GEMINI_BATCH_SIZE))
+        except ValueError:
+            size = GEMINI_BATCH_SIZE
+    return max(1, min(GEMINI_BATCH_MAX_SIZE, size))
+
+def resolve_batch_concurrency() -> int:
+    try:
+        return max(1, int(os.environ.get("COMPAS_GEMINI_BATCH_CONCURRENCY", GEMINI_BATCH_CONCURRENCY)))
+    except ValueError:
+        return GEMINI_BATCH_CONCURRENCY
+
+def prefetch_competitors(brand_names: List[str]) -> Dict[str, int]:
+    """
+    Modo batch para trabajos masivos: pide a Gemini los competidores de varias marcas en un solo
+    prompt y deja cada una en la caché de respuestas en cuanto su entrada llega completa, así el
+    escaneo posterior de la marca es un cache hit. Las marcas ya cacheadas no se piden; las que
+    falten en la respuesta (o lleguen rotas) quedan sin cachear y su escaneo hace la consulta
+    individual de siempre.
+    """
+    result = {"requested": 0, "cached": 0, "stored": 0}
+    if not api_key:
+        return result
+
+    cache = _get_answer_cache()
+    pending: Dict[str, str] = {}  # clave de caché -> nombre tal como se pide
+    for name in brand_names:
+        key = gemini_cache_key(name)
+        if key in pending:
+            continue
+        if cache.get(key) is not None:
+            result["cached"] += 1
+        else:
+            pending[key] = name
+    result["requested"] = len(pending)
+    if pending:
+        result["stored"] = _ask_gemini_batch(list(pending.values()), cache)
+    return result
+
+def _ask_gemini_batch(names: List[str], cache: TTLCache) -> int:
+    """Una llamada (en stream) para todas las marcas; devuelve cuántas quedaron guardadas en la caché."""
+    print(f"🤖 Consultando a Gemini sobre competidores de {len(names)} marcas en un solo prompt...")
+
+    model = _get_model()
+    keys = [gemini_cache_key(name) for name in names]
+    position = {key: i for i, key in enumerate(keys)}
+    stored: Dict[str, int] = {}
+
+    def store(entry: Dict[str, Any]) -> None:
+        # Se empareja por nombre normalizado; si el modelo lo reescribió, por el número de la lista
+        i = position.get(gemini_cache_key(str(entry.get("brand") or "")))
+        if i is None and isinstance(entry.get("id"), int) and 1 <= entry["id"] <= len(names):
+            i = entry["id"] - 1
+        if i is None or keys[i] in stored:
+            return
+        candidates = _format_candidates(c for c in entry["competitors"] if isinstance(c, dict) and _is_competitor(c))
+        if candidates:
+            cache.set(keys[i], candidates)
+            stored[keys[i]] = len(candidates)
+
+    listing = "\n".join(f'    {i}. "{name}"' for i, name in enumerate(names, start=1))
+    prompt = f"""
+    Actúa como un experto en Inteligencia de Mercado y Competencia Digital.
+    Analiza cada una de estas {len(names)} marcas:
+{listing}
+
+    Para cada marca identifica sus competidores directos e indirectos, con las mismas reglas para todas.
+
+{_BUSINESS_RULES}
+
+    Devuelve un array JSON con un objeto por marca, en el mismo orden:
+    {{"id": <número de la lista>, "brand": "<nombre tal cual>", "competitors": [
+        {{"name": "NombreCompetidor", "url": "https://www.dominiooficial.com", "type": "HDA" (o "LDA"),
+          "description": "Breve justificación de por qué es competidor."}}
+    ]}}
+
+    Dame al menos 5 competidores HDA y 3 competidores LDA por marca.
+    IMPORTANTE: Devuelve SOLO el JSON, sin markdown, sin explicaciones extra.
+    """
+
+    try:
+        with telemetry.span("gemini.generate_content_batch", model="gemini-2.0-flash", brands=len(names)) as span:
+            stream = JSONObjectStream(_is_batch_entry)
+            response = model.generate_content(prompt, generation_config=_json_output(_BATCH_SCHEMA), stream=True)
+            for chunk in response:
+                for entry in stream.feed(_chunk_text(chunk)):
+                    store(entry)
+            for entry in stream.close():
+                store(entry)
+            span.set(stored=len(stored))
+    except Exception as e:
+        # Lo guardado antes del error queda en la caché; el resto va por la consulta individual
+        print(f"❌ Error consultando a Gemini (batch de {len(names)} marcas): {e}")
+
+    missing = len(names) - len(stored)
+    print(f"   ✅ Gemini batch: {len(stored)}/{len(names)} marcas con candidatos"
+          + (f" ({missing} irán por la consulta individual)." if missing else "."))
+    return len(stored)
@@ -0,0 +1,99 @@
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional
+
+class _HeadDone(Exception):
+    """Señal interna: el <head> terminó, no hace falta seguir parseando."""
+
+class HeadParser(HTMLParser):
+    """
+    Parser incremental que solo mira el <head>: título, meta description, meta keywords,
+    etiquetas og:* y link canonical. No construye árbol: se detiene en </head> o <body>.
+    Se puede alimentar por chunks con `feed()` (ej. a medida que llegan de la red).
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.description = ""
+        self.keywords: List[str] = []
+        self.og: Dict[str, str] = {}
+        self.canonical = ""
+        self.done = False
+        self._in_title = False
+        self._title_parts: List[str] = []
+
+    def feed(self, data: str) -> None:
+        if self.done:
+            return
+        try:
+            super().feed(data)
+        except _HeadDone:
+            self.done = True
+
+    def handle_starttag(self, tag: str, attrs: List[Any]) -> None:
+        if tag == "body":
+            self._finish()
+        elif tag == "title":
+            self._in_title = True
+        elif tag == "meta":
+            self._handle_meta({k: (v or "") for k, v in attrs})
+        elif tag == "link":
+            values = {k: (v or "") for k, v in attrs}
+            if "canonical" in values.get("rel", "").lower().split() and not self.canonical:
+                self.canonical = values.get("href", "").strip()
+
+    def handle_startendtag(self, tag: str, attrs: List[Any]) -> None:
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "title":
+            self._in_title = False
+            if not self.title:
+                self.title = " ".join("".join(self._title_parts).split())
+        elif tag == "head":
+            self._finish()
+
+    def handle_data(self, data: str) -> None:
+        if self._in_title:
+            self._title_parts.append(data)
+
+    def _handle_meta(self, values: Dict[str, str]) -> None:
+        content = " ".join(values.get("content", "").split())
+        if not content:
+            return
+        name = values.get("name", "").lower()
+        prop = values.get("property", "").lower()
+        if name == "description" and not self.description:
+            self.description = content
+        elif name == "keywords" and not self.keywords:
+            self.keywords = [k.strip() for k in content.split(",") if k.strip()]
+        elif prop.startswith("og:") and prop not in self.og:
+            self.og[prop[3:]] = content
+
+    def _finish(self) -> None:
+        # Un <title> sin cerrar antes del fin del head también cuenta
+        if self._in_title and not self.title:
+            self.title = " ".join("".join(self._title_parts).split())
+        raise _HeadDone()
+
+    def result(self) -> Dict[str, Any]:
+        title = self.title or " ".join("".join(self._title_parts).split())
+        return {
+            "title": title,
+            "description": self.description,
+            "keywords": list(self.keywords),
+            "og": dict(self.og),
+            "canonical": self.canonical,
+        }
+
+def parse_head(html: Optional[str]) -> Dict[str, Any]:
+    """Metadatos del <head> de un documento (o de un prefijo del documento)."""
+    parser = HeadParser()
+    if html:
+        parser.feed(html)
+    return parser.result()
+
+def head_text(head: Dict[str, Any]) -> str:
+    """Texto del head para extraer keywords: título, descripción (u og:description) y meta keywords."""
+    description = head.get("description") or head.get("og", {}).get("description", "")
+    return " ".join(filter(None, [head.get("title", ""), description, " ".join(head.get("keywords", []))]))
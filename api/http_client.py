@@ -0,0 +1,284 @@
+import contextlib
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+from . import telemetry
+from .constants import (
+    HTTP_BACKOFF_SECONDS, HTTP_CONNECT_TIMEOUT, HTTP_DAILY_QUOTA_MARKERS, HTTP_HEAD_CHUNK_BYTES, HTTP_HEAD_MAX_BYTES,
+    HTTP_MAX_CONNECTIONS_PER_HOST, HTTP_MAX_RETRIES, HTTP_READ_TIMEOUT, HTTP_RETRY_STATUSES
+)
+from .deadline import DeadlineExceeded, clamp_timeout, remaining
+
+# Timeout simple (segundos totales de lectura) o tupla (connect, read)
+Timeout = Union[float, Tuple[float, float]]
+
+# Marcadores de fin del <head> (en minúsculas) para cortar la descarga de una homepage
+HEAD_END_MARKERS = (b"</head", b"<body")
+
+class HttpResponse:
+    """
+    Respuesta normalizada (independiente del transporte requests/httpx), ya leída.
+    Las claves de `headers` van en minúsculas. `truncated` indica que solo se leyó un prefijo del cuerpo.
+    """
+
+    def __init__(self, status_code: int, headers: Dict[str, str], content: bytes, url: str,
+                 encoding: Optional[str] = None, truncated: bool = False):
+        self.status_code = status_code
+        self.headers = {k.lower(): v for k, v in headers.items()}
+        self.content = content
+        self.url = url
+        self.encoding = encoding or "utf-8"
+        self.truncated = truncated
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self) -> Any:
+        import json
+        return json.loads(self.content)
+
+def read_head_prefix(chunks: Iterable[bytes], max_bytes: int) -> Tuple[bytes, bool]:
+    """
+    Consume chunks hasta ver el fin del <head> (</head> o <body>) o llegar a `max_bytes`.
+    Devuelve (bytes leídos, truncated): truncated=True si se dejó de leer antes del final del cuerpo.
+    """
+    buf = bytearray()
+    overlap = max(len(m) for m in HEAD_END_MARKERS) - 1
+    for chunk in chunks:
+        if not chunk:
+            continue
+        scan_from = max(0, len(buf) - overlap)  # un marcador puede quedar partido entre dos chunks
+        buf.extend(chunk)
+        window = bytes(buf[scan_from:]).lower()
+        if any(marker in window for marker in HEAD_END_MARKERS):
+            return bytes(buf), True
+        if len(buf) >= max_bytes:
+            return bytes(buf[:max_bytes]), True
+    return bytes(buf), False
+
+class _RequestsTransport:
+    """Keep-alive sobre requests.Session con un pool por host."""
+    name = "requests"
+
+    def __init__(self, max_per_host: int):
+        import requests
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=32, pool_maxsize=max_per_host)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self.retryable_errors = (requests.ConnectionError, requests.Timeout)
+        self.timeout_errors = (requests.Timeout,)
+
+    def get(self, url: str, params: Optional[Dict[str, Any]], headers: Optional[Dict[str, str]],
+            timeout: Tuple[float, float]) -> HttpResponse:
+        resp = self._session.get(url, params=params, headers=headers, timeout=timeout)
+        return HttpResponse(resp.status_code, dict(resp.headers), resp.content, resp.url, resp.encoding)
+
+    def get_head(self, url: str, headers: Optional[Dict[str, str]], timeout: Tuple[float, float],
+                 max_bytes: int) -> HttpResponse:
+        resp = self._session.get(url, headers=headers, timeout=timeout, stream=True)
+        try:
+            content, truncated = read_head_prefix(resp.iter_content(chunk_size=HTTP_HEAD_CHUNK_BYTES), max_bytes)
+        finally:
+            # Cerrar sin leer el resto: la conexión no vuelve al pool si quedó cuerpo pendiente
+            resp.close()
+        return HttpResponse(resp.status_code, dict(resp.headers), content, resp.url, resp.encoding, truncated)
+
+class _HttpxTransport:
+    """Transporte HTTP/2 (multiplexa consultas al mismo host sobre una conexión)."""
+    name = "httpx-h2"
+
+    def __init__(self, max_per_host: int):
+        import httpx
+        self._httpx = httpx
+        self._client = httpx.Client(
+            http2=True,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=max_per_host * 8, max_keepalive_connections=max_per_host * 4),
+        )
+        self.retryable_errors = (httpx.TransportError,)
+        self.timeout_errors = (httpx.TimeoutException,)
+
+    def get(self, url: str, params: Optional[Dict[str, Any]], headers: Optional[Dict[str, str]],
+            timeout: Tuple[float, float]) -> HttpResponse:
+        connect, read = timeout
+        resp = self._client.get(url, params=params, headers=headers,
+                                timeout=self._httpx.Timeout(read, connect=connect))
+        return HttpResponse(resp.status_code, dict(resp.headers), resp.content, str(resp.url), resp.encoding)
+
+    def get_head(self, url: str, headers: Optional[Dict[str, str]], timeout: Tuple[float, float],
+                 max_bytes: int) -> HttpResponse:
+        connect, read = timeout
+        with self._client.stream("GET", url, headers=headers,
+                                 timeout=self._httpx.Timeout(read, connect=connect)) as resp:
+            content, truncated = read_head_prefix(resp.iter_bytes(HTTP_HEAD_CHUNK_BYTES), max_bytes)
+        return HttpResponse(resp.status_code, dict(resp.headers), content, str(resp.url), resp.encoding, truncated)
+
+_transport: Any = None
+_transport_lock = threading.Lock()
+# Límite de conexiones por host: host -> [semáforo, peticiones que lo usan o esperan]
+_host_slots: Dict[str, List[Any]] = {}
+_host_slots_lock = threading.Lock()
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+def _max_per_host() -> int:
+    return max(1, _env_int("COMPAS_HTTP_MAX_PER_HOST", HTTP_MAX_CONNECTIONS_PER_HOST))
+
+def get_transport() -> Any:
+    """
+    Transporte compartido por todo el proceso (se crea en el primer uso).
+    COMPAS_HTTP2=1 activa httpx con HTTP/2 si `h2` está instalado; si no, requests con keep-alive.
+    """
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                max_per_host = _max_per_host()
+                if os.environ.get("COMPAS_HTTP2", "").lower() in ("1", "true", "yes"):
+                    try:
+                        _transport = _HttpxTransport(max_per_host)
+                    except ImportError as e:
+                        print(f"⚠️ HTTP/2 no disponible ({e}). Usando requests.")
+                if _transport is None:
+                    _transport = _RequestsTransport(max_per_host)
+    return _transport
+
+def set_transport(transport: Any) -> Any:
+    """
+    Reemplaza el transporte (ej. stand-ins locales en benchmarks). Devuelve el anterior.
+    Un transporte expone `retryable_errors` (tupla de excepciones) y
+    `get(url, params, headers, timeout) -> HttpResponse`; opcionalmente
+    `get_head(url, headers, timeout, max_bytes) -> HttpResponse` para lecturas parciales
+    y `timeout_errors` (tupla de excepciones que son timeouts).
+    """
+    global _transport
+    with _transport_lock:
+        previous, _transport = _transport, transport
+    return previous
+
+def is_timeout(error: BaseException) -> bool:
+    """True si el error es un timeout del transporte actual o del presupuesto del escaneo (y no, por ejemplo, un fallo de DNS)."""
+    return isinstance(error, DeadlineExceeded) or isinstance(error, getattr(get_transport(), "timeout_errors", (TimeoutError,)))
+
+@contextlib.contextmanager
+def _host_slot(url: str) -> Iterator[None]:
+    """
+    Una de las COMPAS_HTTP_MAX_PER_HOST conexiones del host. La entrada del host se borra cuando
+    nadie la usa ni la espera: en un proceso de larga vida (ASGI, batch) se sondean miles de hosts
+    distintos y el dict no debe crecer con cada uno.
+    """
+    host = urlparse(url).netloc.lower()
+    with _host_slots_lock:
+        entry = _host_slots.get(host)
+        if entry is None:
+            entry = _host_slots[host] = [threading.BoundedSemaphore(_max_per_host()), 0]
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _host_slots_lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _host_slots[host]
+
+def _normalize_timeout(timeout: Optional[Timeout]) -> Tuple[float, float]:
+    if timeout is None:
+        return (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    if isinstance(timeout, tuple):
+        return timeout
+    return (min(HTTP_CONNECT_TIMEOUT, timeout), timeout)
+
+def _retry_delay(attempt: int, resp: Optional[HttpResponse]) -> float:
+    """Backoff exponencial con jitter; respeta Retry-After numérico (acotado)."""
+    if resp is not None:
+        retry_after = resp.headers.get("retry-after")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), HTTP_BACKOFF_SECONDS * 8)
+    return HTTP_BACKOFF_SECONDS * (2 ** attempt) * (0.5 + random.random() / 2)
+
+def daily_quota_exhausted(resp: HttpResponse) -> bool:
+    """True si es un 429 por cuota diaria agotada (Google: 'dailyLimitExceeded', 'Queries per day')."""
+    if resp.status_code != 429:
+        return False
+    body = resp.content.lower()
+    return any(marker in body for marker in HTTP_DAILY_QUOTA_MARKERS)
+
+def _can_wait(delay: float) -> bool:
+    """False si esperar `delay` antes de reintentar ya no cabe en el presupuesto del escaneo."""
+    left = remaining()
+    return left is None or delay < left
+
+def _send(url: str, call: Callable[[Tuple[float, float]], HttpResponse], timeout: Optional[Timeout],
+          retries: int, **span_attributes: Any) -> HttpResponse:
+    """
+    Bucle común de envío: límite de conexiones por host, timeouts explícitos y reintentos
+    con backoff ante 429/5xx o errores de conexión (salvo un 429 de cuota diaria agotada).
+    Si se agotan los reintentos: devuelve la última respuesta o relanza el último error.
+    """
+    transport = get_transport()
+    timeout_pair = _normalize_timeout(timeout)
+
+    with telemetry.span("http.get", **{"http.host": urlparse(url).netloc}, **span_attributes) as span:
+        attempt = 0
+        while True:
+            span.set(**{"http.attempts": attempt + 1})
+            # Con presupuesto de tiempo (ver deadline.py) cada intento se acota a lo que queda
+            attempt_timeout = clamp_timeout(timeout_pair)
+            try:
+                with _host_slot(url):
+                    resp = call(attempt_timeout)
+            except transport.retryable_errors:
+                delay = _retry_delay(attempt, None)
+                if attempt >= retries or not _can_wait(delay):
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            delay = _retry_delay(attempt, resp)
+            if (resp.status_code not in HTTP_RETRY_STATUSES or daily_quota_exhausted(resp)
+                    or attempt >= retries or not _can_wait(delay)):
+                span.set(**{"http.status_code": resp.status_code, "bytes": len(resp.content)})
+                return resp
+            time.sleep(delay)
+            attempt += 1
+
+def get(url: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[Timeout] = None, retries: int = HTTP_MAX_RETRIES) -> HttpResponse:
+    """GET completo con conexiones reutilizadas (ver `_send` para límites y reintentos)."""
+    transport = get_transport()
+    return _send(url, lambda t: transport.get(url, params, headers, t), timeout, retries)
+
+def head_max_bytes() -> int:
+    """Tope de bytes a leer de una homepage (override: COMPAS_HEAD_MAX_BYTES)."""
+    return max(1024, _env_int("COMPAS_HEAD_MAX_BYTES", HTTP_HEAD_MAX_BYTES))
+
+def fetch_head(url: str, headers: Optional[Dict[str, str]] = None, timeout: Optional[Timeout] = None,
+               retries: int = HTTP_MAX_RETRIES, max_bytes: Optional[int] = None) -> HttpResponse:
+    """
+    GET en streaming que solo lee hasta el fin del <head> o hasta `max_bytes`
+    (lo primero que ocurra) y cierra la conexión sin descargar el resto de la página.
+    """
+    transport = get_transport()
+    limit = max_bytes or head_max_bytes()
+
+    def call(timeout_pair: Tuple[float, float]) -> HttpResponse:
+        if hasattr(transport, "get_head"):
+            return transport.get_head(url, headers, timeout_pair, limit)
+        # Transporte sin streaming: se descarga completo y se recorta igual
+        resp = transport.get(url, None, headers, timeout_pair)
+        content, truncated = read_head_prefix([resp.content], limit)
+        return HttpResponse(resp.status_code, resp.headers, content, resp.url, resp.encoding, truncated)
+
+    return _send(url, call, timeout, retries, **{"http.head_only": True})
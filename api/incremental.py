@@ -0,0 +1,130 @@
+"""
+Re-escaneo incremental para marcas que se siguen a diario.
+
+Guarda por marca el estado del último escaneo (contexto, ETag/Last-Modified de la homepage,
+clasificaciones y verificaciones por URL) y en el siguiente solo recalcula lo que cambió:
+la homepage se pide con GET condicional y los dominios ya vistos reutilizan su clasificación
+mientras el contexto de la marca sea el mismo. A la base de datos va solo el delta contra el
+último reporte guardado: competidores nuevos, desaparecidos y reclasificados.
+"""
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from . import telemetry
+from .cache import CacheBackend, MemoryCache, SQLiteCache
+from .compas_core import iter_compas_scan
+from .constants import SCAN_STATE_DEFAULT_PATH, SCAN_STATE_MAX_ENTRIES
+from .domains import normalize_brand_key
+from .scan_cache import get_scan_cache
+
+_state_store: Optional[CacheBackend] = None
+
+def get_state_store() -> CacheBackend:
+    """Estado por marca en SQLite local (COMPAS_STATE_PATH; '' = solo memoria del proceso)."""
+    global _state_store
+    if _state_store is None:
+        path = os.environ.get("COMPAS_STATE_PATH", SCAN_STATE_DEFAULT_PATH)
+        store: CacheBackend = MemoryCache(max_entries=SCAN_STATE_MAX_ENTRIES)
+        if path:
+            try:
+                store = SQLiteCache(path, table="scan_state", max_entries=SCAN_STATE_MAX_ENTRIES)
+            except Exception as e:
+                print(f"⚠️ Estado incremental en disco no disponible ({e}). Solo memoria.")
+        _state_store = store
+    return _state_store
+
+def _entries_by_url(report: Optional[Dict[str, Any]]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+    entries: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+    for c_type in ("HDA", "LDA"):
+        for entry in (report or {}).get(f"{c_type}_Competitors", []):
+            entries.setdefault(entry["url"], (c_type, entry))
+    return entries
+
+def diff_reports(previous: Optional[Dict[str, Any]], current: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Diferencia entre dos reportes, por URL de competidor:
+    {"added": [...], "removed": [...], "changed": [...], "unchanged": n}. Las entradas de
+    added/removed llevan "type" (HDA/LDA); las de changed, "from" y "to".
+    """
+    before, after = _entries_by_url(previous), _entries_by_url(current)
+    delta: Dict[str, Any] = {"added": [], "removed": [], "changed": [], "unchanged": 0}
+    for url, (c_type, entry) in after.items():
+        if url not in before:
+            delta["added"].append({"type": c_type, **entry})
+        elif before[url][0] != c_type:
+            delta["changed"].append({"url": url, "name": entry.get("name"), "from": before[url][0], "to": c_type})
+        else:
+            delta["unchanged"] += 1
+    for url, (c_type, entry) in before.items():
+        if url not in after:
+            delta["removed"].append({"type": c_type, **entry})
+    return delta
+
+def delta_counts(delta: Dict[str, Any]) -> Dict[str, int]:
+    return {"added": len(delta["added"]), "removed": len(delta["removed"]),
+            "changed": len(delta["changed"]), "unchanged": delta["unchanged"]}
+
+def _load_previous_report(user_input: str, state: Dict[str, Any], persist: bool) -> Tuple[Optional[Dict[str, Any]], str, str]:
+    """(reporte anterior, marca con la que está guardado, origen). La base de datos manda si está configurada."""
+    if persist:
+        from .db import load_previous_scan, persistence_configured
+        if persistence_configured():
+            try:
+                previous = load_previous_scan(user_input)
+            except Exception as e:
+                print(f"⚠️ No se pudo leer el escaneo anterior ({e}). Se usa el estado local.")
+            else:
+                if previous is not None:
+                    return previous["report"], previous["brand"], "db"
+    if state.get("report"):
+        return state["report"], user_input, "state"
+    return None, user_input, "none"
+
+def incremental_compas_scan(user_input: str, max_concurrency: Optional[int] = None,
+                            persist: bool = True) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Escaneo incremental con persistencia del delta. Devuelve (reporte, info) con
+    info = {"status": "incremental", "key", "context_reused", "reused", "previous", "delta", "saved"}.
+    Un reporte vacío (APIs caídas) o parcial (presupuesto de tiempo) no se persiste ni reemplaza el estado guardado.
+    """
+    key = normalize_brand_key(user_input)
+    store = get_state_store()
+    cached = store.get(key)
+    state: Dict[str, Any] = dict(cached[0]) if cached else {}
+    state.pop("context_reused", None)
+
+    report: Dict[str, Any] = {}
+    for event in iter_compas_scan(user_input, max_concurrency=max_concurrency, state=state):
+        if event["event"] == "summary":
+            report = event["data"]
+
+    info: Dict[str, Any] = {"status": "incremental", "key": key,
+                            "context_reused": bool(state.get("context_reused")), "reused": state.get("reused", 0),
+                            "previous": None, "delta": None, "saved": False}
+    if not (report.get("HDA_Competitors") or report.get("LDA_Competitors")) or report.get("partial"):
+        print(f"⚠️ Escaneo incremental vacío o parcial para '{user_input}': se conserva el estado anterior.")
+        return report, info
+
+    with telemetry.span("scan.incremental_diff") as span:
+        previous, stored_brand, source = _load_previous_report(user_input, state, persist)
+        delta = diff_reports(previous, report)
+        info.update(previous=source, delta=delta_counts(delta))
+        span.set(previous=source, **info["delta"])
+
+    if persist:
+        from .db import persistence_configured, save_scan_delta, save_scan_results
+        if persistence_configured():
+            try:
+                if source == "db":
+                    info["saved"] = save_scan_delta(stored_brand, report, delta)
+                else:
+                    info["saved"] = save_scan_results(user_input, report)
+            except Exception as db_error:
+                print(f"⚠️ Error guardando el delta en DB (No crítico): {db_error}")
+
+    state.pop("context_reused", None)
+    store.set(key, {**state, "report": report})
+    get_scan_cache().set(key, report)
+    print(f"📈 Incremental '{user_input}': {info['delta']} (reutilizados: {info['reused']}, "
+          f"contexto {'sin cambios' if info['context_reused'] else 'recalculado'})")
+    return report, info
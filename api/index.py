@@ -1,18 +1,20 @@
 from http.server import BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
-import json
-import os
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-from .compas_core import run_compas_scan
-from .db import save_scan_results
+from . import endpoint, telemetry
+from .deadline import deadline_scope
+from .jsonstream import write_json
+
+# El pipeline (scan_cache, db, batch) se importa dentro de cada método que lo usa:
+# un preflight o un error de validación responde sin cargar nada más que la stdlib.
 
 class handler(BaseHTTPRequestHandler):
     
     def _send_cors_headers(self):
         """Configura cabeceras CORS para permitir peticiones desde cualquier origen."""
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'X-Requested-With, Content-Type')
 
     def do_OPTIONS(self):
@@ -27,43 +29,110 @@ class handler(BaseHTTPRequestHandler):
         self.send_header('Content-type', 'application/json')
         self._send_cors_headers()
         self.end_headers()
-        self.wfile.write(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+        write_json(data, self.wfile)
+
+    def _read_body(self) -> str:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length).decode('utf-8') if length else ""
+
+    def _write_ndjson_line(self, data: Dict[str, Any]):
+        write_json(data, self.wfile, end="\n")
+        self.wfile.flush()
+
+    def _write_event(self, mode: str, event: Dict[str, Any]):
+        """Escribe un evento del escaneo como SSE (`event:`/`data:`) o como línea NDJSON."""
+        if mode == "sse":
+            self.wfile.write(f"event: {event['event']}\ndata: ".encode('utf-8'))
+            write_json(event["data"], self.wfile, end="\n\n")
+            self.wfile.flush()
+        else:
+            self._write_ndjson_line(event)
+
+    def _send_scan_stream(self, target_brand: str, refresh: bool, mode: str, trace: Optional[telemetry.Trace] = None):
+        """
+        Streaming del escaneo: contexto, cada competidor/descartado en cuanto se clasifica
+        y el resumen final. La persistencia ocurre después de enviar el resumen.
+        """
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream' if mode == "sse" else 'application/x-ndjson')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('X-Accel-Buffering', 'no')
+        self._send_cors_headers()
+        self.end_headers()
+
+        from .scan_cache import iter_cached_compas_scan
+
+        scan_report, cache_info = None, {}
+        try:
+            for event in iter_cached_compas_scan(target_brand, refresh=refresh):
+                if event["event"] == "cache":
+                    cache_info = event["data"]
+                elif event["event"] == "summary":
+                    scan_report = event["data"]
+                self._write_event(mode, event)
+        except Exception as e:
+            print(f"❌ Error Crítico en streaming: {e}")
+            self._write_event(mode, {"event": "error", "data": endpoint.error_response(str(e))})
+            return
+
+        if scan_report is not None:
+            endpoint.log_and_persist(target_brand, scan_report, cache_info)
+        if trace is not None:
+            self._write_event(mode, {"event": "timings", "data": trace.timings()})
+
+    def do_POST(self):
+        """
+        Batch: escanea muchas marcas y devuelve NDJSON en streaming (una línea por marca
+        según van terminando) más una línea final de resumen. Persistencia en un solo upsert.
+        """
+        try:
+            brands, options = endpoint.parse_batch_request(self._read_body())
+        except ValueError as e:
+            return self._send_json_response(400, endpoint.error_response(str(e)))
+
+        from .batch import BatchTally, iter_batch_scan
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/x-ndjson')
+        self._send_cors_headers()
+        self.end_headers()
+
+        tally = BatchTally()
+        try:
+            for result in iter_batch_scan(brands, **options):
+                tally.add(result)
+                self._write_ndjson_line(result)
+        except Exception as e:
+            print(f"❌ Error Crítico en batch: {e}")
+            self._write_ndjson_line(endpoint.error_response(str(e)))
+
+        self._write_ndjson_line(endpoint.finish_batch(len(brands), tally))
 
     def do_GET(self):
         try:
             # 1. Parsear y Validar Input
-            query = urlparse(self.path).query
-            params = parse_qs(query)
-            target_brand = params.get('brand', [None])[0]
-
-            if not target_brand:
-                return self._send_json_response(400, {
-                    "status": "error",
-                    "message": "Parámetro 'brand' es requerido (ej. ?brand=Hulu)"
-                })
-
-            # 2. Ejecutar Lógica de Negocio
-            scan_report = run_compas_scan(target_brand)
-            
-            # 3. Persistencia (Opcional pero recomendada)
-            if os.environ.get("SUPABASE_URL"): 
-                try:
-                    save_scan_results(target_brand, scan_report)
-                except Exception as db_error:
-                    print(f"⚠️ Error guardando en DB (No crítico): {db_error}")
+            try:
+                request = endpoint.parse_scan_request(parse_qs(urlparse(self.path).query), self.headers.get('Accept'))
+            except ValueError as e:
+                return self._send_json_response(400, endpoint.error_response(str(e)))
+            target_brand, mode = request["brand"], request["stream"]
+
+            # 2. Ejecutar Lógica de Negocio (con caché)
+            with telemetry.start_trace("GET /api", brand=target_brand, stream=mode or "none") as trace, \
+                    deadline_scope(request["budget"]):
+                if mode:
+                    return self._send_scan_stream(target_brand, request["refresh"], mode,
+                                                  trace if request["debug_timings"] else None)
+
+                from .scan_cache import cached_compas_scan
+                scan_report, cache_info = cached_compas_scan(target_brand, refresh=request["refresh"])
+                
+                # 3. Persistencia
+                endpoint.log_and_persist(target_brand, scan_report, cache_info)
             
             # 4. Respuesta Exitosa
-            return self._send_json_response(200, {
-                "status": "success",
-                "target": target_brand,
-                "data": scan_report,
-                "message": "Escaneo completado exitosamente."
-            })
+            timings = trace.timings() if request["debug_timings"] else None
+            return self._send_json_response(200, endpoint.scan_response(target_brand, scan_report, cache_info, timings=timings))
             
         except Exception as e:
-            print(f"❌ Error Crítico en Handler: {e}")
-            return self._send_json_response(500, {
-                "status": "error", 
-                "message": "Error interno del servidor procesando la solicitud.",
-                "debug": str(e)  # Útil para desarrollo, quitar en prod real si es sensible
-            })
+            return self._send_json_response(500, endpoint.server_error_response(e))
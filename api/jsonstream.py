@@ -0,0 +1,98 @@
+"""
+Serialización JSON incremental: el documento se escribe por bloques directo al destino (`wfile`
+del handler, un archivo, stdout) en vez de armarse entero en memoria con `json.dumps`.
+
+Las listas largas (competidores, resultados de un batch, filas) y los objetos que las contienen se
+recorren por tramos de JSON_STREAM_INLINE_ITEMS elementos; cada tramo se codifica de una vez con el
+encoder en C de la stdlib (un documento chico, como una línea de NDJSON, es un solo `encode`).
+La salida es idéntica a `json.dumps(obj, ensure_ascii=False)`.
+"""
+import io
+import json
+from typing import Any, Dict, Iterator
+
+from .constants import JSON_STREAM_BUFFER_BYTES, JSON_STREAM_INLINE_ITEMS
+
+def _default(obj: Any) -> Dict[str, Any]:
+    # Modelos con __slots__ (ver models.py): se serializan por su forma dict
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+_encode = json.JSONEncoder(ensure_ascii=False, default=_default).encode
+
+def _encode_key(key: Any) -> str:
+    """Clave de objeto como la escribe `json.dumps`: True -> "true", None -> "null", 1.5 -> "1.5"."""
+    if isinstance(key, str):
+        return _encode(key)
+    if key is None or isinstance(key, (bool, int, float)):
+        return f'"{_encode(key)}"'
+    raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+
+def _is_large(value: Any) -> bool:
+    if isinstance(value, (list, tuple)):
+        return len(value) > JSON_STREAM_INLINE_ITEMS
+    if isinstance(value, dict):
+        return any(_is_large(v) for v in value.values())
+    return False
+
+def iter_json(obj: Any) -> Iterator[str]:
+    """Fragmentos de texto JSON de `obj`, en orden."""
+    if hasattr(obj, "to_dict"):
+        obj = obj.to_dict()
+    if not _is_large(obj):
+        yield _encode(obj)
+    elif isinstance(obj, dict):
+        yield "{"
+        for i, (key, value) in enumerate(obj.items()):
+            yield f"{', ' if i else ''}{_encode_key(key)}: "
+            yield from iter_json(value)
+        yield "}"
+    else:
+        items = obj if isinstance(obj, list) else list(obj)
+        step = JSON_STREAM_INLINE_ITEMS
+        yield "["
+        for start in range(0, len(items), step):
+            part = items[start:start + step]
+            if start:
+                yield ", "
+            if any(_is_large(item) for item in part):
+                for i, item in enumerate(part):
+                    if i:
+                        yield ", "
+                    yield from iter_json(item)
+            else:
+                yield _encode(part)[1:-1]  # Sin los corchetes del tramo
+        yield "]"
+
+def _text_chunks(obj: Any, end: str, buffer_bytes: int) -> Iterator[str]:
+    parts, size = [], 0
+    for fragment in iter_json(obj):
+        parts.append(fragment)
+        size += len(fragment)
+        if size >= buffer_bytes:
+            yield "".join(parts)
+            parts, size = [], 0
+    parts.append(end)
+    yield "".join(parts)
+
+def iter_json_chunks(obj: Any, end: str = "", buffer_bytes: int = JSON_STREAM_BUFFER_BYTES) -> Iterator[bytes]:
+    """El JSON de `obj` (+ `end`) en bloques UTF-8 de ~`buffer_bytes` (el último puede ser más chico)."""
+    for chunk in _text_chunks(obj, end, buffer_bytes):
+        yield chunk.encode("utf-8")
+
+def write_json(obj: Any, fp: Any, end: str = "", buffer_bytes: int = JSON_STREAM_BUFFER_BYTES) -> None:
+    """
+    Escribe el JSON de `obj` (+ `end`, ej. "\\n" para NDJSON) en `fp` por bloques.
+    `fp` puede ser binario (wfile, archivo 'wb') o de texto (archivo 'w', sys.stdout).
+    """
+    if isinstance(fp, io.TextIOBase):
+        for chunk in _text_chunks(obj, end, buffer_bytes):
+            fp.write(chunk)
+    else:
+        for chunk in iter_json_chunks(obj, end, buffer_bytes):
+            fp.write(chunk)
+
+def json_size(obj: Any) -> int:
+    """Bytes UTF-8 del JSON de `obj`, sin materializar el documento completo."""
+    return sum(len(fragment.encode("utf-8")) for fragment in iter_json(obj))
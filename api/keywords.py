@@ -0,0 +1,293 @@
+"""
+Motor de keywords con IDF del corpus de homepages leídas.
+
+Cada homepage que el pipeline parsea (la de la marca y las de los candidatos verificados) se suma
+al corpus: un vocabulario compacto (token -> id) y una tabla de document frequency respaldada por
+`array('I')`, persistidos en un archivo binario (COMPAS_IDF_PATH). Las keywords de un texto se
+puntúan por tf * idf: las palabras que aparecen en casi todas las homepages ("watch", "shows",
+"account") pesan menos que las que distinguen a la marca.
+Con pocas homepages observadas (< KEYWORDS_MIN_DOCS) el IDF no es confiable y se usa frecuencia simple.
+"""
+import array
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .constants import (
+    KEYWORDS_IDF_DEFAULT_PATH, KEYWORDS_MAX_VOCAB, KEYWORDS_MIN_DOCS,
+    KEYWORDS_SAVE_EVERY_DOCS, KEYWORDS_VECTORIZE_MIN_DOCS, STOP_WORDS,
+)
+
+# Tokenizador precompilado: palabras de 3+ caracteres; se descartan stopwords y números
+_TOKEN_RE = re.compile(r"\w{3,}")
+_FILE_MAGIC = b"COMPASIDF1\n"
+
+def tokenize(text: str) -> List[str]:
+    """Tokens con significado de un texto (en minúsculas), en orden de aparición."""
+    if not text:
+        return []
+    return [w for w in _TOKEN_RE.findall(text.lower()) if w not in STOP_WORDS and not w.isdigit()]
+
+def _at_word_start(text: str, keyword: str) -> bool:
+    i = text.find(keyword)
+    while i >= 0:
+        if i == 0 or not (text[i - 1].isalnum() or text[i - 1] == "_"):
+            return True
+        i = text.find(keyword, i + 1)
+    return False
+
+def keyword_hits(keywords: Sequence[str], text: str) -> List[str]:
+    """
+    Keywords presentes en `text` (ya en minúsculas) como palabra o comienzo de palabra
+    ('stream' ~ 'streaming', pero no 'art' dentro de 'smart'), en el orden de `keywords`.
+    Solo búsquedas de subcadena (en C): la frontera de palabra se mira en el carácter anterior.
+    """
+    if not keywords or not text:
+        return []
+    return [k for k in keywords if _at_word_start(text, k)]
+
+def _doc_hash(doc_key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(doc_key.encode("utf-8"), digest_size=8).digest(), "little")
+
+def load_numpy() -> Any:
+    """numpy si está instalado (dependencia opcional), si no None. También lo usa `compas_core.classify_competitors`."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+class KeywordEngine:
+    """
+    Vocabulario + tabla de document frequency del corpus de homepages. Cada documento cuenta una
+    sola vez por `doc_key` (el host): re-leer una homepage no infla sus términos.
+    Thread-safe; se persiste cada KEYWORDS_SAVE_EVERY_DOCS documentos nuevos (y con `save()`).
+    """
+
+    def __init__(self, path: Optional[str] = None, max_vocab: int = KEYWORDS_MAX_VOCAB):
+        self.path = path
+        self.max_vocab = max_vocab
+        self.docs = 0
+        self._vocab: Dict[str, int] = {}
+        self._terms: List[str] = []
+        self._df = array.array("I")
+        self._seen: set = set()
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    # --- Persistencia ---
+
+    def _load(self) -> None:
+        """Formato: magic, cabecera JSON (una línea), vocabulario utf-8 ('\\n'), df (uint32), hashes de docs (uint64)."""
+        try:
+            with open(self.path, "rb") as f:
+                if f.readline() != _FILE_MAGIC:
+                    raise ValueError("no es un archivo de IDF")
+                header = json.loads(f.readline())
+                terms = f.read(header["vocab_bytes"]).decode("utf-8").split("\n") if header["terms"] else []
+                df = array.array("I")
+                df.frombytes(f.read(header["terms"] * df.itemsize))
+                seen = array.array("Q")
+                seen.frombytes(f.read(header["seen"] * seen.itemsize))
+            if header["byteorder"] != sys.byteorder:
+                df.byteswap()
+                seen.byteswap()
+            if len(terms) != len(df):
+                raise ValueError("vocabulario y tabla de pesos no coinciden")
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"⚠️ IDF de keywords ilegible ({e}): se empieza un corpus nuevo.")
+            return
+        self.docs = header["docs"]
+        self._terms = terms
+        self._vocab = {term: i for i, term in enumerate(terms)}
+        self._df = df
+        self._seen = set(seen)
+
+    def save(self) -> bool:
+        """Escritura atómica (archivo temporal + rename). False si no hay ruta o falla."""
+        if not self.path:
+            return False
+        with self._lock:
+            vocab = "\n".join(self._terms).encode("utf-8")
+            df = self._df.tobytes()
+            seen = array.array("Q", self._seen).tobytes()
+            header = {"docs": self.docs, "terms": len(self._terms), "vocab_bytes": len(vocab),
+                      "seen": len(self._seen), "byteorder": sys.byteorder}
+            self._unsaved = 0
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(_FILE_MAGIC)
+                f.write(json.dumps(header).encode("utf-8") + b"\n")
+                f.write(vocab)
+                f.write(df)
+                f.write(seen)
+            os.replace(tmp, self.path)
+            return True
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el IDF de keywords ({e}).")
+            return False
+
+    # --- Corpus ---
+
+    def observe(self, text: str, doc_key: str) -> bool:
+        """Suma una homepage al corpus (una vez por `doc_key`). True si era nueva."""
+        return self.observe_many([(doc_key, text)]) == 1
+
+    def observe_many(self, documents: Iterable[Tuple[str, str]]) -> int:
+        """Varias homepages (doc_key, texto) con un solo lock; devuelve cuántas eran nuevas."""
+        return self._add([(_doc_hash(key), set(tokenize(text))) for key, text in documents if key and text])
+
+    def _add(self, prepared: List[Tuple[int, Iterable[str]]]) -> int:
+        added = 0
+        with self._lock:
+            for doc_hash, terms in prepared:
+                if doc_hash in self._seen or not terms:
+                    continue
+                self._seen.add(doc_hash)
+                self.docs += 1
+                added += 1
+                for term in terms:
+                    term_id = self._vocab.get(term)
+                    if term_id is None:
+                        if len(self._terms) >= self.max_vocab:
+                            continue  # Vocabulario lleno: el término queda con el IDF de uno nunca visto
+                        term_id = self._vocab[term] = len(self._terms)
+                        self._terms.append(term)
+                        self._df.append(0)
+                    self._df[term_id] += 1
+            self._unsaved += added
+            flush = self.path and self._unsaved >= KEYWORDS_SAVE_EVERY_DOCS
+        if flush:
+            self.save()
+        return added
+
+    def idf(self, term: str) -> float:
+        """IDF suavizado: ln((1 + N) / (1 + df)) + 1; un término nunca visto tiene el máximo."""
+        term_id = self._vocab.get(term)
+        df = self._df[term_id] if term_id is not None else 0
+        return math.log(1 + self.docs) + 1 - math.log(1 + df)
+
+    def uses_idf(self) -> bool:
+        return self.docs >= KEYWORDS_MIN_DOCS
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"docs": self.docs, "terms": len(self._terms), "uses_idf": self.uses_idf(),
+                    "bytes": len(self._df) * self._df.itemsize + sum(len(t) + 1 for t in self._terms)}
+
+    # --- Puntuación ---
+
+    def keywords(self, text: str, top_n: int = 5, doc_key: Optional[str] = None) -> List[str]:
+        """
+        Las `top_n` keywords de un texto por tf * idf (a igual puntaje, la que aparece primero).
+        Con `doc_key` el texto además se suma al corpus (como `observe`) sin tokenizarlo dos veces.
+        """
+        counts = Counter(tokenize(text))
+        if doc_key and counts:
+            self._add([(_doc_hash(doc_key), counts.keys())])
+        if not self.uses_idf():
+            return [w for w, _ in counts.most_common(top_n)]
+        with self._lock:
+            return self._top(counts, top_n, {})
+
+    def _top(self, counts: Counter, top_n: int, idf_cache: Dict[str, float]) -> List[str]:
+        """tf * idf de un documento (con el lock tomado); `idf_cache` se comparte entre los textos de un lote."""
+        log = math.log
+        vocab_get = self._vocab.get
+        df = self._df
+        top = log(1 + self.docs) + 1
+        weights: Dict[str, float] = {}
+        for term, count in counts.items():
+            idf = idf_cache.get(term)
+            if idf is None:
+                term_id = vocab_get(term)
+                idf = idf_cache[term] = top - log(1 + df[term_id]) if term_id is not None else top
+            weights[term] = count * idf
+        # nlargest equivale a sorted(reverse=True)[:n], estable: los empates conservan el orden de aparición
+        return heapq.nlargest(top_n, weights, key=weights.__getitem__)
+
+    def score_documents(self, texts: Sequence[str], top_n: int = 5, vectorized: Optional[bool] = None,
+                        doc_keys: Optional[Sequence[Optional[str]]] = None) -> List[List[str]]:
+        """
+        `keywords` para muchos textos en una pasada (mismo resultado, en el mismo orden).
+        Con `doc_keys` (uno por texto) los textos se suman antes al corpus, como `keywords(doc_key=)`.
+        Con numpy se cuentan todos los pares (documento, término) de una vez con `np.unique`, los
+        pesos salen de la tabla de df como un array y el top de cada documento, de un solo `lexsort`.
+        `vectorized`: None = numpy si está instalado y el lote tiene al menos KEYWORDS_VECTORIZE_MIN_DOCS
+        textos, True = exigirlo, False = Python puro.
+        """
+        np = load_numpy() if vectorized is not False else None
+        if vectorized and np is None:
+            raise ImportError("score_documents(vectorized=True) requiere numpy.")
+        if vectorized is None and len(texts) < KEYWORDS_VECTORIZE_MIN_DOCS:
+            np = None  # En lotes chicos el costo fijo de numpy supera lo que ahorra
+        tokens = [tokenize(text) for text in texts]
+        if doc_keys is not None:
+            self._add([(_doc_hash(key), set(doc)) for key, doc in zip(doc_keys, tokens) if key and doc])
+        if not self.uses_idf():
+            return [[w for w, _ in Counter(doc).most_common(top_n)] for doc in tokens]
+        if np is None:
+            # Python puro: tokenización fuera del lock y un solo cálculo de idf por término del lote
+            counted = [Counter(doc) for doc in tokens]
+            idf_cache: Dict[str, float] = {}
+            with self._lock:
+                return [self._top(counts, top_n, idf_cache) for counts in counted]
+
+        # Ids compactos (solo los términos del lote) y su df, leído con el lock: un observe
+        # concurrente puede hacer crecer la tabla. El costo no depende del tamaño del vocabulario.
+        local: Dict[str, int] = {}
+        df_batch: List[int] = []
+        ids: List[int] = []
+        doc_of: List[int] = []
+        with self._lock:
+            vocab_get = self._vocab.get
+            table = self._df
+            for doc, terms in enumerate(tokens):
+                for term in terms:
+                    term_id = local.get(term)
+                    if term_id is None:
+                        term_id = local[term] = len(df_batch)
+                        vocab_id = vocab_get(term)
+                        df_batch.append(table[vocab_id] if vocab_id is not None else 0)
+                    ids.append(term_id)
+                    doc_of.append(doc)
+            docs = self.docs
+        if not ids:
+            return [[] for _ in texts]
+
+        width = len(local)
+        pairs = np.asarray(doc_of, dtype=np.int64) * width + np.asarray(ids, dtype=np.int64)
+        unique, first, counts = np.unique(pairs, return_index=True, return_counts=True)
+        doc_ids, term_ids = np.divmod(unique, width)
+        weights = math.log(1 + docs) + 1 - np.log(1 + np.asarray(df_batch, dtype=np.float64))
+        scores = counts * weights[term_ids]
+        # Por documento; dentro, mayor puntaje primero y a igual puntaje el que aparece antes
+        order = np.lexsort((first, -scores, doc_ids))
+        starts = np.searchsorted(doc_ids[order], np.arange(len(texts) + 1))
+        names = list(local)
+        return [[names[t] for t in term_ids[order[starts[d]:min(starts[d + 1], starts[d] + top_n)]]]
+                for d in range(len(texts))]
+
+_engine: Optional[KeywordEngine] = None
+_engine_lock = threading.Lock()
+
+def get_keyword_engine() -> KeywordEngine:
+    """Singleton; COMPAS_IDF_PATH='' lo deja solo en memoria."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = KeywordEngine(os.environ.get("COMPAS_IDF_PATH", KEYWORDS_IDF_DEFAULT_PATH) or None)
+    return _engine
@@ -0,0 +1,79 @@
+import re
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+def _trie_pattern(node: Dict[str, dict]) -> str:
+    """
+    Convierte un trie {char: subtrie} en una regex factorizada (ej. 'a(?:mazon|pple)').
+    Clave '' = fin de término. Los hijos empiezan por caracteres distintos y los sufijos
+    opcionales son codiciosos, así que en cada posición la regex captura el término MÁS LARGO.
+    """
+    terminal = "" in node
+    branches = [re.escape(ch) + _trie_pattern(child) for ch, child in sorted(node.items()) if ch]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if terminal:
+        return (body if len(branches) > 1 else "(?:" + body + ")") + "?"
+    return body
+
+class TermMatcher:
+    """
+    Matcher de subcadenas sobre varias listas de términos, compilado una sola vez.
+    Una pasada de `finditer` devuelve TODAS las listas (y términos) contenidos en un texto,
+    con el mismo resultado que `any(term in text for term in lista)` para cada lista.
+    """
+
+    def __init__(self, lists: Dict[str, Iterable[str]]):
+        self.term_lists: Dict[str, Set[str]] = {}
+        for list_name, terms in lists.items():
+            for term in terms:
+                if term:
+                    self.term_lists.setdefault(term, set()).add(list_name)
+
+        trie: Dict[str, dict] = {}
+        for term in self.term_lists:
+            node = trie
+            for ch in term:
+                node = node.setdefault(ch, {})
+            node[""] = {}
+
+        # Lookahead: detecta coincidencias solapadas empezando en cada posición del texto.
+        # El prefiltro por primer carácter descarta rápido las posiciones sin candidato.
+        first_chars = "".join(re.escape(ch) for ch in sorted(trie))
+        self._regex = re.compile(f"(?=[{first_chars}])(?=({_trie_pattern(trie)}))") if trie else re.compile(r"(?!)")
+
+        # El término más largo en una posición implica a todos los términos que son prefijo suyo
+        self._implied_terms: Dict[str, Tuple[str, ...]] = {}
+        self._implied_lists: Dict[str, FrozenSet[str]] = {}
+        self._implied_by_list: Dict[str, Dict[str, Tuple[str, ...]]] = {}
+        for term in self.term_lists:
+            implied = tuple(term[:i] for i in range(1, len(term) + 1) if term[:i] in self.term_lists)
+            self._implied_terms[term] = implied
+            self._implied_lists[term] = frozenset(name for t in implied for name in self.term_lists[t])
+            by_list: Dict[str, Tuple[str, ...]] = {}
+            for list_name in self._implied_lists[term]:
+                by_list[list_name] = tuple(t for t in implied if list_name in self.term_lists[t])
+            self._implied_by_list[term] = by_list
+
+    def lists_in(self, text: str) -> FrozenSet[str]:
+        """Nombres de las listas con al menos un término contenido en `text`."""
+        found: Set[str] = set()
+        for longest in set(self._regex.findall(text)):
+            found |= self._implied_lists[longest]
+        return frozenset(found)
+
+    def scan(self, text: str) -> Dict[str, Set[str]]:
+        """Por cada lista con coincidencias, el conjunto de términos encontrados en `text`."""
+        result: Dict[str, Set[str]] = {}
+        for longest in set(self._regex.findall(text)):
+            for term in self._implied_terms[longest]:
+                for list_name in self.term_lists[term]:
+                    result.setdefault(list_name, set()).add(term)
+        return result
+
+    def terms_in(self, text: str, list_name: str) -> List[str]:
+        """Términos de `list_name` contenidos en `text`."""
+        found: Set[str] = set()
+        for longest in self._regex.findall(text):
+            found.update(self._implied_by_list[longest].get(list_name, ()))
+        return list(found)
@@ -1,17 +1,9 @@
-from urllib.parse import urlparse
-from typing import List, Dict, Any, Union
+from typing import List, Dict
 
-def clean_url(url: Union[str, None]) -> str:
-    if not url: return ""
-    try:
-        if not url.startswith('http'):
-            url = 'https://' + url
-        parsed = urlparse(url)
-        return f"{parsed.scheme}://{parsed.netloc}"
-    except:
-        return url
+from .domains import clean_url
+from .models import Candidate
 
-def get_mock_candidates(brand_name: str) -> List[Dict[str, Any]]:
+def get_mock_candidates(brand_name: str) -> List[Candidate]:
     """
     Datos de respaldo para demostración cuando se acaba la cuota de la API.
     """
@@ -38,10 +30,5 @@ def get_mock_candidates(brand_name: str) -> List[Dict[str, Any]]:
             {"link": "https://www.niche-player.io", "title": "Niche Solution", "snippet": "Specialized tool..."}
         ]
     
-    return [{
-        "clean_url": clean_url(m["link"]), 
-        "link": m["link"], 
-        "title": m["title"], 
-        "snippet": m["snippet"], 
-        "source": "mock"
-    } for m in mocks]
+    return [Candidate(clean_url(m["link"]), link=m["link"], title=m["title"], snippet=m["snippet"], source="mock")
+            for m in mocks]
@@ -0,0 +1,64 @@
+"""
+Modelos compactos del pipeline (`__slots__`: sin un dict por instancia).
+
+Un candidato guarda solo los campos que el pipeline usa (título, snippet, URLs, origen y las pistas
+de Gemini o del índice). Un ítem de Google CSE trae además pagemap, htmlSnippet, formattedUrl...:
+`search_item` lo recorta a lo útil antes de que entre a la caché de CSE.
+"""
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Union
+
+# Campos de un ítem de Google CSE que el pipeline lee (el resto se descarta al recibir la respuesta)
+SEARCH_ITEM_FIELDS = ("title", "link", "snippet")
+
+def search_item(item: Mapping[str, Any]) -> Dict[str, Any]:
+    """Ítem de CSE recortado a SEARCH_ITEM_FIELDS (sigue siendo JSON: la caché de CSE lo persiste)."""
+    return {k: item[k] for k in SEARCH_ITEM_FIELDS if item.get(k) is not None}
+
+class Candidate:
+    """
+    Candidato a competidor (búsqueda, búsqueda directa, índice, Gemini o demo).
+    Admite también la lectura tipo dict (`cand["clean_url"]`, `cand.get("source")`): las funciones
+    públicas de clasificación aceptan tanto candidatos como dicts.
+    """
+    __slots__ = ("clean_url", "link", "title", "snippet", "source", "gemini_type", "index")
+
+    def __init__(self, clean_url: str, link: Optional[str] = None, title: Optional[str] = None,
+                 snippet: Optional[str] = None, source: Optional[str] = None,
+                 gemini_type: Optional[str] = None, index: Optional[Dict[str, int]] = None):
+        self.clean_url = clean_url
+        self.link = link
+        self.title = title
+        self.snippet = snippet
+        self.source = source
+        self.gemini_type = gemini_type
+        self.index = index
+
+    @classmethod
+    def from_search_item(cls, item: Mapping[str, Any], clean_url: str, source: str = "search") -> "Candidate":
+        return cls(clean_url, link=item.get("link"), title=item.get("title"), snippet=item.get("snippet"), source=source)
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "Candidate":
+        return cls(**{k: data.get(k) for k in cls.__slots__})
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Como `dict.get`; un campo vacío (None) también devuelve `default`."""
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: getattr(self, k) for k in self.__slots__ if getattr(self, k) is not None}
+
+    def __repr__(self) -> str:
+        return f"Candidate({self.clean_url!r}, source={self.source!r})"
+
+def candidates_from_dicts(items: Iterable[Mapping[str, Any]]) -> List[Candidate]:
+    return [item if isinstance(item, Candidate) else Candidate.from_dict(item) for item in items]
+
+# Lo que aceptan las funciones públicas de clasificación: un Candidate o un dict con las mismas claves
+CandidateLike = Union[Candidate, Mapping[str, Any]]
@@ -0,0 +1,188 @@
+"""
+Pre-calentamiento de la caché de escaneos para las marcas más pedidas.
+
+La popularidad sale del registro de peticiones (COMPAS_REQUEST_LOG) y/o de las marcas guardadas
+en 'competitor_scans'. En cada ciclo se re-escanean, de la más pedida a la menos, las que no están
+en caché o vencen dentro de `lead_seconds`, con un pool acotado de hilos, un tope de escaneos y
+una reserva del presupuesto diario de Google CSE para los usuarios. Para que los hits lleguen al
+servidor la caché tiene que ser compartida (COMPAS_CACHE_BACKEND con sqlite o supabase).
+"""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from . import telemetry
+from .constants import (
+    DEFAULT_PREWARM_WORKERS, PREWARM_CSE_RESERVE, PREWARM_INTERVAL_SECONDS, PREWARM_LEAD_SECONDS,
+    PREWARM_LOG_WINDOW_SECONDS, PREWARM_MAX_SCANS, PREWARM_TOP_BRANDS
+)
+from .domains import normalize_brand_key
+from .scan_cache import cached_compas_scan, get_scan_cache
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+def popular_brands(limit: int, log_path: Optional[str] = None, use_db: bool = True,
+                   window_seconds: float = PREWARM_LOG_WINDOW_SECONDS) -> List[Dict[str, Any]]:
+    """
+    Marcas ordenadas por popularidad: [{"brand", "key", "hits", "last_seen"}]. Las del registro
+    van por cantidad de peticiones en la ventana; las que solo están en la base de datos (hits=0)
+    completan la lista por fecha de su último escaneo guardado.
+    """
+    brands: Dict[str, Dict[str, Any]] = {}
+    if log_path:
+        from .request_log import read_request_counts
+        try:
+            for key, entry in read_request_counts(log_path, window_seconds).items():
+                brands[key] = {"key": key, **entry}
+        except OSError as e:
+            print(f"⚠️ Registro de peticiones no disponible ({e}).")
+
+    if use_db:
+        from .db import persistence_configured, recent_brands
+        if persistence_configured():
+            try:
+                for brand, stored_at in recent_brands(limit):
+                    key = normalize_brand_key(brand)
+                    brands.setdefault(key, {"key": key, "brand": brand, "hits": 0, "last_seen": stored_at})
+            except Exception as e:
+                print(f"⚠️ No se pudieron leer las marcas guardadas ({e}).")
+
+    ranked = sorted(brands.values(), key=lambda b: (-b["hits"], -(b["last_seen"] or 0.0)))
+    return ranked[:limit]
+
+def plan_prewarm(brands: List[Dict[str, Any]], lead_seconds: float) -> List[Dict[str, Any]]:
+    """
+    Estado en caché de cada marca: agrega "age_seconds", "expires_in" (None si no hay entrada) y
+    "due" (no está o vence dentro de `lead_seconds`). Prioridad: más pedidas primero y, a igual
+    popularidad, las que vencen antes.
+    """
+    cache = get_scan_cache()
+    plan = []
+    for brand in brands:
+        report, info = cache.lookup(brand["key"], allow_stale=True)
+        age = info["age_seconds"] if report is not None else None
+        expires_in = None if age is None else round(cache.ttl_seconds - age, 1)
+        plan.append({**brand, "age_seconds": age, "expires_in": expires_in,
+                     "due": expires_in is None or expires_in <= lead_seconds})
+    plan.sort(key=lambda p: (-p["hits"], p["expires_in"] if p["expires_in"] is not None else float("-inf")))
+    return plan
+
+def cse_budget_remaining() -> Optional[int]:
+    """Consultas de Google CSE que quedan hoy (None si no se puede saber)."""
+    try:
+        from .quota import get_quota_manager
+        return get_quota_manager().budget.remaining()
+    except Exception as e:
+        print(f"⚠️ Presupuesto de CSE no disponible ({e}).")
+        return None
+
+def _prewarm_one(item: Dict[str, Any], incremental: bool, persist: bool) -> Dict[str, Any]:
+    started = time.perf_counter()
+    result = {"target": item["brand"], "key": item["key"], "hits": item["hits"], "age_seconds": item["age_seconds"]}
+    try:
+        with telemetry.start_trace("prewarm.scan", brand=item["brand"], hits=item["hits"]):
+            if incremental:
+                from .incremental import incremental_compas_scan
+                report, cache_info = incremental_compas_scan(item["brand"], persist=persist)
+            else:
+                report, cache_info = cached_compas_scan(item["brand"], refresh=True)
+                if persist and (report.get("HDA_Competitors") or report.get("LDA_Competitors")):
+                    from .db import persist_scan, persistence_configured
+                    if persistence_configured():
+                        persist_scan(item["brand"], report)
+        counts = {c_type: len(report.get(f"{c_type}_Competitors", [])) for c_type in ("HDA", "LDA")}
+        # Un reporte vacío (APIs caídas) no se cachea: la marca sigue pendiente
+        status = "success" if counts["HDA"] or counts["LDA"] else "empty"
+        result.update(status=status, cache=cache_info, competitors=counts)
+    except Exception as e:
+        print(f"❌ Error pre-calentando '{item['brand']}': {e}")
+        result.update(status="error", message=str(e))
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000)
+    return result
+
+def iter_prewarm(plan: List[Dict[str, Any]], max_workers: int = DEFAULT_PREWARM_WORKERS,
+                 max_scans: int = PREWARM_MAX_SCANS, cse_reserve: int = PREWARM_CSE_RESERVE,
+                 incremental: bool = False, persist: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Re-escanea las marcas "due" del plan en orden de prioridad (hasta `max_scans`) y entrega cada
+    resultado al terminar. Antes de lanzar cada escaneo verifica que queden más de `cse_reserve`
+    consultas CSE en el día; si no, el resto se entrega con status "skipped".
+    """
+    due = [item for item in plan if item["due"]][:max(0, max_scans)]
+    queue = iter(due)
+    pending: Set["Future[Dict[str, Any]]"] = set()
+    skipped: List[Dict[str, Any]] = []
+
+    def submit_next(pool: ThreadPoolExecutor) -> None:
+        item = next(queue, None)
+        if item is None:
+            return
+        remaining = cse_budget_remaining()
+        if remaining is not None and remaining <= cse_reserve:
+            print(f"⏸️ Pre-calentamiento detenido: quedan {remaining} consultas CSE (reserva: {cse_reserve}).")
+            skipped.extend({"target": i["brand"], "key": i["key"], "hits": i["hits"], "status": "skipped",
+                            "reason": "cse_budget"} for i in (item, *queue))
+            return
+        pending.add(pool.submit(_prewarm_one, item, incremental, persist))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for _ in range(max(1, max_workers)):
+            submit_next(pool)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                yield future.result()
+                submit_next(pool)
+    yield from skipped
+
+def run_prewarm_cycle(top: Optional[int] = None, lead_seconds: Optional[float] = None,
+                      max_workers: Optional[int] = None, max_scans: Optional[int] = None,
+                      cse_reserve: Optional[int] = None, log_path: Optional[str] = None, use_db: bool = True,
+                      incremental: bool = False, persist: bool = True,
+                      dry_run: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Un ciclo completo: popularidad -> plan -> re-escaneos. Los argumentos en None toman su valor de
+    COMPAS_PREWARM_* (o de las constantes). Primero entrega {"event": "plan", ...} y luego un
+    {"event": "result", "data": ...} por marca re-escaneada (ninguno con `dry_run`).
+    """
+    top = top if top is not None else _env_int("COMPAS_PREWARM_TOP", PREWARM_TOP_BRANDS)
+    lead_seconds = lead_seconds if lead_seconds is not None else _env_int("COMPAS_PREWARM_LEAD", PREWARM_LEAD_SECONDS)
+    log_path = log_path if log_path is not None else os.environ.get("COMPAS_REQUEST_LOG", "")
+
+    with telemetry.start_trace("prewarm.plan", top=top) as trace:
+        plan = plan_prewarm(popular_brands(top, log_path=log_path, use_db=use_db), lead_seconds)
+        due = sum(1 for item in plan if item["due"])
+        trace.root.set(brands=len(plan), due=due)
+    print(f"🔥 Pre-calentamiento: {len(plan)} marcas populares, {due} por vencer o sin caché.")
+    yield {"event": "plan", "data": {"brands": len(plan), "due": due, "lead_seconds": lead_seconds, "items": plan}}
+    if dry_run:
+        return
+
+    for result in iter_prewarm(
+        plan,
+        max_workers=max_workers if max_workers is not None else _env_int("COMPAS_PREWARM_WORKERS", DEFAULT_PREWARM_WORKERS),
+        max_scans=max_scans if max_scans is not None else _env_int("COMPAS_PREWARM_MAX_SCANS", PREWARM_MAX_SCANS),
+        cse_reserve=cse_reserve if cse_reserve is not None else _env_int("COMPAS_PREWARM_CSE_RESERVE", PREWARM_CSE_RESERVE),
+        incremental=incremental, persist=persist,
+    ):
+        yield {"event": "result", "data": result}
+
+def resolve_interval(interval: Optional[float] = None) -> float:
+    return interval if interval is not None else _env_int("COMPAS_PREWARM_INTERVAL", PREWARM_INTERVAL_SECONDS)
+
+def loop_lead_seconds(lead_seconds: Optional[float], interval: float) -> float:
+    """
+    En modo loop el margen debe cubrir al menos dos intervalos (el ciclo siguiente y lo que tarde
+    el actual): si no, una entrada puede vencer entre ciclos.
+    """
+    lead = lead_seconds if lead_seconds is not None else _env_int("COMPAS_PREWARM_LEAD", PREWARM_LEAD_SECONDS)
+    if lead < 2 * interval:
+        print(f"ℹ️ Margen de pre-calentamiento ampliado de {lead:.0f}s a {2 * interval:.0f}s (2 intervalos).")
+        lead = 2 * interval
+    return lead
@@ -0,0 +1,224 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from . import telemetry
+from .cache import MemoryCache, SQLiteCache, TieredCache, TTLCache
+from .constants import (
+    CSE_CACHE_MAX_ENTRIES, CSE_CACHE_TTL_SECONDS, CSE_DAILY_BUDGET, CSE_DEFAULT_BUDGET_PATH,
+    CSE_DEFAULT_CACHE_PATH, CSE_MAX_WAIT_SECONDS, CSE_RATE_BURST, CSE_RATE_PER_SECOND
+)
+from .deadline import remaining
+from .singleflight import SingleFlight
+
+try:
+    import fcntl # Solo POSIX: serializa el contador entre procesos que comparten /tmp
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+SearchResult = Optional[List[Dict[str, Any]]]
+
+class QuotaExhausted(Exception):
+    """No queda presupuesto diario de Google CSE (y no hay resultado cacheado que servir)."""
+
+class TokenBucket:
+    """Limitador de tasa: `rate` tokens por segundo con ráfagas de hasta `burst`. Thread-safe."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = max(rate, 0.001)
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, max_wait: float) -> bool:
+        """Toma un token, esperando hasta `max_wait` segundos. False si no alcanzó el tiempo."""
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+class DailyBudget:
+    """
+    Contador de consultas del día persistido en un archivo JSON local ({"day", "used", "exhausted"}).
+    El día se cuenta en UTC; `exhaust()` lo cierra antes de tiempo (ej. Google respondió 429 de cuota).
+    """
+
+    def __init__(self, path: str, limit: int):
+        self.path = path
+        self.limit = limit
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        if state.get("day") != self._today():
+            state = {"day": self._today(), "used": 0, "exhausted": False}
+        return state
+
+    def _write(self, state: Dict[str, Any]) -> None:
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+    def _update(self, change: Callable[[Dict[str, Any]], bool]) -> bool:
+        with self._lock:
+            lock_file = None
+            try:
+                if fcntl is not None:
+                    lock_file = open(f"{self.path}.lock", "a")
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                state = self._read()
+                allowed = change(state)
+                self._write(state)
+                return allowed
+            except OSError as e:
+                # Sin disco escribible no bloqueamos el servicio: se delega en la cuota de Google
+                print(f"⚠️ Presupuesto de CSE no persistible ({e}).")
+                return True
+            finally:
+                if lock_file is not None:
+                    lock_file.close()
+
+    def try_consume(self) -> bool:
+        """Reserva una consulta del presupuesto de hoy. False si ya no queda."""
+        def consume(state: Dict[str, Any]) -> bool:
+            if state["exhausted"] or state["used"] >= self.limit:
+                return False
+            state["used"] += 1
+            return True
+        return self._update(consume)
+
+    def exhaust(self) -> None:
+        def close(state: Dict[str, Any]) -> bool:
+            state["exhausted"] = True
+            return True
+        self._update(close)
+
+    def remaining(self) -> int:
+        with self._lock:
+            state = self._read()
+        return 0 if state["exhausted"] else max(0, self.limit - state["used"])
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+class QuotaManager:
+    """
+    Capa de cuota delante de Google CSE: caché por (query, num) con TTL, coalescencia de consultas
+    idénticas en vuelo, token bucket y presupuesto diario. Si no hay cuota (o la API falla),
+    sirve el último resultado cacheado aunque esté vencido; si no hay ninguno, `QuotaExhausted`.
+    """
+
+    def __init__(self, cache: TTLCache, bucket: TokenBucket, budget: DailyBudget, max_wait: float):
+        self.cache = cache
+        self.bucket = bucket
+        self.budget = budget
+        self.max_wait = max_wait
+        self._in_flight = SingleFlight()
+
+    @staticmethod
+    def cache_key(query: str, num: int) -> str:
+        return f"{num}:{' '.join(query.strip().lower().split())}"
+
+    def search(self, query: str, num: int, fetch: Callable[[str, int], SearchResult]) -> SearchResult:
+        """
+        `fetch(query, num)` hace la llamada real: devuelve la lista de items o None si falló.
+        Un resultado vacío ([]) es válido y también se cachea.
+        """
+        key = self.cache_key(query, num)
+        with telemetry.span("cse.search", num=num) as span:
+            cached, info = self.cache.lookup(key)
+            if cached is not None:
+                span.set(cache="hit")
+                return cached
+
+            def fetch_and_store() -> SearchResult:
+                fresh = self.cache.get(key)
+                if fresh is not None:
+                    return fresh
+                # Primero la tasa: una consulta que no llega a salir no debe gastar presupuesto.
+                # Con presupuesto de tiempo, ni la espera ni la consulta pueden pasarse del deadline.
+                left = remaining()
+                if left is not None and left <= 0:
+                    return self._degrade(key, "sin tiempo (budget_ms)", span, quota_error=False)
+                if not self.bucket.acquire(self.max_wait if left is None else min(self.max_wait, left)):
+                    return self._degrade(key, "límite de tasa", span, quota_error=False)
+                if not self.budget.try_consume():
+                    return self._degrade(key, "presupuesto diario agotado", span)
+                items = fetch(query, num)
+                if items is None:
+                    return self._degrade(key, "error de la API", span, quota_error=False)
+                self.cache.set(key, items)
+                return items
+
+            result, shared = self._in_flight.do(key, fetch_and_store)
+            span.set(cache="shared" if shared else info["status"])
+            return result
+
+    def _degrade(self, key: str, reason: str, span: Any, quota_error: bool = True) -> SearchResult:
+        stale = self.cache.get(key, allow_stale=True)
+        span.set(degraded=reason)
+        if stale is not None:
+            print(f"♻️ CSE sin cuota/disponible ({reason}): usando resultado cacheado vencido.")
+            return stale
+        if quota_error:
+            raise QuotaExhausted(reason)
+        return None
+
+    def exhausted(self) -> bool:
+        return self.budget.remaining() <= 0
+
+_manager: Optional[QuotaManager] = None
+_manager_lock = threading.Lock()
+
+def get_quota_manager() -> QuotaManager:
+    """
+    Gestor compartido por el proceso. Overrides: COMPAS_CSE_DAILY_BUDGET, COMPAS_CSE_RATE,
+    COMPAS_CSE_BURST, COMPAS_CSE_CACHE_TTL, COMPAS_CSE_CACHE_PATH ('' = solo memoria), COMPAS_CSE_BUDGET_PATH.
+    """
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                backend: Any = MemoryCache(max_entries=CSE_CACHE_MAX_ENTRIES)
+                path = os.environ.get("COMPAS_CSE_CACHE_PATH", CSE_DEFAULT_CACHE_PATH)
+                if path:
+                    try:
+                        backend = TieredCache([backend, SQLiteCache(path, table="cse_cache", max_entries=CSE_CACHE_MAX_ENTRIES)])
+                    except Exception as e:
+                        print(f"⚠️ Caché de CSE en disco no disponible ({e}). Solo memoria.")
+                _manager = QuotaManager(
+                    TTLCache(backend, ttl_seconds=_env_float("COMPAS_CSE_CACHE_TTL", CSE_CACHE_TTL_SECONDS)),
+                    TokenBucket(_env_float("COMPAS_CSE_RATE", CSE_RATE_PER_SECOND), int(_env_float("COMPAS_CSE_BURST", CSE_RATE_BURST))),
+                    DailyBudget(os.environ.get("COMPAS_CSE_BUDGET_PATH", CSE_DEFAULT_BUDGET_PATH),
+                                int(_env_float("COMPAS_CSE_DAILY_BUDGET", CSE_DAILY_BUDGET))),
+                    max_wait=CSE_MAX_WAIT_SECONDS,
+                )
+    return _manager
@@ -0,0 +1,70 @@
+"""
+Registro local de peticiones de escaneo (COMPAS_REQUEST_LOG): una línea JSON por petición
+{"ts", "brand", "key", "cache"}. El pre-calentamiento lo lee para saber qué marcas son populares.
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from .domains import normalize_brand_key
+
+_lock = threading.Lock()
+
+def request_log_path() -> str:
+    return os.environ.get("COMPAS_REQUEST_LOG", "")
+
+def log_request(brand: str, cache_info: Dict[str, Any]) -> None:
+    """Agrega la petición al registro si COMPAS_REQUEST_LOG está configurado. Nunca falla la petición."""
+    path = request_log_path()
+    if not path:
+        return
+    line = json.dumps({"ts": round(time.time(), 3), "brand": brand, "key": cache_info.get("key") or normalize_brand_key(brand),
+                       "cache": cache_info.get("status")}, ensure_ascii=False)
+    try:
+        with _lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        print(f"⚠️ No se pudo escribir el registro de peticiones ({e}).")
+
+def read_request_counts(path: str, window_seconds: Optional[float] = None,
+                        now: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Peticiones por marca normalizada: {key: {"brand", "hits", "last_seen"}} (brand = la forma más
+    pedida, ej. 'Hulu' sobre 'hulu'). Acepta también líneas sin timestamp ({"brand": "Hulu"} o
+    "Hulu", como la entrada de batch_scan), que cuentan siempre; las que tienen "ts" fuera de la
+    ventana se ignoran. Las líneas inválidas se saltan.
+    """
+    since = (now if now is not None else time.time()) - window_seconds if window_seconds else None
+    counts: Dict[str, Dict[str, Any]] = {}
+    forms: Dict[str, Counter] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, str):
+                record = {"brand": record}
+            if not isinstance(record, dict) or not isinstance(record.get("brand"), str) or not record["brand"].strip():
+                continue
+            ts = record.get("ts")
+            if since is not None and isinstance(ts, (int, float)) and ts < since:
+                continue
+            brand = record["brand"].strip()
+            key = record.get("key") or normalize_brand_key(brand)
+            entry = counts.get(key)
+            if entry is None:
+                entry = counts[key] = {"brand": brand, "hits": 0, "last_seen": None}
+                forms[key] = Counter()
+            entry["hits"] += 1
+            forms[key][brand] += 1
+            if isinstance(ts, (int, float)):
+                entry["last_seen"] = max(entry["last_seen"] or 0.0, ts)
+    for key, entry in counts.items():
+        entry["brand"] = forms[key].most_common(1)[0][0]
+    return counts
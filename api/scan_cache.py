@@ -0,0 +1,109 @@
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from . import telemetry
+from .cache import CacheBackend, CacheEntry, MemoryCache, SQLiteCache, TieredCache, TTLCache
+from .compas_core import iter_compas_scan, report_to_events
+from .constants import DEFAULT_CACHE_BACKENDS, DEFAULT_CACHE_MAX_ENTRIES, DEFAULT_CACHE_PATH, DEFAULT_CACHE_TTL_SECONDS
+from .domains import normalize_brand_key
+
+class SupabaseScanCache(CacheBackend):
+    """
+    Backend de solo lectura sobre la tabla 'competitor_scans' (read-through, por la columna brand_key).
+    Las escrituras ya las hace `save_scan_results`, por eso `set` no hace nada.
+    """
+    name = "supabase"
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        # `key` es la clave normalizada: las filas se buscan por su brand_key, no por el input crudo
+        from .db import load_scan_results_by_key
+        return load_scan_results_by_key(key)
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None) -> None:
+        return None
+
+    def delete(self, key: str) -> None:
+        return None
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+def build_scan_cache() -> TTLCache:
+    """Construye la caché a partir de COMPAS_CACHE_BACKEND (ej. 'memory,sqlite,supabase')."""
+    max_entries = _env_int("COMPAS_CACHE_MAX_ENTRIES", DEFAULT_CACHE_MAX_ENTRIES)
+    ttl = _env_int("COMPAS_CACHE_TTL", DEFAULT_CACHE_TTL_SECONDS)
+
+    backends: List[CacheBackend] = []
+    for name in os.environ.get("COMPAS_CACHE_BACKEND", DEFAULT_CACHE_BACKENDS).split(","):
+        name = name.strip().lower()
+        if name == "memory":
+            backends.append(MemoryCache(max_entries=max_entries))
+        elif name == "sqlite":
+            path = os.environ.get("COMPAS_CACHE_PATH", DEFAULT_CACHE_PATH)
+            backends.append(SQLiteCache(path, table="scan_cache", max_entries=max_entries))
+        elif name == "supabase":
+            backends.append(SupabaseScanCache())
+        elif name:
+            print(f"⚠️ Backend de caché desconocido: '{name}' (ignorado)")
+
+    if not backends:
+        backends.append(MemoryCache(max_entries=max_entries))
+    backend = backends[0] if len(backends) == 1 else TieredCache(backends)
+    return TTLCache(backend, ttl_seconds=ttl)
+
+_scan_cache: Optional[TTLCache] = None
+
+def get_scan_cache() -> TTLCache:
+    """Singleton de la caché de escaneos (se crea en el primer uso)."""
+    global _scan_cache
+    if _scan_cache is None:
+        _scan_cache = build_scan_cache()
+    return _scan_cache
+
+def iter_cached_compas_scan(user_input: str, refresh: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    `iter_compas_scan` con caché delante. Primero emite un evento "cache" con
+    {"status": "hit" | "miss" | "refresh", "age_seconds", "backend", "key"}; en un hit
+    reproduce el reporte guardado como eventos, en otro caso escanea y guarda el resultado.
+    """
+    cache = get_scan_cache()
+    key = normalize_brand_key(user_input)
+
+    if refresh:
+        info: Dict[str, Any] = {"status": "refresh", "age_seconds": None, "backend": cache.backend.name}
+    else:
+        with telemetry.span("cache.scan_lookup") as span:
+            report, info = cache.lookup(key)
+            span.set(cache=info["status"], backend=info["backend"] or "")
+        if report is not None:
+            print(f"⚡ Cache {info['status']} ({info['backend']}) para '{key}' ({info['age_seconds']}s)")
+            yield {"event": "cache", "data": {**info, "key": key}}
+            yield from report_to_events(report)
+            return
+
+    yield {"event": "cache", "data": {**info, "key": key}}
+    for event in iter_compas_scan(user_input):
+        if event["event"] == "summary":
+            report = event["data"]
+            # No cachear reportes vacíos (ej. APIs caídas) ni parciales (cortados por el presupuesto
+            # de tiempo): el próximo intento debe reescanear
+            if (report.get("HDA_Competitors") or report.get("LDA_Competitors")) and not report.get("partial"):
+                cache.set(key, report)
+        yield event
+
+def cached_compas_scan(user_input: str, refresh: bool = False) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    `run_compas_scan` con caché delante. Devuelve (reporte, info_cache) donde
+    info_cache = {"status": "hit" | "miss" | "refresh", "age_seconds", "backend", "key"}.
+    """
+    report: Dict[str, Any] = {}
+    cache_info: Dict[str, Any] = {}
+    for event in iter_cached_compas_scan(user_input, refresh=refresh):
+        if event["event"] == "cache":
+            cache_info = event["data"]
+        elif event["event"] == "summary":
+            report = event["data"]
+    return report, cache_info
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Tuple, TypeVar
+
+T = TypeVar("T")
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Any = None
+
+class SingleFlight:
+    """
+    Coalescencia de llamadas concurrentes: mientras una ejecución para `key` está en curso,
+    las demás llamadas con la misma clave esperan y reciben su resultado (o su excepción).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], T]) -> Tuple[T, bool]:
+        """Ejecuta `fn` una sola vez por clave en vuelo. Devuelve (resultado, compartido)."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+class AsyncSingleFlight:
+    """
+    Equivalente asyncio de `SingleFlight` (un event loop): las corrutinas concurrentes con la misma
+    clave esperan UNA sola tarea compartida. Si quien la inició se cancela (ej. el cliente cortó),
+    la tarea sigue corriendo para los demás.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, "asyncio.Task[Any]"] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Ejecuta `await fn()` una sola vez por clave en vuelo. Devuelve (resultado, compartido)."""
+        task = self._tasks.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: str, task: "asyncio.Task[Any]") -> None:
+        self._tasks.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # marcar como leída aunque todos los que esperaban se hayan ido
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
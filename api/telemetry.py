@@ -0,0 +1,223 @@
+import contextlib
+import contextvars
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from .deadline import current_deadline
+
+T = TypeVar("T")
+
+class Span:
+    """Un tramo medido del pipeline (etapa, llamada HTTP, escritura en DB...)."""
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = dict(attributes)
+        self.status = "ok"
+        self.start_unix_ns = time.time_ns()
+        self._start_perf = time.perf_counter_ns()
+        self.duration_ns: Optional[int] = None
+
+    def set(self, **attributes: Any) -> "Span":
+        self.attributes.update(attributes)
+        return self
+
+    def add(self, key: str, amount: float) -> "Span":
+        """Acumula un contador (ej. bytes transferidos en varias llamadas)."""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+        return self
+
+    def end(self, status: Optional[str] = None) -> None:
+        if self.duration_ns is not None:
+            return
+        if status:
+            self.status = status
+        self.duration_ns = time.perf_counter_ns() - self._start_perf
+        self.trace._add(self)
+
+    @property
+    def duration_ms(self) -> float:
+        """Duración final, o el tiempo transcurrido si el span sigue abierto."""
+        duration = self.duration_ns if self.duration_ns is not None else time.perf_counter_ns() - self._start_perf
+        return round(duration / 1e6, 3)
+
+class _NoopSpan:
+    """Span vacío cuando no hay traza activa: la instrumentación no cuesta nada."""
+    span_id = None
+
+    def set(self, **attributes: Any) -> "_NoopSpan":
+        return self
+
+    def add(self, key: str, amount: float) -> "_NoopSpan":
+        return self
+
+    def end(self, status: Optional[str] = None) -> None:
+        return None
+
+NOOP_SPAN = _NoopSpan()
+
+class Trace:
+    """Colección de spans de un escaneo/petición. Thread-safe."""
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.trace_id = secrets.token_hex(16)
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+        self.root = Span(self, name, None, attributes)
+
+    def _add(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    @property
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return sorted(self._spans, key=lambda s: s.start_unix_ns)
+
+    def timings(self) -> Dict[str, Any]:
+        """Resumen compacto para `?debug=timings`."""
+        return {
+            "trace_id": self.trace_id,
+            "total_ms": self.root.duration_ms,
+            "spans": [
+                {"name": s.name, "duration_ms": s.duration_ms, "status": s.status, **s.attributes}
+                for s in self.spans if s is not self.root
+            ],
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Traza en formato OTLP/JSON (compatible con collectors de OpenTelemetry)."""
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", "compas-scan")]},
+                "scopeSpans": [{
+                    "scope": {"name": "api.telemetry"},
+                    "spans": [_otlp_span(self.trace_id, s) for s in self.spans],
+                }],
+            }]
+        }
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+def _otlp_span(trace_id: str, span: Span) -> Dict[str, Any]:
+    data: Dict[str, Any] = {
+        "traceId": trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,
+        "startTimeUnixNano": str(span.start_unix_ns),
+        "endTimeUnixNano": str(span.start_unix_ns + (span.duration_ns or 0)),
+        "attributes": [_otlp_attribute(k, v) for k, v in span.attributes.items()],
+        "status": {"code": 2 if span.status == "error" else 1},
+    }
+    if span.parent_id:
+        data["parentSpanId"] = span.parent_id
+    return data
+
+_current_trace: "contextvars.ContextVar[Optional[Trace]]" = contextvars.ContextVar("compas_trace", default=None)
+_current_span: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("compas_span", default=None)
+_export_lock = threading.Lock()
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+def export(trace: Trace) -> None:
+    """
+    Exporta la traza según la configuración:
+    COMPAS_TRACE_EXPORT=stdout (una línea OTLP/JSON) y/o COMPAS_TRACE_FILE=<ruta> (JSONL, append).
+    """
+    target = os.environ.get("COMPAS_TRACE_EXPORT", "").lower()
+    path = os.environ.get("COMPAS_TRACE_FILE")
+    if target != "stdout" and not path:
+        return
+    line = json.dumps(trace.to_otlp(), ensure_ascii=False)
+    with _export_lock:
+        if target == "stdout":
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+        if path:
+            try:
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                print(f"⚠️ No se pudo exportar la traza a {path}: {e}")
+
+@contextlib.contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Trace]:
+    """Abre una traza (raíz) para una petición o escaneo y la exporta al cerrar."""
+    trace = Trace(name, attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except BaseException:
+        trace.root.status = "error"
+        raise
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        trace.root.end()
+        export(trace)
+
+def start_span(name: str, parent: Optional[Any] = None, **attributes: Any) -> Any:
+    """
+    Abre un span manual (no pasa a ser el span actual); cerrarlo con `.end()`.
+    Útil en generadores, donde un `with` no puede abarcar los `yield`.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return NOOP_SPAN
+    parent_span = parent if parent is not None else _current_span.get()
+    return Span(trace, name, getattr(parent_span, "span_id", None), attributes)
+
+@contextlib.contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """Span como context manager: hijo del span actual y actual durante el bloque."""
+    current = start_span(name, **attributes)
+    if current is NOOP_SPAN:
+        yield current
+        return
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set(error=type(e).__name__)
+        current.end("error")
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+def propagate(fn: Callable[..., T], parent: Optional[Any] = None) -> Callable[..., T]:
+    """
+    Envuelve `fn` para que corra en otro hilo con la traza y el deadline actuales (los hilos no
+    heredan contextvars). `parent` fija el span padre de lo que `fn` registre.
+    """
+    context = contextvars.copy_context()
+    if context.get(_current_trace) is None and current_deadline() is None:
+        return fn
+
+    def run(*args: Any, **kwargs: Any) -> T:
+        def call() -> T:
+            if parent is not None and parent is not NOOP_SPAN:
+                _current_span.set(parent)
+            return fn(*args, **kwargs)
+        return context.copy().run(call)
+    return run
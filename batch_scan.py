@@ -0,0 +1,78 @@
+"""
+CLI de escaneo en batch.
+
+Lee marcas desde un archivo JSONL (una por línea: {"brand": "Hulu"} o "Hulu")
+y escribe un resultado NDJSON por marca a medida que terminan.
+
+    uv run python batch_scan.py brands.jsonl --workers 8 > results.ndjson
+    cat brands.jsonl | uv run python batch_scan.py - --no-save
+    uv run python batch_scan.py tracked.jsonl --incremental   # seguimiento diario: solo el delta
+"""
+import argparse
+import contextlib
+import json
+import sys
+from typing import Any, List
+
+from dotenv import load_dotenv
+
+# Carga las variables del archivo .env
+load_dotenv()
+
+from api.batch import BatchTally, iter_batch_scan, parse_brand_list
+from api.jsonstream import write_json
+
+def read_jsonl(path: str) -> List[Any]:
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        return [json.loads(line) for line in stream if line.strip()]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Escaneo de muchas marcas en una sola ejecución.")
+    parser.add_argument("input", help="Archivo JSONL con las marcas ('-' para stdin)")
+    parser.add_argument("-o", "--output", help="Archivo NDJSON de salida (por defecto stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Marcas escaneadas en paralelo (tope: COMPAS_BATCH_WORKERS)")
+    parser.add_argument("--refresh", action="store_true", help="Ignorar la caché de escaneos")
+    parser.add_argument("--no-save", action="store_true", help="No guardar los resultados en Supabase")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Re-escanear contra el último resultado de cada marca y guardar solo el delta")
+    parser.add_argument("--gemini-batch", type=int, default=None,
+                        help="Marcas por prompt de Gemini (1 = un prompt por marca; default COMPAS_GEMINI_BATCH_SIZE)")
+    args = parser.parse_args()
+
+    brands = parse_brand_list(read_jsonl(args.input))
+    if not brands:
+        print("❌ No se encontraron marcas en la entrada.", file=sys.stderr)
+        return 1
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    tally = BatchTally()
+    try:
+        # Los logs del pipeline van a stderr para no mezclarse con el NDJSON
+        with contextlib.redirect_stdout(sys.stderr):
+            for result in iter_batch_scan(brands, max_workers=args.workers, use_cache=not args.refresh,
+                                          incremental=args.incremental, persist=not args.no_save,
+                                          gemini_batch=args.gemini_batch):
+                tally.add(result)
+                write_json(result, out, end="\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"\n📦 Batch completado: {tally.results} marcas, {tally.errors} errores.", file=sys.stderr)
+
+    if tally.to_save and not args.no_save:
+        from api.db import persistence_configured, save_batch_results
+        if not persistence_configured():
+            print("⚠️ SUPABASE_URL no configurada (ni COMPAS_DB_BACKEND=sqlite): resultados no guardados.", file=sys.stderr)
+        else:
+            save_batch_results(tally.to_save)
+
+    return 1 if tally.errors == tally.results else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Throughput de la clasificación batch (`classify_competitors`) vs. `classify_competitor` uno a uno.
+
+Usa los candidatos sintéticos de bench_matcher, verifica que el resultado es IDÉNTICO y reporta
+candidatos por segundo de cada variante: Python puro y numpy (si está instalado).
+`--url-pool N` reparte los candidatos entre N dominios, como en las filas históricas de
+'competitor_scans' (los mismos competidores aparecen en muchos escaneos).
+
+    uv run python benchmarks/bench_classify.py --candidates 200000
+    uv run python benchmarks/bench_classify.py --candidates 200000 --url-pool 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.compas_core import classify_competitor, classify_competitors
+from api.keywords import load_numpy
+from bench_matcher import synthetic_candidates
+
+def best_of(fn: Callable[[], Any], repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--url-pool", type=int, default=0, help="Dominios distintos (0 = los generados)")
+    args = parser.parse_args()
+
+    candidates = synthetic_candidates(args.candidates)
+    if args.url_pool:
+        rng = random.Random(7)
+        pool = [c["clean_url"] for c in candidates[:args.url_pool]]
+        candidates = [{**c, "clean_url": rng.choice(pool)} for c in candidates]
+    context = {"name": "Hulu", "url": "https://www.hulu.com", "keywords": ["streaming", "watch", "movies"]}
+
+    variants: Dict[str, Callable[[], List[Dict[str, Any]]]] = {
+        "classify_competitor (1 a 1)": lambda: [classify_competitor(c, context) for c in candidates],
+        "classify_competitors (Python)": lambda: classify_competitors(candidates, context, vectorized=False),
+    }
+    if load_numpy() is not None:
+        variants["classify_competitors (numpy)"] = lambda: classify_competitors(candidates, context, vectorized=True)
+    else:
+        print("ℹ️ numpy no está instalado: solo se mide la variante en Python puro.")
+
+    # 1. Equivalencia exacta
+    expected = variants["classify_competitor (1 a 1)"]()
+    for name, fn in variants.items():
+        assert fn() == expected, name
+    print(f"✅ Resultados idénticos en {len(candidates)} candidatos ({len({c['clean_url'] for c in candidates})} URLs distintas).")
+
+    # 2. Throughput (mejor de N repeticiones)
+    baseline = None
+    print(f"\n{'variante':<32}{'tiempo (s)':>12}{'cand/s':>12}{'speedup':>10}")
+    for name, fn in variants.items():
+        elapsed = best_of(fn, args.repeat)
+        baseline = baseline or elapsed
+        print(f"{name:<32}{elapsed:>12.3f}{len(candidates) / elapsed:>12,.0f}{baseline / elapsed:>9.2f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
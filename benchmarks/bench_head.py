@@ -0,0 +1,167 @@
+"""
+Benchmark de la lectura de homepages en get_brand_context: descarga completa + BeautifulSoup
+(ruta anterior) vs. lectura en streaming hasta </head> + parser incremental del head.
+
+Mide, por página, los bytes leídos y el tiempo de parseo. Con `--http` además sirve las páginas
+desde un servidor local y mide la petición real (requests) de punta a punta.
+Páginas: el fixture grabado de hulu y una homepage sintética de varios MB (e-commerce).
+
+    uv run python benchmarks/bench_head.py --synthetic-mb 4 --http
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from api import http_client
+from api.constants import HTTP_HEAD_CHUNK_BYTES
+from api.html_head import head_text, parse_head
+from replay import load_recorded_fixtures
+
+DEFAULT_FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures", "hulu")
+
+def synthetic_page(size_mb: float) -> str:
+    """Homepage de e-commerce: head normal y un body enorme (grilla de productos + JSON embebido)."""
+    head = (
+        "<!DOCTYPE html><html lang=\"en\"><head><meta charset=\"utf-8\">"
+        "<title>MegaShop | Electronics, Fashion & Home Deals</title>"
+        "<meta name=\"description\" content=\"Shop electronics, fashion, home and garden with free shipping.\">"
+        "<meta property=\"og:title\" content=\"MegaShop\"><meta property=\"og:type\" content=\"website\">"
+        + "".join(f"<link rel=\"preload\" href=\"/static/chunk.{i:04x}.js\" as=\"script\">" for i in range(60))
+        + "</head><body>"
+    )
+    tile = ("<div class=\"product-tile\" data-sku=\"{i}\"><a href=\"/p/{i}\"><img src=\"/img/{i}.jpg\" alt=\"Product {i}\">"
+            "<span class=\"name\">Wireless headphones model {i}</span><span class=\"price\">$ {p}.99</span></a></div>")
+    parts: List[str] = [head]
+    size, i = len(head), 0
+    target = int(size_mb * 1024 * 1024)
+    while size < target:
+        chunk = tile.format(i=i, p=i % 500)
+        parts.append(chunk)
+        size += len(chunk)
+        i += 1
+    parts.append("</body></html>")
+    return "".join(parts)
+
+def legacy_parse(html: str) -> str:
+    """Ruta anterior: DOM completo con BeautifulSoup para leer título y meta description."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    return f"{soup.title.string if soup.title else ''} {soup.find('meta', attrs={'name': 'description'}) or ''}"
+
+def head_parse(html: str) -> str:
+    return head_text(parse_head(html))
+
+def chunks_of(body: bytes) -> Any:
+    return (body[i:i + HTTP_HEAD_CHUNK_BYTES] for i in range(0, len(body), HTTP_HEAD_CHUNK_BYTES))
+
+def timed(fn: Callable[[], Any], iterations: int) -> Tuple[float, Any]:
+    durations, result = [], None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = fn()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations), result
+
+def bench_parse(name: str, html: str, iterations: int, legacy_iterations: int) -> Dict[str, Any]:
+    body = html.encode("utf-8")
+    prefix, _ = http_client.read_head_prefix(chunks_of(body), http_client.head_max_bytes())
+    prefix_text = prefix.decode("utf-8", errors="replace")
+
+    legacy_ms, legacy_text = timed(lambda: legacy_parse(html), legacy_iterations)
+    head_ms, new_text = timed(lambda: head_parse(prefix_text), iterations)
+    return {
+        "page": name,
+        "legacy_bytes_read": len(body),
+        "head_bytes_read": len(prefix),
+        "legacy_parse_ms": round(legacy_ms, 3),
+        "head_parse_ms": round(head_ms, 3),
+        "parse_speedup": round(legacy_ms / head_ms, 1) if head_ms else None,
+        "legacy_text": legacy_text.strip()[:100],
+        "head_text": new_text[:100],
+    }
+
+class _PageServer:
+    """Servidor HTTP local que sirve las páginas por path, en chunks."""
+
+    def __init__(self, pages: Dict[str, bytes]):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = pages.get(self.path.lstrip("/"), b"")
+                self.send_response(200 if body else 404)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                for i in range(0, len(body), HTTP_HEAD_CHUNK_BYTES):
+                    try:
+                        self.wfile.write(body[i:i + HTTP_HEAD_CHUNK_BYTES])
+                    except (BrokenPipeError, ConnectionResetError):
+                        break  # el cliente cortó después de leer el head
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def close(self) -> None:
+        self.server.shutdown()
+
+def bench_http(pages: Dict[str, str], iterations: int, legacy_iterations: int) -> List[Dict[str, Any]]:
+    server = _PageServer({name: html.encode("utf-8") for name, html in pages.items()})
+    rows = []
+    try:
+        for name in pages:
+            url = server.base + name
+            legacy_ms, _ = timed(lambda: legacy_parse(http_client.get(url, retries=0).text), legacy_iterations)
+            head_ms, resp = timed(lambda: head_parse(http_client.fetch_head(url, retries=0).text), iterations)
+            rows.append({"page": name, "legacy_fetch_parse_ms": round(legacy_ms, 3),
+                         "head_fetch_parse_ms": round(head_ms, 3)})
+    finally:
+        server.close()
+    return rows
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--synthetic-mb", type=float, default=4.0, help="Tamaño de la homepage sintética")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--legacy-iterations", type=int, default=3, help="BeautifulSoup sobre varios MB tarda segundos")
+    parser.add_argument("--http", action="store_true", help="Medir también la descarga real contra un servidor local")
+    parser.add_argument("--json", help="Guardar resultados en este archivo")
+    args = parser.parse_args()
+
+    fixtures = load_recorded_fixtures(args.fixtures)
+    pages = {f"{host} (fixture)": html for host, html in fixtures["pages"].items()}
+    pages[f"synthetic-{args.synthetic_mb:g}MB"] = synthetic_page(args.synthetic_mb)
+
+    results: Dict[str, Any] = {"parse": [bench_parse(name, html, args.iterations, args.legacy_iterations) for name, html in pages.items()]}
+    print(f"{'página':<32}{'bytes antes':>14}{'bytes ahora':>14}{'parse antes ms':>16}{'parse ahora ms':>16}{'x':>10}")
+    for row in results["parse"]:
+        print(f"{row['page']:<32}{row['legacy_bytes_read']:>14,}{row['head_bytes_read']:>14,}"
+              f"{row['legacy_parse_ms']:>16.3f}{row['head_parse_ms']:>16.3f}{row['parse_speedup']:>10}")
+        print(f"   antes: {row['legacy_text']!r}\n   ahora: {row['head_text']!r}")
+
+    if args.http:
+        results["http"] = bench_http({name.split(" ")[0]: html for name, html in pages.items()},
+                                     args.iterations, args.legacy_iterations)
+        print(f"\n{'página (HTTP local)':<32}{'get+bs4 ms':>14}{'fetch_head+head ms':>20}")
+        for row in results["http"]:
+            print(f"{row['page']:<32}{row['legacy_fetch_parse_ms']:>14.3f}{row['head_fetch_parse_ms']:>20.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Índice de competidores entre marcas (`api/competitor_index.py`) sobre una tabla 'competitor_scans'
+sintética en SQLite: reconstrucción completa, sincronización incremental tras N escaneos nuevos
+(solo las filas posteriores a la marca de agua) y latencia de las consultas del pipeline.
+
+    uv run python benchmarks/bench_index.py --brands 20000
+    uv run python benchmarks/bench_index.py --brands 100000 --new 500 --lookups 5000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List
+
+_tmp = tempfile.mkdtemp(prefix="compas_bench_index_")
+os.environ.update({
+    "COMPAS_DB_BACKEND": "sqlite", "COMPAS_DB_PATH": os.path.join(_tmp, "scans.sqlite"),
+    "COMPAS_INDEX_PATH": os.path.join(_tmp, "index.sqlite"),
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import db
+from api.competitor_index import get_competitor_index, sync_competitor_index
+
+def synthetic_rows(brands: range, per_brand: int, domains: int, started: datetime, rng: random.Random) -> List[Dict[str, Any]]:
+    """`per_brand` competidores por marca, elegidos de `domains` dominios con sesgo (pocos muy listados)."""
+    rows = []
+    for b in brands:
+        created_at = (started + timedelta(microseconds=b)).isoformat(timespec="microseconds")
+        for d in {int(rng.paretovariate(1.2) * 7) % domains for _ in range(per_brand)}:
+            url = f"https://www.competitor{d}.com"
+            rows.append({"input_brand": f"Brand {b}", "competitor_url": url, "classification": "HDA" if d % 3 else "LDA",
+                         "justification": "Competidor sintético",
+                         "metadata": {"name": f"Competitor{d} - Official Site", "url": url, "justification": "x"},
+                         "created_at": created_at})
+    return rows
+
+def timed(fn: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def percentiles(samples: List[float]) -> str:
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return f"p50 {statistics.median(ordered) * 1000:.3f} ms, p95 {pick(0.95):.3f} ms, p99 {pick(0.99):.3f} ms"
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--brands", type=int, default=20000)
+    parser.add_argument("--per-brand", type=int, default=8)
+    parser.add_argument("--domains", type=int, default=5000)
+    parser.add_argument("--new", type=int, default=200, help="Escaneos nuevos antes de la sincronización incremental")
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    store = db.get_store()
+    started = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    # Directo al store: sin pasar por el índice (como lo escrito por otro proceso)
+    rows = synthetic_rows(range(args.brands), args.per_brand, args.domains, started, rng)
+    for start in range(0, len(rows), 5000):
+        store.upsert(rows[start:start + 5000])
+    print(f"🗄️ {len(rows)} filas de {args.brands} marcas en {args.domains} dominios posibles.")
+
+    index = get_competitor_index()
+    result: Dict[str, Any] = {}
+    elapsed = timed(lambda: result.update(sync_competitor_index(full=True)))
+    print(f"🧱 Reconstrucción completa: {elapsed:.2f} s ({result['rows_read'] / elapsed:,.0f} filas/s), "
+          f"{result['domains']} dominios, {result['bytes'] / 1024 / 1024:.1f} MiB")
+
+    later = started + timedelta(days=1)
+    new_rows = synthetic_rows(range(args.brands, args.brands + args.new), args.per_brand, args.domains, later, rng)
+    store.upsert(new_rows)
+    elapsed = timed(lambda: result.update(sync_competitor_index()))
+    print(f"🔁 Sincronización incremental ({args.new} escaneos nuevos): {elapsed * 1000:.0f} ms, "
+          f"{result['rows_read']} filas leídas")
+
+    names = [f"Brand {rng.randrange(args.brands)}" for _ in range(args.lookups)]
+    related, by_name = [], []
+    for name in names:
+        domain = f"competitor{int(rng.paretovariate(1.2) * 7) % args.domains}.com"
+        related.append(timed(lambda: index.related(name, [domain], 10)))
+        by_name.append(timed(lambda: index.find_by_name(domain.split(".")[0])))
+    print(f"🔎 related(): {percentiles(related)}")
+    print(f"🔎 find_by_name(): {percentiles(by_name)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Micro-benchmark: keywords por frecuencia simple (implementación anterior) vs. el motor con IDF.
+
+Genera un corpus sintético de textos de homepage (vocabulario genérico compartido + términos
+propios de cada sitio), verifica que con el corpus frío el motor da las MISMAS keywords que la
+implementación anterior y que `score_documents` (numpy y Python puro) coincide con `keywords`
+documento a documento. Reporta tiempos, cuántas keywords genéricas quedan en el top con y sin
+IDF, y el tamaño/tiempo de carga del archivo persistido.
+
+    uv run python benchmarks/bench_keywords.py --docs 20000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.constants import STOP_WORDS
+from api.keywords import KeywordEngine, load_numpy
+
+# --- Implementación anterior (referencia) ---
+
+def legacy_extract_keywords(text: str, top_n: int = 5) -> List[str]:
+    if not text: return []
+    words = re.findall(r'\w+', text.lower())
+    meaningful = [w for w in words if w not in STOP_WORDS and len(w) > 2 and not w.isdigit()]
+    return [w for w, c in Counter(meaningful).most_common(top_n)]
+
+# --- Datos sintéticos ---
+
+GENERIC = ["watch", "shows", "account", "sign", "free", "online", "official", "site", "best", "new",
+           "plans", "home", "help", "download", "app", "deals", "shop", "today", "more", "world"]
+
+def synthetic_texts(n: int, seed: int = 7) -> List[str]:
+    """Títulos + descripciones: mayoría de palabras genéricas, algunas propias del sitio."""
+    rng = random.Random(seed)
+    texts = []
+    for i in range(n):
+        own = [f"term{rng.randrange(n * 2)}" for _ in range(3)] + [f"brand{i}"]
+        words = rng.choices(GENERIC, k=rng.randint(12, 30)) + rng.choices(own, k=rng.randint(4, 8))
+        rng.shuffle(words)
+        texts.append(f"Brand{i} | " + " ".join(words) + f" {rng.randint(1, 2024)}")
+    return texts
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.docs)
+    np = load_numpy()
+
+    # 1. Corpus frío: mismas keywords que antes
+    cold = KeywordEngine()
+    for text in texts:
+        assert cold.keywords(text, args.top) == legacy_extract_keywords(text, args.top), text
+    print(f"✅ Corpus frío: keywords idénticas a la implementación anterior en {len(texts)} textos.")
+
+    # 2. Corpus con IDF: el lote coincide con el cálculo por documento
+    engine = KeywordEngine()
+    start = time.perf_counter()
+    engine.observe_many((f"site{i}.com", text) for i, text in enumerate(texts))
+    observe_s = time.perf_counter() - start
+    single = [engine.keywords(text, args.top) for text in texts]
+    assert engine.score_documents(texts, args.top, vectorized=False) == single
+    if np is not None:
+        assert engine.score_documents(texts, args.top, vectorized=True) == single
+    print(f"✅ score_documents == keywords en {len(texts)} textos ({'numpy y Python puro' if np else 'Python puro; numpy no instalado'}).")
+
+    # 3. Tiempos (mejor de N repeticiones)
+    cases = [
+        ("frecuencia simple (anterior)", lambda: [legacy_extract_keywords(t, args.top) for t in texts]),
+        ("keywords() 1 a 1", lambda: [engine.keywords(t, args.top) for t in texts]),
+        ("score_documents (Python puro)", lambda: engine.score_documents(texts, args.top, vectorized=False)),
+    ]
+    if np is not None:
+        cases.append(("score_documents (numpy)", lambda: engine.score_documents(texts, args.top, vectorized=True)))
+    base = None
+    print(f"\n{'caso':<32} {'total':>10} {'µs/doc':>9} {'vs. anterior':>13}")
+    for name, fn in cases:
+        seconds = timed(fn, args.repeat)
+        base = base or seconds
+        print(f"{name:<32} {seconds * 1000:>8.1f}ms {seconds / len(texts) * 1e6:>9.1f} {base / seconds:>12.2f}x")
+    print(f"{'observe_many (corpus completo)':<32} {observe_s * 1000:>8.1f}ms {observe_s / len(texts) * 1e6:>9.1f}")
+
+    # 4. Calidad: keywords genéricas que ocupan el top
+    generic = set(GENERIC)
+    def generic_share(lists: List[List[str]]) -> float:
+        total = sum(len(kws) for kws in lists)
+        return sum(1 for kws in lists for k in kws if k in generic) / total if total else 0.0
+    legacy_share = generic_share([legacy_extract_keywords(t, args.top) for t in texts])
+    print(f"\nKeywords genéricas en el top {args.top}: {legacy_share:.0%} sin IDF → {generic_share(single):.0%} con IDF")
+
+    # 5. Persistencia
+    path = os.path.join(tempfile.mkdtemp(), "idf.bin")
+    engine.path = path
+    engine.save()
+    start = time.perf_counter()
+    loaded = KeywordEngine(path)
+    load_s = time.perf_counter() - start
+    assert loaded.stats()["terms"] == engine.stats()["terms"] and loaded.docs == engine.docs
+    assert [loaded.keywords(t, args.top) for t in texts[:500]] == single[:500]
+    print(f"Archivo IDF: {os.path.getsize(path) / 1024:.0f} KiB, {loaded.stats()['terms']} términos, "
+          f"carga en {load_s * 1000:.1f}ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Micro-benchmark: matcher compilado (SIGNAL_MATCHER) vs. los escaneos lineales originales.
+
+Genera un set sintético de candidatos, verifica que `classify_competitor` y
+`extract_competitor_names` dan resultados IDÉNTICOS a la implementación anterior
+y reporta el tiempo de cada una.
+
+    uv run python benchmarks/bench_matcher.py --candidates 50000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from typing import Any, Dict, List
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.compas_core import SIGNAL_MATCHER, classify_competitor, extract_competitor_names, has_registrable_domain
+from api.constants import FAMOUS_DOMAINS, IGNORED_DOMAINS, IGNORED_SUBDOMAINS, IGNORED_TERMS, NEWS_TECH_DOMAINS
+
+# --- Implementación anterior (referencia) ---
+
+def legacy_extract_competitor_names(text: str, brand_name: str) -> List[str]:
+    found = set()
+    text_lower = text.lower()
+    for domain in FAMOUS_DOMAINS:
+        if domain in text_lower and domain not in brand_name.lower():
+            found.add(domain)
+    for kw in ["vs", "like", "similar to"]:
+        matches = re.findall(rf'{kw}\s+([A-Z][a-zA-Z]+)', text)
+        found.update([m.lower() for m in matches if len(m) > 3])
+    return list(found)
+
+def legacy_classify_competitor(candidate: Dict[str, Any], brand_context: Dict[str, Any]) -> Dict[str, Any]:
+    url = candidate['clean_url']
+    domain = urlparse(url).netloc.lower()
+    snippet = f"{candidate.get('title', '')} {candidate.get('snippet', '')}".lower()
+    if any(ig in domain for ig in IGNORED_DOMAINS): return {"valid": False, "reason": "Dominio ignorado"}
+    if any(s in url for s in IGNORED_SUBDOMAINS): return {"valid": False, "reason": "Subdominio app/store"}
+    if any(t in url for t in IGNORED_TERMS): return {"valid": False, "reason": "Sitio de soporte"}
+    domain_base = domain.replace("www.", "").split('.')[0]
+    if domain_base in NEWS_TECH_DOMAINS: return {"valid": False, "reason": "Sitio de noticias"}
+    signals = []
+    is_hda = False
+    if candidate.get('source') == 'direct_search':
+        is_hda = True
+        signals.append("Descubierto por búsqueda directa")
+    if any(f in domain for f in FAMOUS_DOMAINS):
+        is_hda = True
+        signals.append("Gigante Digital")
+    industry_terms = ["streaming", "video", "subscription", "movies", "tv", "watch"]
+    has_industry = any(t in snippet for t in industry_terms)
+    is_clean_domain = has_registrable_domain(url)
+    if is_clean_domain and has_industry:
+        signals.append("Dominio oficial con términos de industria")
+        kws_match = [k for k in brand_context["keywords"] if k in snippet]
+        if len(kws_match) >= 2:
+            is_hda = True
+            signals.append(f"Alta relevancia semántica ({len(kws_match)} kws)")
+    if is_hda:
+        return {"valid": True, "type": "HDA", "justification": f"Competidor Directo. {', '.join(signals)}"}
+    elif signals:
+        return {"valid": True, "type": "LDA", "justification": f"Competidor de Nicho. {', '.join(signals)}"}
+    return {"valid": False, "reason": "Sin señales suficientes de competencia"}
+
+# --- Datos sintéticos ---
+
+WORDS = sorted(FAMOUS_DOMAINS | IGNORED_DOMAINS | NEWS_TECH_DOMAINS) + [
+    "acme", "stream", "shop", "cloud", "hub", "labs", "tv", "play", "market", "studio"
+]
+PREFIXES = ["www.", "", "", "support.", "apps.", "help.", "us.", "play."]
+SUFFIXES = [".com", ".io", ".tv", ".co.uk", ".net", ".com.br"]
+SNIPPET_WORDS = ["streaming", "video", "watch", "movies", "best", "alternatives", "subscription",
+                 "pricing", "plans", "music", "shoes", "deals", "top", "sports"]
+
+def synthetic_candidates(n: int, seed: int = 42) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    candidates = []
+    for _ in range(n):
+        host = rng.choice(PREFIXES) + "".join(rng.choice(WORDS) for _ in range(rng.randint(1, 2))) + rng.choice(SUFFIXES)
+        names = [rng.choice(WORDS).capitalize() for _ in range(3)]
+        snippet = " ".join(rng.choice(SNIPPET_WORDS) for _ in range(rng.randint(5, 20)))
+        candidates.append({
+            "clean_url": f"https://{host}",
+            "title": f"{names[0]} vs {names[1]}: apps like {names[2]}",
+            "snippet": snippet,
+            "source": rng.choice(["search", "search", "direct_search"]),
+        })
+    return candidates
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    candidates = synthetic_candidates(args.candidates)
+    context = {"name": "Hulu", "url": "https://www.hulu.com", "keywords": ["streaming", "watch", "movies"]}
+    texts = [f"{c['title']} {c['snippet']}" for c in candidates]
+
+    # 1. Equivalencia exacta
+    for cand, text in zip(candidates, texts):
+        assert classify_competitor(cand, context) == legacy_classify_competitor(cand, context), cand
+        assert set(extract_competitor_names(text, "Hulu")) == set(legacy_extract_competitor_names(text, "Hulu")), text
+    print(f"✅ Resultados idénticos en {len(candidates)} candidatos.")
+
+    # 2. Tiempos (mejor de N repeticiones)
+    urls = [c["clean_url"] for c in candidates]
+    legacy_lists = [IGNORED_DOMAINS, IGNORED_SUBDOMAINS, IGNORED_TERMS, FAMOUS_DOMAINS]
+    cases = [
+        ("pertenencia a listas", lambda: [[any(t in u for t in lst) for lst in legacy_lists] for u in urls],
+         lambda: [SIGNAL_MATCHER.lists_in(u) for u in urls]),
+        ("classify_competitor", lambda: [legacy_classify_competitor(c, context) for c in candidates],
+         lambda: [classify_competitor(c, context) for c in candidates]),
+        ("extract_competitor_names", lambda: [legacy_extract_competitor_names(t, "Hulu") for t in texts],
+         lambda: [extract_competitor_names(t, "Hulu") for t in texts]),
+    ]
+    print(f"\n{'función':<26}{'anterior (s)':>14}{'compilado (s)':>15}{'speedup':>10}")
+    for name, legacy_fn, new_fn in cases:
+        legacy_t = min(timed(legacy_fn) for _ in range(args.repeat))
+        new_t = min(timed(new_fn) for _ in range(args.repeat))
+        print(f"{name:<26}{legacy_t:>14.3f}{new_t:>15.3f}{legacy_t / new_t:>9.2f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
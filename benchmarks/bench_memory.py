@@ -0,0 +1,155 @@
+"""
+Benchmark de memoria de un batch grande (`batch_scan.py`) contra stand-ins sintéticos.
+
+Corre `batch_scan.main()` en un proceso nuevo sobre N marcas (default 10.000), con Google CSE y
+las homepages respondidas por un transporte sintético (ítems de CSE completos: pagemap,
+htmlSnippet, etc.), Gemini desactivado (todo el batch va por el fallback CSE), NDJSON a un archivo
+y persistencia en SQLite. Reporta el pico de RSS (ru_maxrss), el RSS tras los imports, el RSS al
+terminar, el tiempo y el tamaño de la salida; con `--ref` mide también otra revisión de git.
+
+    uv run python benchmarks/bench_memory.py --ref HEAD~1
+    uv run python benchmarks/bench_memory.py --brands 2000 --workers 8 --json memory.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_startup import export_ref
+
+# Se ejecuta en un proceso nuevo, con cwd = el árbol a medir
+CHILD_SCRIPT = r"""
+import hashlib, json, os, resource, sys, time
+sys.path.insert(0, os.getcwd())
+from api import http_client
+from api.http_client import HttpResponse, read_head_prefix
+
+def rss_kib():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+def cse_item(host, rival, k):
+    title = f"{host.split('.')[1].title()} vs {rival.title()}: streaming plans compared"
+    snippet = f"Watch movies and shows on {host}. Compare {rival} pricing, live TV and originals ({k})."
+    image = f"https://{host}/static/og-image-{k}.jpg"
+    return {
+        "kind": "customsearch#result", "title": title, "htmlTitle": title.replace("vs", "<b>vs</b>"),
+        "link": f"https://{host}/plans/{k}", "displayLink": host, "snippet": snippet,
+        "htmlSnippet": snippet.replace("streaming", "<b>streaming</b>"), "cacheId": hashlib.md5(host.encode()).hexdigest()[:12],
+        "formattedUrl": f"https://{host}/plans/{k}", "htmlFormattedUrl": f"https://{host}/<b>plans</b>/{k}",
+        "pagemap": {
+            "cse_thumbnail": [{"src": f"https://encrypted-tbn0.gstatic.com/images?q=tbn:{k}{host}", "width": "300", "height": "168"}],
+            "metatags": [{"og:image": image, "og:type": "website", "og:site_name": host, "og:title": title,
+                          "og:description": snippet, "og:url": f"https://{host}/", "twitter:card": "summary_large_image",
+                          "twitter:title": title, "twitter:description": snippet, "twitter:image": image,
+                          "viewport": "width=device-width, initial-scale=1", "theme-color": "#1ce783",
+                          "apple-itunes-app": f"app-id={k}{len(host)}", "fb:app_id": str(10**9 + k)}],
+            "cse_image": [{"src": image}],
+        },
+    }
+
+# Respuestas de CSE pre-codificadas (el costo de armar el JSON no cuenta); cada query elige una por hash
+HOSTS = [f"www.rival{i}.com" for i in range(3000)] + ["www.netflix.com", "www.cnet.com", "www.reddit.com", "www.g2.com"]
+RESPONSES = []
+for r in range(512):
+    items = [cse_item(HOSTS[(r * 37 + j * 101) % len(HOSTS)], f"Rival{(r + j) % 3000}", r * 10 + j) for j in range(10)]
+    RESPONSES.append(json.dumps({"kind": "customsearch#search", "items": items}).encode("utf-8"))
+
+def page(host):
+    name = host.split(".")[1].title()
+    return (f"<html><head><title>{name} | Stream Live TV, Movies and Shows</title>"
+            f"<meta name='description' content='{name} streaming service: watch originals, live sports and movies.'>"
+            f"<meta name='keywords' content='{name.lower()}, streaming, movies, tv'></head><body></body></html>").encode("utf-8")
+
+class SyntheticTransport:
+    name = "synthetic"
+    retryable_errors = (ConnectionError,)
+    timeout_errors = (TimeoutError,)
+
+    def get(self, url, params, headers, timeout):
+        if "customsearch" in url:
+            pick = int(hashlib.md5((params or {}).get("q", "").encode("utf-8")).hexdigest(), 16) % len(RESPONSES)
+            return HttpResponse(200, {"Content-Type": "application/json"}, RESPONSES[pick], url, "utf-8")
+        return HttpResponse(200, {"Content-Type": "text/html"}, page(url.split("/")[2]), url, "utf-8")
+
+    def get_head(self, url, headers, timeout, max_bytes):
+        content, truncated = read_head_prefix([page(url.split("/")[2])], max_bytes)
+        return HttpResponse(200, {"Content-Type": "text/html"}, content, url, "utf-8", truncated)
+
+http_client.set_transport(SyntheticTransport())
+import batch_scan
+after_imports = rss_kib()
+sys.argv = ["batch_scan.py", INPUT, "-o", OUTPUT, "--workers", str(WORKERS)]
+start = time.perf_counter()
+code = batch_scan.main()
+elapsed = time.perf_counter() - start
+print(json.dumps({"exit_code": code, "seconds": round(elapsed, 1), "rss_after_imports_kib": after_imports,
+                  "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "rss_end_kib": rss_kib(),
+                  "output_bytes": os.path.getsize(OUTPUT)}))
+"""
+
+def child_env(tmp: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "GOOGLE_API_KEY": "synthetic", "GOOGLE_CSE_ID": "synthetic", "GEMINI_API_KEY": "",
+        "SUPABASE_URL": "", "COMPAS_DB_BACKEND": "sqlite", "COMPAS_DB_PATH": os.path.join(tmp, "scans.sqlite"),
+        "COMPAS_CACHE_BACKEND": "memory", "GEMINI_CACHE_PATH": "", "COMPAS_STATE_PATH": "",
+        "COMPAS_INDEX_PATH": "", "COMPAS_IDF_PATH": "", "COMPAS_REQUEST_LOG": "",
+        "COMPAS_CSE_CACHE_PATH": "", "COMPAS_CSE_DAILY_BUDGET": "1000000000", "COMPAS_CSE_RATE": "1000000",
+        "COMPAS_CSE_BURST": "1000000", "COMPAS_CSE_BUDGET_PATH": os.path.join(tmp, "cse_budget.json"),
+    })
+    return env
+
+def measure(tree: str, brands: int, workers: int) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "brands.jsonl")
+        with open(input_path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps({"brand": f"Brand{i:05d}"}) + "\n" for i in range(brands))
+        script = (f"INPUT = {input_path!r}\nOUTPUT = {os.path.join(tmp, 'out.ndjson')!r}\n"
+                  f"WORKERS = {workers}\nBRANDS = {brands}\n" + CHILD_SCRIPT)
+        log_path = os.path.join(tmp, "stderr.log")
+        with open(log_path, "w", encoding="utf-8") as log:
+            # Los logs del pipeline (uno o más por marca) van a un archivo, no a la memoria del padre
+            # --workers está acotado por COMPAS_BATCH_WORKERS
+            env = {**child_env(tmp), "COMPAS_BATCH_WORKERS": str(workers)}
+            proc = subprocess.run([sys.executable, "-c", script], cwd=tree, env=env,
+                                  stdout=subprocess.PIPE, stderr=log, text=True)
+        if proc.returncode not in (0, 1) or not proc.stdout.strip():
+            with open(log_path, encoding="utf-8", errors="replace") as log:
+                raise RuntimeError(log.read()[-2000:])
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--brands", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--ref", help="Revisión de git a comparar (ej. HEAD~1)")
+    parser.add_argument("--json", help="Guardar resultados en este archivo")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {}
+    if args.ref:
+        with tempfile.TemporaryDirectory() as tmp:
+            export_ref(args.ref, tmp)
+            results[args.ref] = measure(tmp, args.brands, args.workers)
+    results["working-tree"] = measure(ROOT, args.brands, args.workers)
+
+    print(f"{args.brands} marcas, {args.workers} workers")
+    print(f"{'árbol':<16} {'pico RSS MiB':>13} {'tras imports':>13} {'al terminar':>12} {'segundos':>9} {'NDJSON MiB':>11}")
+    for name, stats in results.items():
+        print(f"{name:<16} {stats['peak_rss_kib'] / 1024:>13.1f} {stats['rss_after_imports_kib'] / 1024:>13.1f} "
+              f"{stats['rss_end_kib'] / 1024:>12.1f} {stats['seconds']:>9.1f} {stats['output_bytes'] / 2**20:>11.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+Benchmark del pipeline completo con fixtures grabados (sin red, sin credenciales, sin cuota).
+
+Reproduce respuestas de Google CSE, texto de Gemini y HTML de homepages a través de los
+stand-ins de `benchmarks/replay.py` y mide cada etapa: get_brand_context, fan-out de búsquedas,
+classify_competitor, verificación de candidatos de Gemini, save_scan_results y el escaneo
+end-to-end (ruta Gemini, ruta fallback y re-escaneo incremental).
+
+    uv run python benchmarks/bench_pipeline.py                       # tabla de tiempos
+    uv run python benchmarks/bench_pipeline.py --save-baseline base.json
+    uv run python benchmarks/bench_pipeline.py --baseline base.json --threshold 1.3   # regresión
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Credenciales ficticias: todo se resuelve contra los stand-ins locales
+for _name, _value in {
+    "GOOGLE_API_KEY": "fixture", "GOOGLE_CSE_ID": "fixture", "GEMINI_API_KEY": "fixture",
+    "SUPABASE_URL": "http://127.0.0.1:54321", "SUPABASE_KEY": "fixture", "GEMINI_CACHE_PATH": "",
+    "COMPAS_STATE_PATH": "", "COMPAS_CACHE_BACKEND": "memory", "COMPAS_INDEX_PATH": "", "COMPAS_IDF_PATH": "",
+    # Capa de cuota de CSE sin límites reales ni disco compartido (cada iteración paga las consultas)
+    "COMPAS_CSE_CACHE_PATH": "", "COMPAS_CSE_DAILY_BUDGET": "1000000000", "COMPAS_CSE_RATE": "1000000",
+    "COMPAS_CSE_BURST": "1000000", "COMPAS_CSE_BUDGET_PATH": os.path.join(tempfile.gettempdir(), "compas_bench_cse_budget.json"),
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from api import compas_core, db, enrichment, gemini_service, http_client, incremental, quota
+from replay import ReplayGeminiModel, ReplaySupabaseClient, ReplayTransport, load_recorded_fixtures
+
+DEFAULT_FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures", "hulu")
+
+class Pipeline:
+    """Instala los stand-ins y expone cada etapa del pipeline como una función sin argumentos."""
+
+    def __init__(self, fixtures: Dict[str, Any], latency_ms: float, workers: int):
+        self.fixtures = fixtures
+        self.brand = fixtures["brand"]
+        self.workers = workers
+        self.transport = ReplayTransport(fixtures["cse"], fixtures["pages"], latency_ms=latency_ms,
+                                         redirects=fixtures["redirects"])
+        self.gemini_ok = ReplayGeminiModel(fixtures["gemini_text"], latency_ms=latency_ms)
+        self.gemini_broken = ReplayGeminiModel("Lo siento, no puedo ayudar con eso.", latency_ms=latency_ms)
+        self.supabase = ReplaySupabaseClient()
+
+        http_client.set_transport(self.transport)
+        gemini_service.api_key = "fixture"
+        db.get_supabase_client = lambda: self.supabase
+
+        # Entradas pre-calculadas para medir las etapas aisladas
+        with quiet():
+            self.context = compas_core.get_brand_context(self.brand)
+            self.candidates = self._collect_candidates(self.fanout())
+            self.report = self.scan_fallback()
+            self._use_gemini(self.gemini_ok)
+            self.gemini_candidates = gemini_service._ask_gemini(self.brand)
+
+    def _use_gemini(self, model: ReplayGeminiModel):
+        gemini_service._model = model
+        gemini_service._answer_cache = None  # cada iteración paga la llamada (sin caché)
+        enrichment._probe_cache = None  # y las sondas a los sitios de los candidatos
+        quota._manager = None  # y las consultas a CSE
+
+    def _collect_candidates(self, results: List[Any]) -> List[Dict[str, Any]]:
+        candidates, seen = [], set()
+        for items in results:
+            for item in items or []:
+                link = compas_core.clean_url(item.get("link"))
+                if link not in seen:
+                    seen.add(link)
+                    candidates.append({**item, "clean_url": link, "source": "search"})
+        return candidates
+
+    def context_stage(self) -> Any:
+        quota._manager = None
+        return compas_core.get_brand_context(self.brand)
+
+    def fanout(self) -> List[Any]:
+        quota._manager = None
+        queries = compas_core.build_fallback_queries(self.context)
+        search = lambda q: compas_core.search_google_api(q, num=10)
+        return list(compas_core.map_concurrently(search, queries, self.workers))
+
+    def classify(self) -> List[Dict[str, Any]]:
+        return [compas_core.classify_competitor(c, self.context) for c in self.candidates]
+
+    def enrich(self) -> List[Dict[str, Any]]:
+        enrichment._probe_cache = None
+        checks = list(compas_core.map_concurrently(
+            compas_core.verify_candidate, self.gemini_candidates, enrichment.resolve_enrich_workers()
+        ))
+        compas_core.score_verified(self.gemini_candidates, checks, self.context)
+        return checks
+
+    def save(self) -> bool:
+        return db.save_scan_results(self.brand, self.report)
+
+    def scan_gemini(self) -> Dict[str, Any]:
+        self._use_gemini(self.gemini_ok)
+        return compas_core.run_compas_scan(self.brand, max_concurrency=self.workers)
+
+    def scan_fallback(self) -> Dict[str, Any]:
+        self._use_gemini(self.gemini_broken)
+        return compas_core.run_compas_scan(self.brand, max_concurrency=self.workers)
+
+    def scan_incremental(self) -> Dict[str, Any]:
+        # Re-escaneo diario (ruta fallback): el estado y el reporte guardado quedan de la iteración anterior
+        self._use_gemini(self.gemini_broken)
+        report, _ = incremental.incremental_compas_scan(self.brand, max_concurrency=self.workers)
+        return report
+
+    def stages(self) -> Dict[str, Callable[[], Any]]:
+        return {
+            "get_brand_context": self.context_stage,
+            "search_fanout": self.fanout,
+            "classify_competitor": self.classify,
+            "enrich_candidates": self.enrich,
+            "save_scan_results": self.save,
+            "scan_end_to_end_gemini": self.scan_gemini,
+            "scan_end_to_end_fallback": self.scan_fallback,
+            "scan_incremental_fallback": self.scan_incremental,
+        }
+
+@contextlib.contextmanager
+def quiet():
+    """Silencia los prints del pipeline durante las mediciones."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def measure(fn: Callable[[], Any], iterations: int, warmup: int = 2) -> Dict[str, float]:
+    """Tiempos (ms) sin tracemalloc + una pasada aparte con tracemalloc para memoria."""
+    with quiet():
+        for _ in range(warmup):
+            fn()
+        durations = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            fn()
+            durations.append((time.perf_counter() - start) * 1000)
+
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        fn()
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    durations.sort()
+    return {
+        "median_ms": round(statistics.median(durations), 3),
+        "p95_ms": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))], 3),
+        "min_ms": round(durations[0], 3),
+        "peak_alloc_kib": round((peak - before) / 1024, 1),
+        "retained_kib": round((after - before) / 1024, 1),
+    }
+
+def check_regressions(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                      threshold: float, min_delta_ms: float) -> List[str]:
+    """Etapas cuya mediana supera `baseline * threshold` (y al menos `min_delta_ms` de diferencia)."""
+    failures = []
+    for stage, stats in results.items():
+        base = baseline.get(stage)
+        if not base:
+            continue
+        limit = base["median_ms"] * threshold
+        if stats["median_ms"] > limit and stats["median_ms"] - base["median_ms"] >= min_delta_ms:
+            failures.append(f"{stage}: {stats['median_ms']:.3f} ms > {limit:.3f} ms (baseline {base['median_ms']:.3f} ms x {threshold})")
+    return failures
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES, help="Directorio del escenario grabado")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latencia simulada por llamada externa")
+    parser.add_argument("--workers", type=int, default=compas_core.resolve_concurrency())
+    parser.add_argument("--stage", action="append", help="Medir solo estas etapas (repetible)")
+    parser.add_argument("--json", help="Guardar resultados en este archivo")
+    parser.add_argument("--save-baseline", help="Guardar resultados como baseline de regresión")
+    parser.add_argument("--baseline", help="Comparar contra este baseline y fallar si hay regresión")
+    parser.add_argument("--threshold", type=float, default=1.3, help="Factor máximo tolerado vs baseline")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="Diferencia mínima para contar como regresión")
+    args = parser.parse_args()
+
+    pipeline = Pipeline(load_recorded_fixtures(args.fixtures), args.latency_ms, args.workers)
+    stages = pipeline.stages()
+    selected = args.stage or list(stages)
+
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'etapa':<28}{'mediana ms':>12}{'p95 ms':>10}{'min ms':>10}{'pico KiB':>11}{'retenido KiB':>14}")
+    for name in selected:
+        stats = measure(stages[name], args.iterations)
+        results[name] = stats
+        print(f"{name:<28}{stats['median_ms']:>12.3f}{stats['p95_ms']:>10.3f}{stats['min_ms']:>10.3f}"
+              f"{stats['peak_alloc_kib']:>11.1f}{stats['retained_kib']:>14.1f}")
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+            print(f"📄 Resultados guardados en {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        failures = check_regressions(results, baseline, args.threshold, args.min_delta_ms)
+        if failures:
+            print("\n❌ Regresión de rendimiento:")
+            for failure in failures:
+                print(f"   {failure}")
+            return 1
+        print(f"\n✅ Sin regresiones (umbral x{args.threshold}).")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
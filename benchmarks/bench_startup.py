@@ -0,0 +1,122 @@
+"""
+Benchmark de arranque en frío del handler (`api/index.py`).
+
+Para el árbol actual (y opcionalmente para una revisión de git, ej. `--ref HEAD~1`) mide:
+- el costo de `import api.index` según `python -X importtime` (acumulado, en ms);
+- el tiempo de proceso hasta responder un preflight OPTIONS y un GET inválido (400);
+- qué SDKs pesados quedaron cargados tras esas respuestas (Gemini, Supabase, BeautifulSoup...).
+
+    uv run python benchmarks/bench_startup.py --ref HEAD~1 --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+from typing import Any, Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["google.generativeai", "grpc", "google.protobuf", "supabase", "bs4", "requests", "httpx"]
+
+# Entorno mínimo: las revisiones antiguas de api/db.py fallan al importar sin estas variables
+CHILD_ENV = {"SUPABASE_URL": "http://127.0.0.1:54321", "SUPABASE_KEY": "startup-bench", "GEMINI_API_KEY": "startup-bench"}
+
+# Se ejecuta en un proceso nuevo: importa el handler, atiende OPTIONS y un GET sin 'brand'
+CHILD_SCRIPT = r"""
+import http.client, json, sys, threading, time
+start = time.perf_counter()
+from http.server import ThreadingHTTPServer
+from api.index import handler
+imported = time.perf_counter()
+server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+server.RequestHandlerClass.log_message = lambda *args: None
+threading.Thread(target=server.serve_forever, daemon=True).start()
+statuses = []
+for method, path in (("OPTIONS", "/api"), ("GET", "/api")):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+    conn.request(method, path)
+    statuses.append(conn.getresponse().status)
+    conn.close()
+answered = time.perf_counter()
+server.shutdown()
+heavy = [m for m in HEAVY if m in sys.modules]
+print(json.dumps({"import_ms": (imported - start) * 1000, "first_responses_ms": (answered - start) * 1000,
+                  "statuses": statuses, "heavy_modules_loaded": heavy}))
+"""
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    for name, value in CHILD_ENV.items():
+        env.setdefault(name, value)
+    return env
+
+def importtime_ms(tree: str) -> float:
+    """Tiempo acumulado de `import api.index` reportado por -X importtime."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import api.index"],
+                          cwd=tree, env=_env(), capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    for line in proc.stderr.splitlines():
+        parts = [p.strip() for p in line.replace("import time:", "").split("|")]
+        if len(parts) == 3 and parts[2] == "api.index":
+            return int(parts[1]) / 1000
+    raise RuntimeError("api.index no aparece en la salida de -X importtime")
+
+def handler_run(tree: str) -> Dict[str, Any]:
+    script = f"HEAVY = {HEAVY_MODULES!r}\n" + CHILD_SCRIPT
+    proc = subprocess.run([sys.executable, "-c", script], cwd=tree, env=_env(), capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def measure(tree: str, runs: int) -> Dict[str, Any]:
+    imports = [importtime_ms(tree) for _ in range(runs)]
+    handler_runs = [handler_run(tree) for _ in range(runs)]
+    return {
+        "importtime_api_index_ms": round(statistics.median(imports), 1),
+        "import_wall_ms": round(statistics.median(r["import_ms"] for r in handler_runs), 1),
+        "first_responses_ms": round(statistics.median(r["first_responses_ms"] for r in handler_runs), 1),
+        "statuses": handler_runs[-1]["statuses"],
+        "heavy_modules_loaded": handler_runs[-1]["heavy_modules_loaded"],
+    }
+
+def export_ref(ref: str, target: str) -> None:
+    """Extrae `ref` de git a un directorio temporal (sin tocar el working tree)."""
+    archive = os.path.join(target, "ref.tar")
+    subprocess.run(["git", "archive", "--format=tar", "-o", archive, ref], cwd=ROOT, check=True)
+    with tarfile.open(archive) as tar:
+        tar.extractall(target)
+    os.remove(archive)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ref", help="Revisión de git a comparar (ej. HEAD~1)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", help="Guardar resultados en este archivo")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {}
+    if args.ref:
+        with tempfile.TemporaryDirectory() as tmp:
+            export_ref(args.ref, tmp)
+            results[args.ref] = measure(tmp, args.runs)
+    results["working-tree"] = measure(ROOT, args.runs)
+
+    for name, stats in results.items():
+        print(f"\n[{name}]")
+        print(f"   import api.index (-X importtime): {stats['importtime_api_index_ms']:>8.1f} ms")
+        print(f"   import api.index (wall):          {stats['import_wall_ms']:>8.1f} ms")
+        print(f"   OPTIONS + GET 400 respondidos:    {stats['first_responses_ms']:>8.1f} ms  {stats['statuses']}")
+        print(f"   SDKs cargados: {', '.join(stats['heavy_modules_loaded']) or 'ninguno'}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,635 @@
+"""
+Load test del handler HTTP (`api/index.py`) en un servidor local con hilos, contra stand-ins locales
+de Google Custom Search, Gemini (REST) y PostgREST/Supabase, más un servidor de "sitios" que responde
+las homepages de marcas y candidatos. Cada upstream tiene latencia, tasa de errores y cuota configurables.
+
+Los clientes (lazo cerrado: cada uno manda la siguiente petición al recibir la respuesta) mezclan
+marcas calientes (en caché tras un warm-up), marcas frías (escaneo completo), input inválido y
+preflights OPTIONS. El reporte JSON trae throughput, p50/p95/p99 y tasas de error por fase y por tipo.
+
+    uv run python benchmarks/load_test.py                                       # 8 clientes, 20 s
+    uv run python benchmarks/load_test.py --concurrency 1,8,32 --duration 30 --json load.json
+    uv run python benchmarks/load_test.py --sweep-latency-ms 0,250,1000 --mix hot=50,cold=50
+    uv run python benchmarks/load_test.py --cse-quota 200 --gemini-error-rate 0.2 --json degraded.json
+    uv run python benchmarks/load_test.py --json new.json --baseline load.json  # comparar con otro build
+"""
+import argparse
+import contextlib
+import hashlib
+import http.client
+import itertools
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures", "hulu")
+KINDS = ("hot", "cold", "invalid", "options")
+EXPECTED_STATUS = {"hot": 200, "cold": 200, "invalid": 400, "options": 204}
+INVALID_PATHS = ("/api", "/api?brand=", "/api?brand=Hulu&budget_ms=abc")
+
+# --- Stand-ins de upstream ---
+
+class QuietServer(ThreadingHTTPServer):
+    """Servidor con hilos que no imprime los cortes de conexión del cliente (pools que cierran keep-alives)."""
+    daemon_threads = True
+    request_queue_size = 1024  # el backlog por defecto (5) rechazaría conexiones antes de llegar al handler
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+class StandIn:
+    """
+    Servidor HTTP local con latencia (± jitter), tasa de errores y cuota configurables.
+    Pasada la cuota (`quota` peticiones atendidas) responde como el upstream real al agotarse.
+    """
+    name = "upstream"
+
+    def __init__(self, latency_ms: float = 0, error_rate: float = 0, quota: Optional[int] = None,
+                 jitter: float = 0.2, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.quota = quota
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self.stats = {"requests": 0, "errors_injected": 0, "quota_rejected": 0}
+
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive: el pool de conexiones del cliente se reutiliza
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                owner._serve(self, "GET")
+
+            def do_POST(self) -> None:
+                owner._serve(self, "POST")
+
+            def do_PATCH(self) -> None:
+                owner._serve(self, "PATCH")
+
+            def do_DELETE(self) -> None:
+                owner._serve(self, "DELETE")
+
+        self.server = QuietServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, name=f"standin-{self.name}", daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats = {key: 0 for key in self.stats}
+
+    def _admit(self) -> Tuple[str, float]:
+        """('ok' | 'quota' | 'error', segundos de latencia) para la próxima petición."""
+        with self._lock:
+            self.stats["requests"] += 1
+            delay = self.latency_ms / 1000 * self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+            if self.quota is not None and self._admitted >= self.quota:
+                self.stats["quota_rejected"] += 1
+                return "quota", 0.0  # el rechazo por cuota es inmediato
+            self._admitted += 1
+            if self.error_rate and self._rng.random() < self.error_rate:
+                self.stats["errors_injected"] += 1
+                return "error", delay
+            return "ok", delay
+
+    def _serve(self, request: BaseHTTPRequestHandler, method: str) -> None:
+        length = int(request.headers.get("Content-Length") or 0)
+        body = request.rfile.read(length) if length else b""
+        outcome, delay = self._admit()
+        if delay:
+            time.sleep(delay)
+        if outcome == "quota":
+            status, payload = self.quota_response()
+        elif outcome == "error":
+            status, payload = self.error_response()
+        else:
+            status, payload = self.respond(method, urlparse(request.path), body, request.headers)
+        self._write(request, status, payload)
+
+    @staticmethod
+    def _write(request: BaseHTTPRequestHandler, status: int, payload: Any,
+               content_type: str = "application/json", extra: Optional[Dict[str, str]] = None) -> None:
+        if isinstance(payload, str):
+            data, content_type = payload.encode("utf-8"), "text/html; charset=utf-8"
+        else:
+            data = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(data)))
+        for key, value in (extra or {}).items():
+            request.send_header(key, value)
+        request.end_headers()
+        request.wfile.write(data)
+
+    def respond(self, method: str, url: Any, body: bytes, headers: Any) -> Tuple[int, Any]:
+        raise NotImplementedError
+
+    def error_response(self) -> Tuple[int, Any]:
+        return 500, {"error": {"code": 500, "message": "Backend Error", "status": "INTERNAL"}}
+
+    def quota_response(self) -> Tuple[int, Any]:
+        return 429, {"error": {"code": 429, "message": "Resource has been exhausted (e.g. check quota).",
+                               "status": "RESOURCE_EXHAUSTED"}}
+
+def slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", text.lower()) or "brand"
+
+def synthetic_rivals(brand: str, count: int) -> List[str]:
+    """Competidores estables por marca, de un pool compartido (como en la realidad, se repiten entre marcas)."""
+    seed = int(hashlib.sha1(brand.lower().encode("utf-8")).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+    return [f"rival{n}" for n in rng.sample(range(200), count)]
+
+class CseStandIn(StandIn):
+    """Custom Search: respuestas grabadas por query; para el resto, resultados sintéticos deterministas."""
+    name = "cse"
+
+    def __init__(self, responses: Dict[str, Any], **kwargs: Any):
+        self.responses = responses
+        super().__init__(**kwargs)
+
+    def respond(self, method: str, url: Any, body: bytes, headers: Any) -> Tuple[int, Any]:
+        params = parse_qs(url.query)
+        query = params.get("q", [""])[0]
+        num = int(params.get("num", ["5"])[0])
+        if query in self.responses:
+            return 200, self.responses[query]
+        brand = re.sub(r"\s+(official site|competitors|alternatives.*|vs\b.*)$", "", query, flags=re.I).strip('"')
+        if query.lower().endswith("official site"):
+            names = [slug(brand)]
+        else:
+            names = synthetic_rivals(brand, num)
+        items = [{"title": f"{name.title()} - Watch TV and Movies Online", "link": f"https://www.{name}.com/",
+                  "displayLink": f"www.{name}.com",
+                  "snippet": f"{name.title()} is a streaming video subscription service. Alternatives to {brand}."}
+                 for name in names[:num]]
+        return 200, {"kind": "customsearch#search", "items": items}
+
+    def quota_response(self) -> Tuple[int, Any]:
+        # Mismo mensaje que Google al agotar el plan diario: el pipeline deja de gastar intentos ese día
+        return 429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED",
+                               "message": "Quota exceeded for quota metric 'Queries' and limit 'Queries per day'"}}
+
+class GeminiStandIn(StandIn):
+    """Gemini (REST `generateContent`): texto grabado para la marca del fixture, JSON sintético para el resto."""
+    name = "gemini"
+
+    def __init__(self, brand: str, text: str, **kwargs: Any):
+        self.brand = brand.lower()
+        self.text = text
+        super().__init__(**kwargs)
+
+    def respond(self, method: str, url: Any, body: bytes, headers: Any) -> Tuple[int, Any]:
+        try:
+            prompt = json.loads(body)["contents"][0]["parts"][0]["text"]
+        except (ValueError, KeyError, IndexError):
+            return 400, {"error": {"code": 400, "message": "Invalid JSON payload", "status": "INVALID_ARGUMENT"}}
+        found = re.search(r'Analiza la marca: "(.+?)"', prompt)
+        brand = found.group(1) if found else "brand"
+        if brand.lower() == self.brand:
+            text = self.text
+        else:
+            text = json.dumps([{"name": name.title(), "url": f"https://www.{name}.com",
+                                "type": "HDA" if i < 5 else "LDA",
+                                "description": f"Competidor directo en streaming de video de {brand}."}
+                               for i, name in enumerate(synthetic_rivals(brand, 8))])
+        return 200, {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"},
+                                     "finishReason": "STOP", "index": 0}],
+                     "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4}}
+
+class PostgrestStandIn(StandIn):
+    """
+    PostgREST en memoria para 'competitor_scans': filtros eq/gt/ilike/in (y not.), order, limit,
+    upsert con on_conflict y delete. Suficiente para lo que pide `api/db.py`.
+    """
+    name = "postgrest"
+    _RESERVED = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+    def __init__(self, **kwargs: Any):
+        self.rows: List[Dict[str, Any]] = []
+        self._rows_lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    @staticmethod
+    def _in_values(arg: str) -> List[str]:
+        """`("a","b",c)` -> ['a', 'b', 'c'] (los valores con caracteres reservados van entre comillas)."""
+        inner = arg[1:-1] if arg.startswith("(") and arg.endswith(")") else arg
+        return [v[1:-1].replace('\\"', '"') if v.startswith('"') else v
+                for v in re.findall(r'"(?:[^"\\]|\\.)*"|[^,]+', inner)]
+
+    def _matches(self, row: Dict[str, Any], column: str, expression: str) -> bool:
+        negate = expression.startswith("not.")
+        operator, _, arg = expression[4 if negate else 0:].partition(".")
+        value = row.get(column)
+        text = None if value is None else str(value)
+        if operator == "eq":
+            result = text == arg
+        elif operator == "gt":
+            result = text is not None and text > arg
+        elif operator == "ilike":
+            pattern = re.escape(arg).replace(r"\*", ".*").replace("%", ".*").replace("_", ".")
+            result = text is not None and re.fullmatch(pattern, text, re.IGNORECASE) is not None
+        elif operator == "in":
+            result = text in self._in_values(arg)
+        else:
+            result = True
+        return result != negate
+
+    def _select(self, params: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+        filters = [(column, expression) for column, values in params.items() if column not in self._RESERVED
+                   for expression in values]
+        return [row for row in self.rows if all(self._matches(row, c, e) for c, e in filters)]
+
+    def respond(self, method: str, url: Any, body: bytes, headers: Any) -> Tuple[int, Any]:
+        if not url.path.endswith("/competitor_scans"):
+            return 404, {"message": f"relation {url.path} does not exist"}
+        params = parse_qs(url.query)
+        with self._rows_lock:
+            if method == "GET":
+                rows = self._select(params)
+                for order in reversed(params.get("order", [""])[0].split(",")):
+                    if order:
+                        column, _, direction = order.partition(".")
+                        rows.sort(key=lambda row: str(row.get(column) or ""), reverse=direction.startswith("desc"))
+                if "limit" in params:
+                    rows = rows[:int(params["limit"][0])]
+                return 200, rows
+            if method == "DELETE":
+                doomed = {id(row) for row in self._select(params)}
+                self.rows = [row for row in self.rows if id(row) not in doomed]
+                return 204, None
+            incoming = json.loads(body or b"[]")
+            incoming = incoming if isinstance(incoming, list) else [incoming]
+            conflict = [c for c in params.get("on_conflict", [""])[0].split(",") if c]
+            now = datetime.now(timezone.utc).isoformat(timespec="microseconds")
+            for row in incoming:
+                row = {"created_at": now, **row}
+                key = tuple(row.get(c) for c in conflict)
+                existing = next((r for r in self.rows if conflict and tuple(r.get(c) for c in conflict) == key), None)
+                if existing is not None:
+                    existing.update(row)
+                else:
+                    self.rows.append(row)
+            return 201, []
+
+    def quota_response(self) -> Tuple[int, Any]:
+        return 429, {"message": "Too Many Requests", "hint": "Rate limit exceeded"}
+
+    def error_response(self) -> Tuple[int, Any]:
+        return 503, {"message": "upstream connect error or disconnect/reset before headers"}
+
+class SiteStandIn(StandIn):
+    """Homepages de marcas y candidatos (`/<host>/<path>`): HTML grabado si existe, sintético si no."""
+    name = "sites"
+
+    def __init__(self, pages: Dict[str, str], redirects: Dict[str, str], **kwargs: Any):
+        self.pages = pages
+        self.redirects = redirects
+        super().__init__(**kwargs)
+
+    def _serve(self, request: BaseHTTPRequestHandler, method: str) -> None:
+        host = request.path.lstrip("/").split("/", 1)[0].lower()
+        target = self.redirects.get(host)
+        if target:
+            self._admit()
+            location = urlparse(target)
+            return self._write(request, 301, None, extra={"Location": f"/{location.netloc}{location.path or '/'}"})
+        super()._serve(request, method)
+
+    def respond(self, method: str, url: Any, body: bytes, headers: Any) -> Tuple[int, Any]:
+        host = url.path.lstrip("/").split("/", 1)[0].lower()
+        html = self.pages.get(host)
+        if html is None:
+            name = host.replace("www.", "").split(".")[0].title()
+            html = (f"<html><head><title>{name} - Stream TV and Movies</title>"
+                    f'<meta name="description" content="Watch movies and TV on {name}, the streaming video subscription service.">'
+                    f'<meta name="keywords" content="streaming, movies, tv, watch, {name.lower()}"></head>'
+                    f"<body><h1>{name}</h1></body></html>")
+        return 200, html
+
+    def error_response(self) -> Tuple[int, Any]:
+        return 503, "<html><body>Service Unavailable</body></html>"
+
+class SiteRouter:
+    """
+    Transporte de `http_client` que manda las homepages (hosts públicos) al stand-in de sitios
+    y deja pasar lo que ya es local (CSE). Envuelve al transporte real: pool, timeouts y reintentos
+    son los de producción, y `resp.url` vuelve con el host original.
+    """
+
+    def __init__(self, inner: Any, sites_url: str):
+        self.inner = inner
+        self.sites_url = sites_url
+        self.name = f"{inner.name}+sites"
+        self.retryable_errors = inner.retryable_errors
+        self.timeout_errors = inner.timeout_errors
+
+    def _route(self, url: str) -> str:
+        parts = urlparse(url)
+        if parts.hostname in ("127.0.0.1", "localhost"):
+            return url
+        return f"{self.sites_url}/{parts.netloc.lower()}{parts.path or '/'}" + (f"?{parts.query}" if parts.query else "")
+
+    def _unroute(self, resp: Any) -> Any:
+        if resp.url.startswith(self.sites_url + "/"):
+            resp.url = "https://" + resp.url[len(self.sites_url) + 1:]
+        return resp
+
+    def get(self, url: str, params: Any, headers: Any, timeout: Any) -> Any:
+        return self._unroute(self.inner.get(self._route(url), params, headers, timeout))
+
+    def get_head(self, url: str, headers: Any, timeout: Any, max_bytes: int) -> Any:
+        return self._unroute(self.inner.get_head(self._route(url), headers, timeout, max_bytes))
+
+# --- Carga ---
+
+def percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+def summarize(samples: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    """Throughput, latencias (ms) y errores: status inesperado o fallo de conexión."""
+    ordered = sorted(s["ms"] for s in samples)
+    errors = sum(1 for s in samples if s["error"])
+    statuses: Dict[str, int] = {}
+    for s in samples:
+        statuses[str(s["status"])] = statuses.get(str(s["status"]), 0) + 1
+    scans = [s for s in samples if s["kind"] in ("hot", "cold") and not s["error"]]
+    return {
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {"p50": round(percentile(ordered, 0.5), 2), "p95": round(percentile(ordered, 0.95), 2),
+                       "p99": round(percentile(ordered, 0.99), 2), "max": round(ordered[-1], 2) if ordered else 0.0,
+                       "mean": round(sum(ordered) / len(ordered), 2) if ordered else 0.0},
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "statuses": statuses,
+        # Respuestas 200 degradadas: el upstream falló y el escaneo volvió vacío o parcial
+        "empty_scans": sum(1 for s in scans if s.get("empty")),
+        "partial_scans": sum(1 for s in scans if s.get("partial")),
+    }
+
+class LoadDriver:
+    """Clientes en lazo cerrado contra el handler; cada petición elige su tipo según los pesos de la mezcla."""
+
+    def __init__(self, port: int, mix: Dict[str, float], hot_brands: List[str], timeout: float, seed: int):
+        self.port = port
+        self.kinds = [k for k in KINDS if mix.get(k)]
+        self.weights = [mix[k] for k in self.kinds]
+        self.hot_brands = hot_brands
+        self.timeout = timeout
+        self.seed = seed
+        self._cold = itertools.count()
+        self._cold_prefix = ""
+
+    def path_for(self, kind: str, rng: random.Random) -> str:
+        if kind == "hot":
+            return f"/api?brand={quote(rng.choice(self.hot_brands))}"
+        if kind == "cold":
+            return f"/api?brand={quote(f'Cold {self._cold_prefix}{next(self._cold)}')}"
+        return rng.choice(INVALID_PATHS)
+
+    def request(self, kind: str, path: str) -> Dict[str, Any]:
+        method = "OPTIONS" if kind == "options" else "GET"
+        started = time.perf_counter()
+        sample: Dict[str, Any] = {"kind": kind, "status": "exception", "error": True}
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=self.timeout)
+        try:
+            conn.request(method, "/api" if kind == "options" else path,
+                         headers={"Origin": "http://localhost:3000"} if kind == "options" else {})
+            resp = conn.getresponse()
+            body = resp.read()
+            sample.update(status=resp.status, error=resp.status != EXPECTED_STATUS[kind])
+            if kind in ("hot", "cold") and resp.status == 200:
+                data = json.loads(body).get("data") or {}
+                sample["partial"] = bool(data.get("partial"))
+                sample["empty"] = not (data.get("HDA_Competitors") or data.get("LDA_Competitors"))
+        except Exception as e:
+            sample["status"] = type(e).__name__
+        finally:
+            conn.close()
+        sample["ms"] = (time.perf_counter() - started) * 1000
+        return sample
+
+    def warm_up(self) -> float:
+        """Escanea las marcas calientes (en paralelo) para que durante la fase sean hits de caché."""
+        started = time.perf_counter()
+        threads = [threading.Thread(target=self.request, args=("hot", f"/api?brand={quote(brand)}"), daemon=True)
+                   for brand in self.hot_brands]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.perf_counter() - started
+
+    def run(self, concurrency: int, duration: float, max_requests: Optional[int], phase: str) -> Dict[str, Any]:
+        self._cold_prefix = f"{phase}-"
+        samples: List[Dict[str, Any]] = []
+        lock = threading.Lock()
+        stop_at = time.perf_counter() + duration
+        issued = itertools.count()
+
+        def client(n: int) -> None:
+            rng = random.Random(f"{self.seed}:{phase}:{n}")
+            while time.perf_counter() < stop_at and (max_requests is None or next(issued) < max_requests):
+                kind = rng.choices(self.kinds, self.weights)[0]
+                sample = self.request(kind, self.path_for(kind, rng))
+                with lock:
+                    samples.append(sample)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(n,), daemon=True) for n in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        report = summarize(samples, elapsed)
+        report["elapsed_s"] = round(elapsed, 3)
+        report["by_kind"] = {k: summarize([s for s in samples if s["kind"] == k], elapsed)
+                             for k in self.kinds if any(s["kind"] == k for s in samples)}
+        return report
+
+# --- CLI ---
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        if kind.strip() not in KINDS:
+            raise argparse.ArgumentTypeError(f"Tipo desconocido '{kind}' (válidos: {', '.join(KINDS)})")
+        mix[kind.strip()] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("La mezcla necesita al menos un peso > 0")
+    return mix
+
+def parse_list(cast: Any):
+    return lambda text: [cast(v) for v in text.split(",") if v.strip()]
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+def configure_environment(args: argparse.Namespace, workdir: str, cse: StandIn, gemini: StandIn, postgrest: StandIn) -> None:
+    """Apunta la app a los stand-ins. Estado en disco en un directorio nuevo: cada corrida empieza en frío."""
+    os.environ.update({
+        "GOOGLE_API_KEY": "loadtest", "GOOGLE_CSE_ID": "loadtest", "GEMINI_API_KEY": "loadtest",
+        "GOOGLE_CSE_ENDPOINT": f"{cse.url}/customsearch/v1", "GEMINI_API_ENDPOINT": gemini.url,
+        "SUPABASE_URL": postgrest.url, "SUPABASE_KEY": "loadtest", "COMPAS_DB_BACKEND": "supabase",
+        "COMPAS_CACHE_BACKEND": "memory", "GEMINI_CACHE_PATH": os.path.join(workdir, "gemini.sqlite"),
+        "COMPAS_STATE_PATH": os.path.join(workdir, "state.sqlite"),
+        "COMPAS_INDEX_PATH": os.path.join(workdir, "index.sqlite"),
+        "COMPAS_CSE_CACHE_PATH": os.path.join(workdir, "cse.sqlite"),
+        "COMPAS_CSE_BUDGET_PATH": os.path.join(workdir, "cse_budget.json"),
+    })
+    if not args.real_cse_quota:
+        # Sin el limitador propio (2 consultas/s, 100/día): se mide el handler, no el plan gratuito
+        os.environ.update({"COMPAS_CSE_DAILY_BUDGET": "1000000000", "COMPAS_CSE_RATE": "1000000",
+                           "COMPAS_CSE_BURST": "1000000"})
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Tabla de throughput y p95 contra otra corrida (misma clave de fase)."""
+    before = {p["phase"]: p for p in baseline.get("phases", [])}
+    print(f"\n📊 Contra {baseline.get('revision') or 'baseline'}:", file=sys.stderr)
+    for phase in report["phases"]:
+        old = before.get(phase["phase"])
+        if old is None:
+            print(f"   {phase['phase']:<28} (sin fase equivalente)", file=sys.stderr)
+            continue
+        ratio = lambda new, prev: f"{new / prev:.2f}x" if prev else "n/a"
+        print(f"   {phase['phase']:<28} rps {old['throughput_rps']:>8} -> {phase['throughput_rps']:<8} "
+              f"({ratio(phase['throughput_rps'], old['throughput_rps'])})  p95 {old['latency_ms']['p95']:>9} -> "
+              f"{phase['latency_ms']['p95']:<9} ({ratio(phase['latency_ms']['p95'], old['latency_ms']['p95'])})  "
+              f"errores {old['error_rate']:.2%} -> {phase['error_rate']:.2%}", file=sys.stderr)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=parse_list(int), default=[8], help="Clientes simultáneos (lista = una fase por valor)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Segundos por fase")
+    parser.add_argument("--requests", type=int, default=None, help="Tope de peticiones por fase (además de --duration)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("hot=70,cold=20,invalid=5,options=5"))
+    parser.add_argument("--hot-brands", type=int, default=10, help="Marcas calientes (se escanean una vez antes de medir)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Timeout por petición del cliente (s)")
+    parser.add_argument("--sweep-latency-ms", type=parse_list(float), default=None,
+                        help="Latencias de Gemini y CSE a recorrer (una fase por valor y por concurrencia)")
+    for upstream, latency in (("cse", 150.0), ("gemini", 1500.0), ("db", 40.0)):
+        parser.add_argument(f"--{upstream}-latency-ms", type=float, default=latency)
+        parser.add_argument(f"--{upstream}-error-rate", type=float, default=0.0)
+        parser.add_argument(f"--{upstream}-quota", type=int, default=None, help="Peticiones atendidas antes de responder 429")
+    parser.add_argument("--site-latency-ms", type=float, default=80.0, help="Latencia de las homepages")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Variación relativa de la latencia de los upstreams")
+    parser.add_argument("--real-cse-quota", action="store_true", help="Mantener el limitador/presupuesto diario de CSE de producción")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", metavar="PATH", help="Escribir el reporte JSON ('-' = stdout)")
+    parser.add_argument("--baseline", metavar="PATH", help="Reporte JSON de otro build para comparar")
+    parser.add_argument("--verbose", action="store_true", help="No silenciar los logs del pipeline")
+    args = parser.parse_args()
+
+    from replay import load_recorded_fixtures
+    fixtures = load_recorded_fixtures(args.fixtures)
+    common = {"jitter": args.jitter, "seed": args.seed}
+    cse = CseStandIn(fixtures["cse"], latency_ms=args.cse_latency_ms, error_rate=args.cse_error_rate,
+                     quota=args.cse_quota, **common)
+    gemini = GeminiStandIn(fixtures["brand"], fixtures["gemini_text"], latency_ms=args.gemini_latency_ms,
+                           error_rate=args.gemini_error_rate, quota=args.gemini_quota, **common)
+    postgrest = PostgrestStandIn(latency_ms=args.db_latency_ms, error_rate=args.db_error_rate, quota=args.db_quota, **common)
+    sites = SiteStandIn(fixtures["pages"], fixtures["redirects"], latency_ms=args.site_latency_ms, **common)
+    upstreams = (cse, gemini, postgrest, sites)
+
+    workdir = tempfile.mkdtemp(prefix="compas_load_")
+    configure_environment(args, workdir, cse, gemini, postgrest)
+
+    # La app se importa con el entorno ya apuntando a los stand-ins
+    from api import http_client
+    from api.index import handler
+
+    http_client.set_transport(SiteRouter(http_client.get_transport(), sites.url))
+
+    class QuietHandler(handler):
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    app = QuietServer(("127.0.0.1", 0), QuietHandler)
+    threading.Thread(target=app.serve_forever, name="app", daemon=True).start()
+
+    hot_brands = [fixtures["brand"]] + [f"Hot {n}" for n in range(1, args.hot_brands)]
+    driver = LoadDriver(app.server_address[1], args.mix, hot_brands[:max(1, args.hot_brands)], args.timeout, args.seed)
+    latencies = args.sweep_latency_ms or [None]
+
+    report: Dict[str, Any] = {
+        "revision": git_revision(), "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0], "transport": http_client.get_transport().name,
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "baseline", "verbose")},
+        "phases": [],
+    }
+    logs = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    try:
+        with logs:
+            for latency in latencies:
+                if latency is not None:
+                    cse.latency_ms = gemini.latency_ms = latency
+                for concurrency in args.concurrency:
+                    name = f"c{concurrency}" + (f"-lat{latency:g}ms" if latency is not None else "")
+                    print(f"🚦 Fase {name}: {concurrency} clientes, {args.duration:g} s...", file=sys.stderr)
+                    warm_up = driver.warm_up()
+                    for upstream in upstreams:
+                        upstream.reset_stats()
+                    phase = driver.run(concurrency, args.duration, args.requests, name)
+                    phase.update(phase=name, concurrency=concurrency, upstream_latency_ms=latency,
+                                 warm_up_s=round(warm_up, 3),
+                                 upstreams={u.name: dict(u.stats) for u in upstreams})
+                    report["phases"].append(phase)
+                    lat = phase["latency_ms"]
+                    print(f"   {phase['requests']} peticiones, {phase['throughput_rps']} req/s, p50 {lat['p50']} ms, "
+                          f"p95 {lat['p95']} ms, p99 {lat['p99']} ms, errores {phase['error_rate']:.2%}", file=sys.stderr)
+    finally:
+        app.shutdown()
+        app.server_close()
+        for upstream in upstreams:
+            upstream.close()
+
+    if args.json:
+        text = json.dumps(report, indent=2, ensure_ascii=False)
+        if args.json == "-":
+            print(text)
+        else:
+            with open(args.json, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+            print(f"💾 Reporte en {args.json}", file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(report, json.load(f))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
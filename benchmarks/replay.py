@@ -0,0 +1,245 @@
+"""
+Stand-ins de reproducción para los benchmarks (sin red, sin credenciales, sin cuota): transporte HTTP
+con respuestas grabadas de Google CSE y homepages, modelo de Gemini, cliente de Supabase en memoria
+y la carga de los escenarios de `benchmarks/fixtures/`.
+
+Se importan como `from replay import ...` desde los scripts de `benchmarks/` (que ya agregan la raíz
+del repo a sys.path para `api`).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+from urllib.parse import urlparse
+from typing import List, Dict, Any, Optional
+
+class ReplayTransport:
+    """
+    Transporte para `http_client.set_transport` que responde con datos grabados:
+    respuestas JSON de Google CSE (por query) y HTML de homepages (por host).
+    `latency_ms` simula la latencia de red por llamada y `redirects` ({host: url final})
+    las redirecciones que `get_head` sigue, como haría el transporte real.
+    Las homepages llevan un ETag (hash del HTML) y responden 304 a un If-None-Match que coincide.
+    """
+    name = "replay"
+    retryable_errors = (ConnectionError,)
+    timeout_errors = (TimeoutError,)
+
+    def __init__(self, cse_responses: Dict[str, Any], pages: Dict[str, str], latency_ms: float = 0,
+                 redirects: Optional[Dict[str, str]] = None):
+        self.cse_responses = cse_responses
+        self.pages = pages
+        self.redirects = redirects or {}
+        self.latency_ms = latency_ms
+        self.calls = 0
+        self.bytes_served = 0
+        self._etags: Dict[int, str] = {}  # por página (el HTML grabado no cambia)
+        self._lock = threading.Lock()
+
+    def _wait(self, timeout: Any) -> None:
+        """Simula la latencia; si supera el timeout de lectura, falla como lo haría el transporte real."""
+        if not self.latency_ms:
+            return
+        read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+        if read_timeout is not None and self.latency_ms / 1000 > read_timeout:
+            time.sleep(read_timeout)
+            raise TimeoutError(f"Read timed out ({read_timeout:.3f}s)")
+        time.sleep(self.latency_ms / 1000)
+
+    def get(self, url: str, params: Optional[Dict[str, Any]], headers: Optional[Dict[str, str]], timeout: Any) -> Any:
+        from api.http_client import HttpResponse
+
+        self._wait(timeout)
+
+        if "customsearch" in url:
+            query = (params or {}).get("q", "")
+            body = json.dumps(self.cse_responses.get(query, {"items": []})).encode("utf-8")
+            status, content_type = 200, "application/json"
+        else:
+            html = self.pages.get(urlparse(url).netloc.lower())
+            body = (html or "Not Found").encode("utf-8")
+            status, content_type = (200 if html is not None else 404), "text/html; charset=utf-8"
+
+        with self._lock:
+            self.calls += 1
+            self.bytes_served += len(body)
+        return HttpResponse(status, {"Content-Type": content_type}, body, url, "utf-8")
+
+    def page_etag(self, html: str) -> str:
+        key = id(html)
+        etag = self._etags.get(key)
+        if etag is None:
+            etag = self._etags[key] = '"' + hashlib.sha1(html.encode("utf-8")).hexdigest()[:16] + '"'
+        return etag
+
+    def get_head(self, url: str, headers: Optional[Dict[str, str]], timeout: Any, max_bytes: int) -> Any:
+        """Como `get` para una homepage, pero entregada en chunks: solo cuenta lo que se lee."""
+        from api.constants import HTTP_HEAD_CHUNK_BYTES
+        from api.http_client import HttpResponse, read_head_prefix
+
+        self._wait(timeout)
+
+        url = self.redirects.get(urlparse(url).netloc.lower(), url)
+        html = self.pages.get(urlparse(url).netloc.lower())
+        if html is not None:
+            etag = self.page_etag(html)
+            if {k.lower(): v for k, v in (headers or {}).items()}.get("if-none-match") == etag:
+                with self._lock:
+                    self.calls += 1
+                return HttpResponse(304, {"ETag": etag}, b"", url, "utf-8")
+        body = (html or "Not Found").encode("utf-8")
+        chunks = (body[i:i + HTTP_HEAD_CHUNK_BYTES] for i in range(0, len(body), HTTP_HEAD_CHUNK_BYTES))
+        content, truncated = read_head_prefix(chunks, max_bytes)
+
+        with self._lock:
+            self.calls += 1
+            self.bytes_served += len(content)
+        response_headers = {"Content-Type": "text/html; charset=utf-8"}
+        if html is not None:
+            response_headers["ETag"] = self.page_etag(html)
+        return HttpResponse(200 if html is not None else 404, response_headers, content, url, "utf-8", truncated)
+
+class ReplayGeminiModel:
+    """
+    Reemplazo de `genai.GenerativeModel` que devuelve un texto grabado (respeta `request_options={"timeout"}`).
+    `text` puede ser una función del prompt; con `stream=True` la respuesta llega en chunks de `chunk_chars`.
+    """
+
+    def __init__(self, text: Any, latency_ms: float = 0, chunk_chars: int = 64):
+        self.text = text
+        self.latency_ms = latency_ms
+        self.chunk_chars = chunk_chars
+        self.calls = 0
+
+    def generate_content(self, prompt: Any, **kwargs: Any) -> Any:
+        self.calls += 1
+        timeout = (kwargs.get("request_options") or {}).get("timeout")
+        if self.latency_ms and timeout is not None and self.latency_ms / 1000 > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("504 Deadline Exceeded")
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        text = self.text(prompt) if callable(self.text) else self.text
+        if kwargs.get("stream"):
+            return [SimpleNamespace(text=text[i:i + self.chunk_chars]) for i in range(0, len(text), self.chunk_chars)]
+        return SimpleNamespace(text=text)
+
+class _ReplayQuery:
+    """Subconjunto del query builder de PostgREST: insert/upsert/delete, filtros eq/gt/ilike/in_/not_, order y limit."""
+
+    def __init__(self, store: List[Dict[str, Any]]):
+        self._store = store
+        self._pending: Optional[List[Dict[str, Any]]] = None
+        self._conflict: Optional[List[str]] = None
+        self._delete = False
+        self._filters: List[Any] = []
+        self._negate = False
+        self._order: Optional[Any] = None
+        self._limit: Optional[int] = None
+
+    def insert(self, rows: List[Dict[str, Any]]) -> "_ReplayQuery":
+        self._pending = rows
+        return self
+
+    def upsert(self, rows: List[Dict[str, Any]], on_conflict: str = "") -> "_ReplayQuery":
+        self._pending = rows
+        self._conflict = [c.strip() for c in on_conflict.split(",") if c.strip()] or None
+        return self
+
+    def delete(self) -> "_ReplayQuery":
+        self._delete = True
+        return self
+
+    def select(self, *args: Any, **kwargs: Any) -> "_ReplayQuery":
+        return self  # devuelve filas completas: las columnas de más no molestan
+
+    def _filter(self, test: Any) -> "_ReplayQuery":
+        negate, self._negate = self._negate, False
+        self._filters.append((lambda row: not test(row)) if negate else test)
+        return self
+
+    @property
+    def not_(self) -> "_ReplayQuery":
+        self._negate = True
+        return self
+
+    def eq(self, column: str, value: Any) -> "_ReplayQuery":
+        return self._filter(lambda row: row.get(column) == value)
+
+    def in_(self, column: str, values: List[Any]) -> "_ReplayQuery":
+        values = set(values)
+        return self._filter(lambda row: row.get(column) in values)
+
+    def gt(self, column: str, value: Any) -> "_ReplayQuery":
+        return self._filter(lambda row: row.get(column) is not None and row.get(column) > value)
+
+    def ilike(self, column: str, pattern: str) -> "_ReplayQuery":
+        # Solo patrones sin comodines (como los usa db.py): igualdad sin distinguir mayúsculas
+        literal = pattern.replace('\\%', '%').replace('\\_', '_').replace('\\\\', '\\').lower()
+        return self._filter(lambda row: str(row.get(column, "")).lower() == literal)
+
+    def order(self, column: str, desc: bool = False) -> "_ReplayQuery":
+        self._order = (column, desc)
+        return self
+
+    def limit(self, count: int) -> "_ReplayQuery":
+        self._limit = count
+        return self
+
+    def _matches(self, row: Dict[str, Any]) -> bool:
+        return all(test(row) for test in self._filters)
+
+    def execute(self) -> Any:
+        if self._pending is not None:
+            if self._conflict:
+                # Como PostgREST: una fila con la misma clave de conflicto se reemplaza
+                keys = {tuple(row[c] for c in self._conflict) for row in self._pending}
+                self._store[:] = [row for row in self._store if tuple(row.get(c) for c in self._conflict) not in keys]
+            self._store.extend(self._pending)
+            return (("data", self._pending), ("count", None))
+        if self._delete:
+            deleted = [row for row in self._store if self._matches(row)]
+            self._store[:] = [row for row in self._store if not self._matches(row)]
+            return (("data", deleted), ("count", None))
+        rows = [row for row in self._store if self._matches(row)]
+        if self._order:
+            column, desc = self._order
+            rows = sorted(rows, key=lambda row: row.get(column) or "", reverse=desc)
+        return SimpleNamespace(data=rows[:self._limit] if self._limit is not None else rows, count=None)
+
+class ReplaySupabaseClient:
+    """Reemplazo mínimo del cliente de Supabase: guarda las filas en memoria."""
+
+    def __init__(self):
+        self.rows: List[Dict[str, Any]] = []
+
+    def table(self, name: str) -> _ReplayQuery:
+        return _ReplayQuery(self.rows)
+
+def load_recorded_fixtures(directory: str) -> Dict[str, Any]:
+    """
+    Carga un escenario grabado:
+    - scenario.json: {"brand": ..., "gemini": "gemini.txt", "redirects": {host: url final}}
+    - cse.json: {query: respuesta JSON de Custom Search}
+    - gemini.txt: respuesta de texto de Gemini
+    - pages/<host>.html: HTML de las homepages
+    """
+    with open(os.path.join(directory, "scenario.json"), encoding="utf-8") as f:
+        scenario = json.load(f)
+    with open(os.path.join(directory, "cse.json"), encoding="utf-8") as f:
+        cse = json.load(f)
+    with open(os.path.join(directory, scenario.get("gemini", "gemini.txt")), encoding="utf-8") as f:
+        gemini_text = f.read()
+
+    pages: Dict[str, str] = {}
+    pages_dir = os.path.join(directory, "pages")
+    if os.path.isdir(pages_dir):
+        for filename in sorted(os.listdir(pages_dir)):
+            if filename.endswith(".html"):
+                with open(os.path.join(pages_dir, filename), encoding="utf-8") as f:
+                    pages[filename[:-len(".html")]] = f.read()
+
+    return {"brand": scenario["brand"], "cse": cse, "gemini_text": gemini_text, "pages": pages,
+            "redirects": scenario.get("redirects", {})}
@@ -0,0 +1,75 @@
+"""
+CLI del índice de competidores entre marcas (COMPAS_INDEX_PATH).
+
+Trae al índice lo guardado en 'competitor_scans' desde la última sincronización (o todo, con
+--rebuild) y permite consultarlo.
+
+    uv run python index_competitors.py                      # sincronización incremental
+    uv run python index_competitors.py --rebuild            # reconstrucción completa
+    uv run python index_competitors.py --related Peacock    # candidatos que sembraría un escaneo
+    uv run python index_competitors.py --every 300          # loop: sincroniza cada 5 minutos
+"""
+import argparse
+import contextlib
+import json
+import sys
+import time
+
+from dotenv import load_dotenv
+
+# Carga las variables del archivo .env
+load_dotenv()
+
+from api.competitor_index import get_competitor_index, sync_competitor_index
+from api.constants import INDEX_MAX_SEEDS
+from api.domains import host_of, registrable_domain
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Índice local de competidores entre marcas.")
+    parser.add_argument("--rebuild", action="store_true", help="Reconstruir desde cero (relee toda la tabla)")
+    parser.add_argument("--related", metavar="MARCA", help="Mostrar los candidatos sembrados para una marca")
+    parser.add_argument("--domain", help="Mostrar las marcas y señales de un dominio competidor")
+    parser.add_argument("--top", type=int, default=INDEX_MAX_SEEDS, help="Candidatos a mostrar con --related")
+    parser.add_argument("--every", type=float, default=None, help="Repetir la sincronización cada N segundos")
+    args = parser.parse_args()
+
+    index = get_competitor_index()
+    if index is None:
+        print("❌ Índice desactivado (COMPAS_INDEX_PATH vacío).", file=sys.stderr)
+        return 1
+
+    def emit(data) -> None:
+        sys.stdout.write(json.dumps(data, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+
+    if args.related or args.domain:
+        if args.related:
+            # Como en un escaneo sin homepage: el sitio de la marca es el dominio que el índice conoce para su nombre
+            site = registrable_domain(host_of(args.related)) if "." in args.related else None
+            found = None if site else index.find_by_name(args.related)
+            own = [site or (found or {}).get("domain")]
+            emit({"brand": args.related, "domain": own[0], "competitors": index.competitors_of(args.related),
+                  "related": index.related(args.related, own, args.top)})
+        if args.domain:
+            emit({"domain": args.domain, "brands": index.brands_for(args.domain), "signals": index.domain_signals(args.domain)})
+        return 0
+
+    full = args.rebuild
+    try:
+        while True:
+            started = time.monotonic()
+            with contextlib.redirect_stdout(sys.stderr):
+                result = sync_competitor_index(full=full)
+            result["elapsed_ms"] = round((time.monotonic() - started) * 1000)
+            emit(result)
+            if result["status"] != "ok":
+                return 1
+            if args.every is None:
+                return 0
+            full = False
+            time.sleep(max(0.0, args.every - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
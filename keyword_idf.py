@@ -0,0 +1,100 @@
+"""
+CLI del IDF de keywords (COMPAS_IDF_PATH): precalcula los pesos a partir de homepages ya conocidas.
+
+El pipeline suma al corpus cada homepage que lee; este script lo arma de una vez con las homepages
+de los competidores guardados en 'competitor_scans' (--from-db) o con HTML en disco (--from-dir).
+
+    uv run python keyword_idf.py --from-db --workers 16        # lee el head de cada competidor guardado
+    uv run python keyword_idf.py --from-dir benchmarks/fixtures/hulu/pages
+    uv run python keyword_idf.py --explain https://www.hulu.com  # keywords con y sin IDF
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+from collections import Counter
+from typing import Iterator, List, Set, Tuple
+
+from dotenv import load_dotenv
+
+# Carga las variables del archivo .env
+load_dotenv()
+
+from api.compas_core import map_concurrently
+from api.domains import clean_url, host_of
+from api.html_head import head_text, parse_head
+from api.keywords import get_keyword_engine, tokenize
+
+def stored_competitor_urls(page_rows: int = 1000) -> List[str]:
+    """URLs distintas de 'competitor_scans' (paginando por created_at)."""
+    from api.db import rows_since
+
+    urls: Set[str] = set()
+    after = None
+    while True:
+        rows = rows_since(after, page_rows)
+        urls.update(r["competitor_url"] for r in rows if r.get("competitor_url"))
+        if len(rows) < page_rows:
+            return sorted(urls)
+        # Las filas de un escaneo comparten created_at: la página siguiente arranca en el último grupo completo
+        newest = rows[-1]["created_at"]
+        older = [r["created_at"] for r in rows if r["created_at"] != newest]
+        if not older:
+            page_rows *= 2
+            continue
+        after = older[-1]
+
+def fetch_documents(urls: List[str], workers: int) -> Iterator[Tuple[str, str]]:
+    """(host, texto del head) de cada homepage que responde (sondas con caché por dominio)."""
+    from api.enrichment import probe_domain
+
+    for url, probe in zip(urls, map_concurrently(probe_domain, urls, workers)):
+        if probe["status"] == "alive":
+            yield host_of(probe.get("final_url") or url), head_text(probe["head"])
+
+def read_directory(directory: str) -> Iterator[Tuple[str, str]]:
+    """(nombre de archivo, texto del head) de cada .html del directorio (recursivo)."""
+    for root, _, files in os.walk(directory):
+        for filename in sorted(files):
+            if filename.endswith((".html", ".htm")):
+                with open(os.path.join(root, filename), encoding="utf-8", errors="replace") as f:
+                    yield filename.rsplit(".", 1)[0], head_text(parse_head(f.read()))
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="IDF de keywords a partir de homepages conocidas.")
+    parser.add_argument("--from-db", action="store_true", help="Homepages de los competidores guardados")
+    parser.add_argument("--from-dir", metavar="DIR", help="Archivos HTML en disco")
+    parser.add_argument("--limit", type=int, default=None, help="Máximo de homepages a leer con --from-db")
+    parser.add_argument("--workers", type=int, default=16, help="Lecturas simultáneas con --from-db")
+    parser.add_argument("--explain", metavar="URL", help="Mostrar las keywords de una homepage con y sin IDF")
+    args = parser.parse_args()
+
+    engine = get_keyword_engine()
+    added = 0
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.from_dir:
+            added += engine.observe_many(read_directory(args.from_dir))
+        if args.from_db:
+            urls = stored_competitor_urls()[:args.limit]
+            print(f"🗂️ {len(urls)} homepages de competidores guardados.")
+            added += engine.observe_many(fetch_documents(urls, args.workers))
+        if added:
+            engine.save()
+
+    result = {"added": added, **engine.stats(), "path": engine.path}
+    if args.explain:
+        from api.enrichment import probe_domain
+        with contextlib.redirect_stdout(sys.stderr):
+            probe = probe_domain(clean_url(args.explain))
+        if probe["status"] != "alive":
+            print(f"❌ No se pudo leer {args.explain} ({probe.get('reason') or probe['status']}).", file=sys.stderr)
+            return 1
+        text = head_text(probe["head"])
+        result["explain"] = {"url": args.explain, "tf_idf": engine.keywords(text, 10),
+                             "tf": [w for w, _ in Counter(tokenize(text)).most_common(10)]}
+    print(json.dumps(result, ensure_ascii=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
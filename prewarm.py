@@ -0,0 +1,81 @@
+"""
+CLI de pre-calentamiento: re-escanea las marcas más pedidas antes de que venza su caché.
+
+Lee la popularidad del registro de peticiones (COMPAS_REQUEST_LOG o --log, JSONL) y/o de las
+marcas guardadas en 'competitor_scans', y escribe un resultado NDJSON por marca re-escaneada.
+
+    uv run python prewarm.py --dry-run                      # solo el plan
+    uv run python prewarm.py --log /tmp/compas_requests.jsonl --top 100 --workers 2
+    uv run python prewarm.py --every 600                    # loop: un ciclo cada 10 minutos
+"""
+import argparse
+import contextlib
+import json
+import sys
+import time
+
+from dotenv import load_dotenv
+
+# Carga las variables del archivo .env
+load_dotenv()
+
+from api.prewarm import loop_lead_seconds, resolve_interval, run_prewarm_cycle
+
+def run_cycle(args: argparse.Namespace, lead_seconds: float, out) -> int:
+    """Un ciclo: escribe el plan (con --dry-run) o un resultado por marca. Devuelve la cantidad de errores."""
+    errors = 0
+    with contextlib.redirect_stdout(sys.stderr):
+        for event in run_prewarm_cycle(top=args.top, lead_seconds=lead_seconds, max_workers=args.workers,
+                                       max_scans=args.max_scans, cse_reserve=args.cse_reserve, log_path=args.log,
+                                       use_db=not args.no_db, incremental=args.incremental,
+                                       persist=not args.no_save, dry_run=args.dry_run):
+            if event["event"] == "plan":
+                if args.dry_run:
+                    for item in event["data"]["items"]:
+                        out.write(json.dumps(item, ensure_ascii=False) + "\n")
+                continue
+            result = event["data"]
+            errors += result["status"] == "error"
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+    return errors
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Pre-calentamiento de la caché para las marcas populares.")
+    parser.add_argument("--log", default=None, help="Registro de peticiones JSONL (por defecto COMPAS_REQUEST_LOG)")
+    parser.add_argument("--no-db", action="store_true", help="No leer marcas de 'competitor_scans'")
+    parser.add_argument("--top", type=int, default=None, help="Cantidad de marcas populares a considerar")
+    parser.add_argument("--lead", type=float, default=None, help="Re-escanear lo que vence dentro de N segundos")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Escaneos simultáneos")
+    parser.add_argument("--max-scans", type=int, default=None, help="Tope de escaneos por ciclo")
+    parser.add_argument("--cse-reserve", type=int, default=None,
+                        help="Consultas CSE del día que no se usan (quedan para los usuarios)")
+    parser.add_argument("--incremental", action="store_true", help="Re-escaneo incremental (solo el delta a la DB)")
+    parser.add_argument("--no-save", action="store_true", help="No guardar los resultados en la base de datos")
+    parser.add_argument("--dry-run", action="store_true", help="Mostrar el plan sin escanear")
+    parser.add_argument("--every", type=float, default=None, nargs="?", const=-1,
+                        help="Repetir cada N segundos (sin valor: COMPAS_PREWARM_INTERVAL)")
+    parser.add_argument("-o", "--output", help="Archivo NDJSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    out = open(args.output, "a" if args.every is not None else "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        if args.every is None:
+            return 1 if run_cycle(args, args.lead, out) else 0
+
+        interval = resolve_interval(None if args.every < 0 else args.every)
+        lead_seconds = loop_lead_seconds(args.lead, interval)
+        while True:
+            started = time.monotonic()
+            run_cycle(args, lead_seconds, out)
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        from api.db import flush_pending_writes
+        flush_pending_writes()
+        if out is not sys.stdout:
+            out.close()
+
+if __name__ == "__main__":
+    sys.exit(main())